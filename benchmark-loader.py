@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+ClickHouse Loader Benchmark
+Loads synthetic trade flow, country and product CSVs through ClickHouseLoader and splits
+the time into CSV parsing, transformation and insertion per batch size
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict
+
+import pandas as pd
+
+from benchmark_support import check_baseline, format_size, parse_size, peak_rss_mb
+
+REPO_DIR = Path(__file__).resolve().parent
+
+def write_trade_flows_csv(path: Path, rows: int, seed: int = 0):
+    """Synthetic extractor output (trademap_synthetic) in the shape of test-data/test_trade_data.csv
+
+    Reporters, partners and HS2 products are the recording client's dimension rows,
+    so every generated row maps.
+    """
+    from fake_clickhouse import DEFAULT_COUNTRIES, DEFAULT_PRODUCTS
+    from trademap_synthetic import Dimensions, TradeDataGenerator, generate_dataset
+
+    dimensions = Dimensions.from_codes([country[1] for country in DEFAULT_COUNTRIES], DEFAULT_PRODUCTS)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    generate_dataset(TradeDataGenerator(dimensions, hs_level=2, seed=seed), rows, 'csv', str(tmp_path))
+    tmp_path.replace(path)
+
+def write_countries_csv(path: Path, rows: int):
+    """Country reference file with the columns load_countries_data reads"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({
+        'country_id': range(1, rows + 1),
+        'country_name': [f"Country {index}" for index in range(1, rows + 1)],
+        'iso2_code': [f"{chr(65 + index // 26 % 26)}{chr(65 + index % 26)}" for index in range(rows)],
+        'iso3_code': [f"X{chr(65 + index // 26 % 26)}{chr(65 + index % 26)}" for index in range(rows)],
+        'm49_code': [f"{index:03d}" for index in range(1, rows + 1)],
+        'region': 'Region',
+        'subregion': 'Subregion',
+        'data_available_from_year': 1990,
+        'data_available_to_year': 2024,
+        'monthly_data_available': True,
+        'quarterly_data_available': True,
+        'yearly_data_available': True,
+        'last_updated_date': '2024-01-01'
+    }).to_csv(path, index=False)
+
+def write_products_csv(path: Path, rows: int):
+    """HS6 product reference file with the columns load_products_data reads"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    codes = [f"{index % 97 + 1:02d}{index // 97 % 100:02d}{index // 9700 % 100:02d}" for index in range(rows)]
+    pd.DataFrame({
+        'product_code': codes,
+        'product_description': [f"Product {code}" for code in codes],
+        'hs_level': 6,
+        'parent_code': [code[:4] for code in codes],
+        'section_code': 'I',
+        'section_name': 'Section',
+        'chapter_code': [code[:2] for code in codes],
+        'chapter_name': 'Chapter',
+        'heading_code': [code[:4] for code in codes],
+        'heading_name': 'Heading',
+        'subheading_code': codes,
+        'subheading_name': 'Subheading',
+        'data_available_from_year': 1990,
+        'data_available_to_year': 2024,
+        'last_updated_date': '2024-01-01'
+    }).to_csv(path, index=False)
+
+def run_case(kind: str, csv_path: str, batch_size: int, client_kind: str, insert_latency_ms: float) -> Dict:
+    """Load one file in this (fresh) process and time each part of the load
+
+    transform_seconds is _transform_trade_flows for trade flows; for the reference
+    tables, where parsing and transformation are one step, it also covers the CSV
+    read. insert_seconds covers _insert_columnar (schema casts plus the driver call),
+    of which client_seconds is the driver call alone.
+    """
+    from clickhouse_loader import ClickHouseLoader
+    from fake_clickhouse import RecordingClickHouseClient
+
+    # Per-chunk progress lines would be timed as part of the load
+    logging.getLogger().setLevel(logging.ERROR)
+
+    if client_kind == 'fake':
+        # The driver imports its column writers on first use; keep that out of the timings
+        warmup = ClickHouseLoader(client=RecordingClickHouseClient())
+        if kind == 'trade_flows':
+            warmup.begin_trade_flows_load()
+            warmup.insert_trade_flows(pd.read_csv(csv_path, nrows=100))
+        else:
+            getattr(warmup, f"load_{kind}_data")(csv_path)
+        warmup.close()
+
+    client = RecordingClickHouseClient(insert_latency_ms=insert_latency_ms) if client_kind == 'fake' else None
+    loader = ClickHouseLoader(client=client)
+    timings = {'transform': 0.0, 'insert': 0.0, 'client': 0.0}
+
+    def timed(name: str, fn):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timings[name] += time.perf_counter() - started
+        return wrapper
+
+    loader._transform_trade_flows = timed('transform', loader._transform_trade_flows)
+    loader._insert_columnar = timed('insert', loader._insert_columnar)
+    insert_client = loader._get_numpy_client() if loader.use_numpy else loader.client
+    if loader.use_numpy:
+        insert_client.insert_dataframe = timed('client', insert_client.insert_dataframe)
+    else:
+        insert_client.execute = timed('client', insert_client.execute)
+
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    try:
+        if kind == 'trade_flows':
+            loader.load_trade_flows_data(csv_path, batch_size=batch_size)
+        elif kind == 'countries':
+            loader.load_countries_data(csv_path)
+        else:
+            loader.load_products_data(csv_path)
+        total = time.perf_counter() - started
+    finally:
+        loader.close()
+
+    rows = sum(client.rows.values()) if client else None
+    if rows is None:
+        with open(csv_path) as f:
+            rows = sum(1 for _ in f) - 1
+    if kind == 'trade_flows':
+        read = total - timings['transform'] - timings['insert']
+    else:
+        timings['transform'], read = total - timings['insert'], 0.0
+    return {
+        'rows': rows,
+        'batch_size': batch_size if kind == 'trade_flows' else None,
+        'total_seconds': round(total, 3),
+        'read_seconds': round(read, 3),
+        'transform_seconds': round(timings['transform'], 3),
+        'insert_seconds': round(timings['insert'], 3),
+        'client_seconds': round(timings['client'], 3),
+        'rows_per_sec': round(rows / max(total, 1e-9), 1),
+        'transform_rows_per_sec': round(rows / max(timings['transform'], 1e-9), 1),
+        'insert_rows_per_sec': round(rows / max(timings['insert'], 1e-9), 1),
+        'rss_before_mb': rss_before,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def run_isolated(*args) -> Dict:
+    """run_case in a fresh interpreter, so peak RSS belongs to that case alone"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(run_case, *args).result()
+
+def print_case(name: str, result: Dict):
+    print(
+        f"{name:<30} {result['rows']:>10} {result['total_seconds']:>8.2f}s {result['read_seconds']:>7.2f}s "
+        f"{result['transform_seconds']:>9.2f}s {result['insert_seconds']:>7.2f}s {result['rows_per_sec']:>11.0f} "
+        f"{result['peak_rss_mb']:>8.1f}MB"
+    )
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark ClickHouseLoader on synthetic CSVs')
+    parser.add_argument('--sizes', nargs='+', default=['10K', '1M', '10M'], help='Trade flow file sizes, e.g. 10K 1M 10M')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[10000, 50000, 100000],
+                        help='load_trade_flows_data batch sizes to compare')
+    parser.add_argument('--countries', type=int, default=250, help='Rows in the synthetic countries file (0 to skip)')
+    parser.add_argument('--products', type=int, default=6000, help='Rows in the synthetic products file (0 to skip)')
+    parser.add_argument('--client', choices=['fake', 'server'], default='fake',
+                        help="'fake' records inserts in-process; 'server' loads into the CLICKHOUSE_* server")
+    parser.add_argument('--insert-latency-ms', type=float, default=0.0, help='Simulated round trip per insert (fake client)')
+    parser.add_argument('--data-dir', default='data/benchmarks', help='Where generated CSVs are kept between runs')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the results to this JSON file (usable as a later --baseline)')
+    parser.add_argument('--baseline', help='Compare with the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative change counted as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit 1 when a metric regressed')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    data_dir = Path(args.data_dir)
+
+    cases = []
+    for size in args.sizes:
+        rows = parse_size(size)
+        path = data_dir / f"trade_flows_{format_size(rows)}_seed{args.seed}.csv"
+        if not path.exists():
+            print(f"Generating {path} ({rows} rows)...")
+            write_trade_flows_csv(path, rows, args.seed)
+        for batch_size in args.batch_sizes:
+            cases.append((f"trade_flows/{format_size(rows)}/batch{batch_size}", 'trade_flows', path, batch_size))
+    for kind, rows, writer in (('countries', args.countries, write_countries_csv),
+                               ('products', args.products, write_products_csv)):
+        if rows:
+            path = data_dir / f"{kind}_{rows}.csv"
+            if not path.exists():
+                writer(path, rows)
+            cases.append((f"{kind}/{rows}", kind, path, 0))
+
+    results = {}
+    print(f"{'case':<30} {'rows':>10} {'total':>9} {'read':>8} {'transform':>10} {'insert':>8} {'rows/s':>11} {'peak RSS':>10}")
+    for name, kind, path, batch_size in cases:
+        results[name] = run_isolated(kind, str(path), batch_size, args.client, args.insert_latency_ms)
+        print_case(name, results[name])
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'config': {'client': args.client, 'insert_latency_ms': args.insert_latency_ms, 'seed': args.seed},
+        'cases': results
+    }
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        regressions = check_baseline(report, args.baseline, 'cases', args.threshold)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
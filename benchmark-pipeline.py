@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Pipeline Throughput Benchmark
+Runs extraction, UN Comtrade collection, transformation and loading against local stand-ins
+and compares the results with a stored JSON baseline
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from benchmark_support import check_baseline, peak_rss_mb, percentile
+from mock_trade_server import COUNTRIES as MOCK_COUNTRIES, PRODUCTS as MOCK_PRODUCTS, MockTradeServer
+
+REPO_DIR = Path(__file__).resolve().parent
+
+class StageMeter:
+    """Wall time, row and request counts, request latencies and peak RSS of one stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.latencies: List[float] = []
+        self.attempts = 0
+        self.extra: Dict = {}
+        self._started = 0.0
+        self._rss_before = 0.0
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self._rss_before = peak_rss_mb()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.seconds = time.perf_counter() - self._started
+
+    def timed(self, fetch):
+        """Wrap an async fetch method so every call's latency (retries included) is recorded"""
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = await fetch(*args, **kwargs)
+                self.attempts += getattr(result, 'attempts', 1)
+                return result
+            finally:
+                self.latencies.append(time.perf_counter() - started)
+        return wrapper
+
+    def result(self) -> Dict:
+        seconds = max(self.seconds, 1e-9)
+        peak = peak_rss_mb()
+        result = {
+            'rows': self.rows,
+            'seconds': round(self.seconds, 3),
+            'rows_per_sec': round(self.rows / seconds, 1),
+            'peak_rss_mb': peak,
+            'rss_growth_mb': round(peak - self._rss_before, 1)
+        }
+        if self.latencies:
+            result.update({
+                'requests': len(self.latencies),
+                'http_attempts': self.attempts,
+                'requests_per_sec': round(len(self.latencies) / seconds, 1),
+                'p50_ms': round(percentile(self.latencies, 50) * 1000, 2),
+                'p99_ms': round(percentile(self.latencies, 99) * 1000, 2)
+            })
+        result.update(self.extra)
+        return result
+
+def load_collector_module():
+    """Import data-collection-script.py (its configuration is read from the environment at import)
+
+    Its file logging is only set up when it runs as a script, so this leaves no
+    data_collection.log behind and keeps the benchmark's own logging configuration.
+    """
+    spec = importlib.util.spec_from_file_location('data_collection_script', REPO_DIR / 'data-collection-script.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+async def bench_extraction(args, base_url: str, retry_policy):
+    """TradeMapExtractor.extract_bulk_data against the Trade Map endpoints"""
+    from rate_limiter import get_rate_limiter
+    from trademap_extractor import TradeMapExtractor
+
+    meter = StageMeter('extraction')
+    extractor = TradeMapExtractor(base_url=base_url, rate_limiter=get_rate_limiter(), retry_policy=retry_policy)
+    extractor._get_json = meter.timed(extractor._get_json)
+    countries = [name for name, _, _ in MOCK_COUNTRIES[:args.countries]]
+    products = [code for code, _ in MOCK_PRODUCTS[:args.products]]
+    async with extractor:
+        with meter:
+            await extractor.get_countries_list()
+            await extractor.get_products_list()
+            records = await extractor.extract_bulk_data(
+                countries, products, args.start_year, args.start_year + args.years - 1,
+                include_monthly=args.monthly, max_concurrency=args.concurrency
+            )
+            meter.rows = len(records)
+    meter.extra['failed_work_items'] = len(extractor.failed_work_items)
+    return meter.result(), records
+
+async def bench_comtrade(args, base_url: str, retry_policy):
+    """DataCollector partner-split streaming and row transformation, without inserts"""
+    import aiohttp
+    from rate_limiter import get_rate_limiter
+
+    os.environ['COMTRADE_BASE_URL'] = base_url
+    os.environ['COMTRADE_MAX_CONCURRENCY'] = str(args.concurrency)
+    collector_module = load_collector_module()
+    get_rate_limiter().configure_host(base_url, rate=args.rate_limit, burst=args.rate_burst, override=True)
+
+    meter = StageMeter('comtrade')
+    collector = collector_module.DataCollector()
+    collector.retry_policy = retry_policy
+    collector._comtrade_get = meter.timed(collector._comtrade_get)
+    collector.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=300))
+    transform_seconds = 0.0
+    try:
+        with meter:
+            for _, m49_code, _ in MOCK_COUNTRIES[:args.countries]:
+                for year in range(args.start_year, args.start_year + args.years):
+                    async for rows in collector.iter_un_comtrade_records(str(m49_code), year):
+                        started = time.perf_counter()
+                        meter.rows += len(collector._transform_comtrade_rows(rows))
+                        transform_seconds += time.perf_counter() - started
+    finally:
+        await collector.session.close()
+    meter.extra['transform_seconds'] = round(transform_seconds, 3)
+    meter.extra['failed_work_items'] = len(collector.failed_work_items)
+    return meter.result()
+
+def bench_transformation(args, frame, loader) -> Dict:
+    """ClickHouseLoader._transform_trade_flows over the extracted records, batch by batch"""
+    meter = StageMeter('transformation')
+    loader.begin_trade_flows_load()
+    with meter:
+        for start in range(0, len(frame), args.batch_size):
+            meter.rows += len(loader._transform_trade_flows(frame.iloc[start:start + args.batch_size]))
+    return meter.result()
+
+def bench_loading(args, frame, loader, client) -> Dict:
+    """ClickHouseLoader.insert_trade_flows (transform, schema casts, dedup token, insert) per batch"""
+    meter = StageMeter('loading')
+    loader.begin_trade_flows_load()
+    with meter:
+        for start in range(0, len(frame), args.batch_size):
+            meter.rows += loader.insert_trade_flows(frame.iloc[start:start + args.batch_size])
+        loader.finish_trade_flows_load()
+    meter.extra['inserts'] = sum(client.inserts.values())
+    meter.extra['client_insert_seconds'] = round(client.insert_seconds, 3)
+    return meter.result()
+
+async def run_benchmark(args) -> Dict:
+    from retry_policy import RetryPolicy
+    from rate_limiter import get_rate_limiter
+
+    server = None
+    base_url = args.server_url
+    if not base_url:
+        server = MockTradeServer(
+            latency_ms=args.latency_ms, latency_jitter_ms=args.latency_jitter_ms, rows_per_response=args.rows,
+            throttle_rate=args.throttle_rate, retry_after=args.retry_after, seed=args.seed
+        )
+        base_url = await server.start()
+
+    # The benchmark measures the pipeline, not the production request budget
+    get_rate_limiter().configure_host(base_url, rate=args.rate_limit, burst=args.rate_burst, override=True)
+    retry_policy = RetryPolicy(max_attempts=args.max_attempts, base_delay=0.05, max_delay=2.0)
+
+    stages = {}
+    try:
+        if 'extraction' in args.stages or 'transformation' in args.stages or 'loading' in args.stages:
+            stages['extraction'], records = await bench_extraction(args, base_url, retry_policy)
+        if 'comtrade' in args.stages:
+            stages['comtrade'] = await bench_comtrade(args, base_url, retry_policy)
+    finally:
+        if server:
+            await server.stop()
+
+    if 'transformation' in args.stages or 'loading' in args.stages:
+        from clickhouse_loader import ClickHouseLoader
+        from fake_clickhouse import RecordingClickHouseClient
+
+        frame = records.to_frame()
+        # Warm up lazily imported column writers so the stages measure steady-state work
+        warmup = ClickHouseLoader(client=RecordingClickHouseClient())
+        warmup.begin_trade_flows_load()
+        warmup.insert_trade_flows(frame.iloc[:100])
+        warmup.close()
+
+        client = RecordingClickHouseClient(insert_latency_ms=args.insert_latency_ms)
+        loader = ClickHouseLoader(client=client)
+        if 'transformation' in args.stages:
+            stages['transformation'] = bench_transformation(args, frame, loader)
+        if 'loading' in args.stages:
+            stages['loading'] = bench_loading(args, frame, loader, client)
+        loader.close()
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'config': {
+            key: getattr(args, key) for key in (
+                'latency_ms', 'latency_jitter_ms', 'rows', 'throttle_rate', 'retry_after', 'countries', 'products',
+                'years', 'monthly', 'concurrency', 'batch_size', 'insert_latency_ms', 'seed'
+            )
+        },
+        'server': server.stats() if server else {'url': base_url},
+        'stages': {name: stage for name, stage in stages.items() if name in args.stages}
+    }
+
+def print_report(report: Dict):
+    print(f"{'stage':<16} {'rows':>9} {'rows/s':>11} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'peak RSS':>10}")
+    for stage, metrics in report['stages'].items():
+        print(
+            f"{stage:<16} {metrics['rows']:>9} {metrics['rows_per_sec']:>11.1f} "
+            f"{metrics.get('requests_per_sec', '-'):>8} {metrics.get('p50_ms', '-'):>8} "
+            f"{metrics.get('p99_ms', '-'):>8} {metrics['peak_rss_mb']:>8.1f}MB"
+        )
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description='Benchmark extraction, UN Comtrade collection, transformation and loading against local stand-ins'
+    )
+    parser.add_argument('--server-url', help='Use an already running mock server (mock_trade_server.py) instead of an in-process one')
+    parser.add_argument('--stages', nargs='+', default=['extraction', 'comtrade', 'transformation', 'loading'],
+                        choices=['extraction', 'comtrade', 'transformation', 'loading'])
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Mock server response latency')
+    parser.add_argument('--latency-jitter-ms', type=float, default=5.0)
+    parser.add_argument('--rows', type=int, default=100, help='Rows per mock data response')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of requests answered 429')
+    parser.add_argument('--retry-after', type=float, default=0.0, help='Retry-After seconds on 429 answers')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--countries', type=int, default=5, help=f"Reporters (at most {len(MOCK_COUNTRIES)})")
+    parser.add_argument('--products', type=int, default=3, help=f"Products (at most {len(MOCK_PRODUCTS)})")
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--start-year', type=int, default=2022)
+    parser.add_argument('--monthly', action='store_true', help='Extract monthly instead of annual data')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent requests per stage')
+    parser.add_argument('--rate-limit', type=float, default=1000.0, help='Requests per second allowed to the mock host')
+    parser.add_argument('--rate-burst', type=int, default=50)
+    parser.add_argument('--max-attempts', type=int, default=5, help='Retry attempts per request')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Loader batch size')
+    parser.add_argument('--insert-latency-ms', type=float, default=0.0, help='Simulated ClickHouse round trip per insert')
+    parser.add_argument('--output', help='Write the results to this JSON file (usable as a later --baseline)')
+    parser.add_argument('--baseline', help='Compare with the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative change counted as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit 1 when a metric regressed')
+    parser.add_argument('--verbose', action='store_true', help='Show pipeline logging')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        # Retries on injected 429s log a warning each; only errors unless verbose
+        level=logging.INFO if args.verbose else logging.ERROR,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    # Benchmarks always hit the server; the response cache would turn requests into disk reads
+    os.environ['HTTP_CACHE_DISABLED'] = 'true'
+
+    report = asyncio.run(run_benchmark(args))
+    print_report(report)
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        regressions = check_baseline(report, args.baseline, 'stages', args.threshold)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
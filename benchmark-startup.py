@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Pipeline Startup Benchmark
+Times interpreter start-up plus imports for the pipeline entry points the scheduler spawns
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+REPO_DIR = Path(__file__).resolve().parent
+
+# Dependencies whose import time dominates a short job
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow', 'aiohttp', 'clickhouse_driver', 'clickhouse_connect')
+
+COMMANDS: Dict[str, List[str]] = {
+    'python -c pass': ['-c', 'pass'],
+    'trademap-extractor.py --help': ['trademap-extractor.py', '--help'],
+    'trademap-scheduler.py --help': ['trademap-scheduler.py', '--help'],
+    'clickhouse-loader.py (usage)': ['clickhouse-loader.py'],
+    'import trademap_extractor': ['-c', 'import trademap_extractor'],
+    'import trademap_scheduler': ['-c', 'import trademap_scheduler'],
+    'import clickhouse_loader': ['-c', 'import clickhouse_loader'],
+    'import pandas, aiohttp': ['-c', 'import pandas, aiohttp']
+}
+
+def heavy_imports(args: List[str]) -> Dict[str, float]:
+    """Cumulative import time (ms) of each heavy dependency the command actually loads"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=REPO_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    loaded = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or line.count('|') != 2:
+            continue
+        _, cumulative, name = line.split('|')
+        name = name.strip()
+        if name in HEAVY_MODULES and cumulative.strip().isdigit():
+            loaded[name] = round(int(cumulative) / 1000, 1)
+    return loaded
+
+def measure(args: List[str], runs: int) -> Dict:
+    """Wall time of `runs` fresh interpreter runs of one command"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=REPO_DIR,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'median_ms': round(statistics.median(timings), 1),
+        'min_ms': round(min(timings), 1),
+        'max_ms': round(max(timings), 1),
+        'heavy_imports_ms': heavy_imports(args)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure start-up time of the pipeline entry points')
+    parser.add_argument('--runs', type=int, default=10, help='Fresh interpreter runs per command')
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'command':<32} {'median':>9} {'min':>9}  heavy imports")
+    for name, command in COMMANDS.items():
+        result = results[name] = measure(command, args.runs)
+        heavy = ', '.join(f"{module} {ms:.0f}ms" for module, ms in result['heavy_imports_ms'].items()) or '-'
+        print(f"{name:<32} {result['median_ms']:>7.1f}ms {result['min_ms']:>7.1f}ms  {heavy}")
+
+    if args.output:
+        report = {
+            'timestamp': datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'runs': args.runs,
+            'results': results
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
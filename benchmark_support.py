@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark Helpers
+Percentiles, peak RSS and JSON baseline comparison shared by the benchmark scripts
+"""
+
+import json
+import resource
+import sys
+from typing import Dict, List
+
+# Metrics compared against a baseline, and which direction is an improvement
+HIGHER_IS_BETTER = ('rows_per_sec', 'requests_per_sec', 'transform_rows_per_sec', 'insert_rows_per_sec')
+LOWER_IS_BETTER = ('p50_ms', 'p99_ms', 'peak_rss_mb')
+
+SIZE_SUFFIXES = {'K': 1_000, 'M': 1_000_000}
+
+def parse_size(text: str) -> int:
+    """'10K' -> 10000, '1M' -> 1000000, '2500' -> 2500"""
+    text = text.strip().upper()
+    if text[-1:] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+def format_size(rows: int) -> str:
+    for suffix, factor in sorted(SIZE_SUFFIXES.items(), key=lambda item: -item[1]):
+        if rows >= factor and rows % factor == 0:
+            return f"{rows // factor}{suffix}"
+    return str(rows)
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0-100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def peak_rss_mb() -> float:
+    """High-water mark of this process's resident set size"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def compare_with_baseline(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Metrics that got worse than the baseline by more than threshold (a fraction)
+
+    Both sides map a case name (a stage, a file size and batch size, ...) to its metrics.
+    """
+    regressions = []
+    for case, metrics in results.items():
+        before = baseline.get(case, {})
+        for metric in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            old, new = before.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > threshold:
+                regressions.append(f"{case}.{metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+def check_baseline(report: Dict, baseline_path: str, key: str, threshold: float) -> List[str]:
+    """Print how report[key] compares with the same section of a stored report; returns the regressions"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get('config') != report.get('config'):
+        print('Warning: baseline was recorded with a different configuration')
+    regressions = compare_with_baseline(report[key], baseline.get(key, {}), threshold)
+    if regressions:
+        print(f"Regressions against {baseline_path} (threshold {threshold:.0%}):")
+        for regression in regressions:
+            print(f"  {regression}")
+    else:
+        print(f"No regressions against {baseline_path} (threshold {threshold:.0%})")
+    return regressions
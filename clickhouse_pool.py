@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+ClickHouse Connection Pool
+Reusable native (clickhouse_driver) and HTTP (clickhouse_connect) clients shared within a process
+"""
+
+import asyncio
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+def native_params_from_env() -> Dict[str, Any]:
+    """clickhouse_driver connection settings from the CLICKHOUSE_* environment"""
+    return {
+        'host': os.getenv('CLICKHOUSE_HOST', 'localhost'),
+        'port': int(os.getenv('CLICKHOUSE_PORT', '9000')),  # Native protocol port
+        'user': os.getenv('CLICKHOUSE_USER', 'default'),
+        'password': os.getenv('CLICKHOUSE_PASSWORD', ''),
+        'database': os.getenv('CLICKHOUSE_DATABASE', 'primero_tradefinance')
+    }
+
+def _native_client(params: Dict[str, Any]):
+    import clickhouse_driver
+    return clickhouse_driver.Client(**params)
+
+def _native_ping(client):
+    client.execute('SELECT 1')
+
+def _http_client(params: Dict[str, Any]):
+    import clickhouse_connect
+    return clickhouse_connect.get_client(**params)
+
+def _http_ping(client):
+    if not client.ping():
+        raise ConnectionError('ClickHouse HTTP ping failed')
+
+# kind -> (factory, ping, close)
+CLIENT_KINDS: Dict[str, tuple] = {
+    'native': (_native_client, _native_ping, lambda client: client.disconnect()),
+    'http': (_http_client, _http_ping, lambda client: client.close())
+}
+
+class ClickHousePool:
+    """Bounded pool of ClickHouse clients
+
+    Clients are created on demand up to max_size and handed back after use, so
+    the TCP/TLS handshake and authentication are paid once per connection rather
+    than once per job. A client that sat idle longer than health_check_interval
+    seconds, or whose last use raised, is pinged before it is handed out again and
+    replaced if the ping fails. A client serves one thread at a time; async code
+    goes through run_async(), which uses the pool's own executor.
+    """
+
+    def __init__(self, kind: str, params: Dict[str, Any], max_size: int = 8,
+                 health_check_interval: float = 30.0, acquire_timeout: float = 30.0):
+        if kind not in CLIENT_KINDS:
+            raise ValueError(f"Unknown ClickHouse client kind {kind!r}; expected one of {sorted(CLIENT_KINDS)}")
+        self.kind = kind
+        self.params = dict(params)
+        self.max_size = max(1, max_size)
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self._factory, self._ping, self._close = CLIENT_KINDS[kind]
+
+        # Idle clients as (client, time last known healthy); most recently used last
+        self._idle: deque = deque()
+        self._size = 0
+        self._condition = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._closed = False
+
+        self.created = 0
+        self.reused = 0
+        self.replaced = 0
+
+    @classmethod
+    def from_env(cls, kind: str, params: Dict[str, Any]) -> 'ClickHousePool':
+        """Build a pool sized by CLICKHOUSE_POOL_* environment variables"""
+        return cls(
+            kind,
+            params,
+            max_size=int(os.getenv('CLICKHOUSE_POOL_SIZE', '8')),
+            health_check_interval=float(os.getenv('CLICKHOUSE_POOL_HEALTH_CHECK_SECONDS', '30')),
+            acquire_timeout=float(os.getenv('CLICKHOUSE_POOL_TIMEOUT', '30'))
+        )
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Thread pool for running client calls off the event loop, one thread per connection"""
+        with self._condition:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_size,
+                                                    thread_name_prefix=f"clickhouse-{self.kind}")
+            return self._executor
+
+    def acquire(self):
+        """Take a client from the pool, creating one if below max_size; waits otherwise"""
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError('ClickHouse pool is closed')
+                if self._idle:
+                    client, checked_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    client, checked_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No ClickHouse connection free after {self.acquire_timeout}s "
+                                       f"(pool size {self.max_size})")
+                self._condition.wait(remaining)
+
+        # Connect and ping outside the lock
+        try:
+            if client is None:
+                client = self._factory(self.params)
+                self.created += 1
+            elif time.monotonic() - checked_at > self.health_check_interval:
+                client = self._checked(client)
+            else:
+                self.reused += 1
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        return client
+
+    def _checked(self, client):
+        """Ping an idle client; replace it with a fresh one if it no longer answers"""
+        try:
+            self._ping(client)
+            self.reused += 1
+            return client
+        except Exception as e:
+            logger.warning(f"Replacing unhealthy ClickHouse {self.kind} connection: {e}")
+            self._discard(client)
+            self.replaced += 1
+            return self._factory(self.params)
+
+    def _discard(self, client):
+        try:
+            self._close(client)
+        except Exception:
+            pass
+
+    def release(self, client, healthy: bool = True):
+        """Return a client; an unhealthy one is pinged before its next use"""
+        with self._condition:
+            if self._closed:
+                self._size -= 1
+                self._discard(client)
+                return
+            self._idle.append((client, time.monotonic() if healthy else float('-inf')))
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as client: ..."""
+        client = self.acquire()
+        healthy = True
+        try:
+            yield client
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            self.release(client, healthy)
+
+    def run(self, fn: Callable, *args, **kwargs):
+        """Call fn(client, *args, **kwargs) with a pooled client"""
+        with self.connection() as client:
+            return fn(client, *args, **kwargs)
+
+    async def run_async(self, fn: Callable, *args, **kwargs):
+        """run() on the pool's executor, so the event loop keeps serving other tasks
+
+        Like asyncio.to_thread, fn runs in a copy of the caller's context (e.g. job_metrics).
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(context.run, self.run, fn, *args, **kwargs)
+        )
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'created': self.created,
+                'reused': self.reused,
+                'replaced': self.replaced
+            }
+
+    def close(self):
+        """Disconnect idle clients; clients still in use are closed when released"""
+        with self._condition:
+            self._closed = True
+            idle = [client for client, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            executor, self._executor = self._executor, None
+        for client in idle:
+            self._discard(client)
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+_pools: Dict[str, ClickHousePool] = {}
+_pools_pid: Optional[int] = None
+_pools_lock = threading.Lock()
+
+def get_pool(kind: str = 'native', params: Optional[Dict[str, Any]] = None) -> ClickHousePool:
+    """Process-wide pool for one kind of client and set of connection settings
+
+    params default to native_params_from_env() for native clients; HTTP callers
+    pass their clickhouse_connect settings.
+    """
+    global _pools_pid
+    if params is None:
+        if kind != 'native':
+            raise ValueError(f"Connection settings are required for {kind!r} pools")
+        params = native_params_from_env()
+    key = f"{kind}:{json.dumps(params, sort_keys=True, default=str)}"
+    with _pools_lock:
+        # Sockets are not shared with a forked child
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None or pool._closed:
+            pool = _pools[key] = ClickHousePool.from_env(kind, params)
+        return pool
+
+def close_pools():
+    """Close every pool of this process"""
+    with _pools_lock:
+        pools = list(_pools.values()) if _pools_pid == os.getpid() else []
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+atexit.register(close_pools)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Write-Behind ClickHouse Inserts
+Buffer row batches from async code and insert them on a connection pool's executor
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+from clickhouse_pool import ClickHousePool
+from pipeline_metrics import INSERT_FAILURES, INSERT_SECONDS, QUEUE_DEPTH, ROWS_INSERTED
+from pipeline_profiling import profile_stage
+
+logger = logging.getLogger(__name__)
+
+class ChunkInsertError(Exception):
+    """An insert_batch_size chunk failed after inserted_rows rows of the flush were written"""
+
+    def __init__(self, inserted_rows: int, seconds: List[float], cause: Exception):
+        super().__init__(str(cause))
+        self.inserted_rows = inserted_rows
+        self.seconds = seconds
+        self.cause = cause
+
+class WriteBehindWriter:
+    """Inserts row batches in the background while the producer keeps fetching
+
+    put() adds records to a buffer that is flushed once it holds flush_rows rows
+    or its oldest rows have waited flush_interval seconds, so many small batches
+    become a few large inserts (and few parts). Flushed batches are queued for
+    insert workers that run on the pool's thread-pool executor, so the event loop
+    is never blocked on a database round trip. Once max_pending flushes are
+    waiting, put() waits for a worker to catch up.
+
+    With async_insert the server batches inserts as well; wait_for_async_insert
+    makes each insert return only once its rows are written, so failures are still
+    reported. A failed insert does not stop the writer: the rows not written
+    are counted against their labels in failed_labels so the caller can report
+    or retry those units of work. A flush is inserted in insert_batch_size
+    chunks; when one fails, the chunks already written count as inserted and
+    only that chunk and the rest of the flush count as failed.
+    """
+
+    def __init__(self, pool: ClickHousePool, table: str, column_names: Sequence[str],
+                 max_pending: int = 8, insert_workers: int = 2, insert_batch_size: int = 10000,
+                 flush_rows: int = 50000, flush_interval: float = 10.0,
+                 async_insert: bool = False, wait_for_async_insert: bool = True):
+        self.pool = pool
+        self.table = table
+        self.column_names = list(column_names)
+        self.max_pending = max(1, max_pending)
+        self.insert_workers = max(1, insert_workers)
+        self.insert_batch_size = insert_batch_size
+        self.flush_rows = max(1, flush_rows)
+        self.flush_interval = flush_interval
+
+        self.settings: Dict[str, int] = {}
+        if async_insert:
+            self.settings = {'async_insert': 1, 'wait_for_async_insert': int(wait_for_async_insert)}
+
+        self.rows_queued = 0
+        self.rows_inserted = 0
+        self.inserts = 0  # client.insert calls, one per insert_batch_size chunk
+        self.failed_inserts = 0
+        self.failed_labels: Dict[Hashable, int] = {}
+
+        # Flush metrics
+        self.flushes = 0
+        self.flush_reasons: Counter = Counter()
+        self.max_flush_rows = 0
+        self.insert_seconds = 0.0
+        self.max_insert_seconds = 0.0
+
+        self.queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._buffer: List[Dict] = []
+        self._buffer_labels: List[List] = []  # [label, rows] runs in buffer order
+        self._flush_timer: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def start(self):
+        """Start the insert workers (on the running event loop)"""
+        if self._workers:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self._workers = [asyncio.create_task(self._insert_worker()) for _ in range(self.insert_workers)]
+
+    async def put(self, records: Sequence[Dict], label: Hashable = None):
+        """Buffer records (dicts keyed by column name) for insertion"""
+        if not records:
+            return
+        if not self._workers:
+            await self.start()
+        self.rows_queued += len(records)
+        if not self._buffer and self.flush_interval > 0:
+            self._flush_timer = asyncio.create_task(self._flush_after(self.flush_interval))
+        self._buffer.extend(records)
+        if self._buffer_labels and self._buffer_labels[-1][0] == label:
+            self._buffer_labels[-1][1] += len(records)
+        else:
+            self._buffer_labels.append([label, len(records)])
+        if len(self._buffer) >= self.flush_rows:
+            await self._flush_buffer('rows')
+
+    async def _flush_after(self, delay: float):
+        await asyncio.sleep(delay)
+        self._flush_timer = None
+        await self._flush_buffer('time')
+
+    async def _flush_buffer(self, reason: str):
+        """Hand the buffered rows to the insert workers"""
+        if self._flush_timer is not None and self._flush_timer is not asyncio.current_task():
+            self._flush_timer.cancel()
+        self._flush_timer = None
+        if not self._buffer:
+            return
+        records, labels = self._buffer, self._buffer_labels
+        self._buffer, self._buffer_labels = [], []
+        self.flushes += 1
+        self.flush_reasons[reason] += 1
+        self.max_flush_rows = max(self.max_flush_rows, len(records))
+        await self.queue.put((records, labels))
+        QUEUE_DEPTH.set(self.queue.qsize(), queue=f"writer:{self.table}")
+
+    def _insert(self, client, records: Sequence[Dict]) -> Tuple[int, List[float]]:
+        """Runs on an executor thread: order the values and insert in insert_batch_size chunks
+
+        Returns the rows inserted and each insert's seconds; raises ChunkInsertError
+        with the rows written before the failing chunk.
+        """
+        inserted = 0
+        seconds: List[float] = []
+        with profile_stage('insert'):
+            for start in range(0, len(records), self.insert_batch_size):
+                batch = records[start:start + self.insert_batch_size]
+                values = [[record[column] for column in self.column_names] for record in batch]
+                started = time.monotonic()
+                try:
+                    client.insert(self.table, values, column_names=self.column_names, settings=self.settings or None)
+                except Exception as e:
+                    seconds.append(time.monotonic() - started)
+                    raise ChunkInsertError(inserted, seconds, e) from e
+                seconds.append(time.monotonic() - started)
+                inserted += len(batch)
+        return inserted, seconds
+
+    @staticmethod
+    def _labels_after(labels: List[List], offset: int) -> Counter:
+        """Rows per label from position offset of a flush to its end"""
+        remaining = Counter()
+        for label, rows in labels:
+            skipped = min(offset, rows)
+            offset -= skipped
+            if rows > skipped:
+                remaining[label] += rows - skipped
+        return remaining
+
+    async def _insert_worker(self):
+        while True:
+            item = await self.queue.get()
+            QUEUE_DEPTH.set(self.queue.qsize(), queue=f"writer:{self.table}")
+            try:
+                if item is None:
+                    return
+                records, labels = item
+                error = None
+                try:
+                    inserted, seconds = await self.pool.run_async(self._insert, records)
+                except ChunkInsertError as e:
+                    inserted, seconds, error = e.inserted_rows, e.seconds, e.cause
+                except Exception as e:  # e.g. no connection: nothing was inserted
+                    inserted, seconds, error = 0, [], e
+
+                succeeded = seconds[:-1] if error is not None else seconds
+                self.inserts += len(succeeded)
+                self.rows_inserted += inserted
+                self.insert_seconds += sum(seconds)
+                self.max_insert_seconds = max([self.max_insert_seconds] + seconds)
+                for elapsed in succeeded:
+                    INSERT_SECONDS.observe(elapsed, table=self.table)
+                if inserted:
+                    ROWS_INSERTED.inc(inserted, table=self.table)
+
+                if error is not None:
+                    self.failed_inserts += 1
+                    INSERT_FAILURES.inc(table=self.table)
+                    failed = self._labels_after(labels, inserted)
+                    logger.error(
+                        f"Insert into {self.table} failed after {inserted} of {len(records)} rows "
+                        f"({dict(failed)} not inserted): {error}"
+                    )
+                    for label, rows in failed.items():
+                        self.failed_labels[label] = self.failed_labels.get(label, 0) + rows
+            finally:
+                self.queue.task_done()
+
+    async def flush(self):
+        """Insert the buffer and wait until every row so far has been inserted (or has failed)"""
+        if self.queue is not None:
+            await self._flush_buffer('explicit')
+            await self.queue.join()
+
+    def stats(self) -> Dict:
+        """Row, flush and insert-latency counters"""
+        attempts = self.inserts + self.failed_inserts
+        return {
+            'rows_queued': self.rows_queued,
+            'rows_inserted': self.rows_inserted,
+            'rows_buffered': len(self._buffer),
+            'inserts': self.inserts,
+            'flushes': self.flushes,
+            'flush_reasons': dict(self.flush_reasons),
+            'avg_flush_rows': round((self.rows_queued - len(self._buffer)) / self.flushes, 1) if self.flushes else 0,
+            'max_flush_rows': self.max_flush_rows,
+            'failed_inserts': self.failed_inserts,
+            'avg_insert_seconds': round(self.insert_seconds / attempts, 3) if attempts else 0,
+            'max_insert_seconds': round(self.max_insert_seconds, 3),
+            'failed_rows': sum(self.failed_labels.values())
+        }
+
+    async def close(self):
+        """Insert everything still buffered or queued and stop the workers"""
+        if not self._workers:
+            return
+        await self._flush_buffer('close')
+        for _ in self._workers:
+            await self.queue.put(None)
+        await asyncio.gather(*self._workers)
+        self._workers = []
+        logger.info(f"Write-behind inserts into {self.table} finished: {self.stats()}")
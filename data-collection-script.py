@@ -12,36 +12,70 @@ Data is stored in ClickHouse for analysis and visualization.
 import asyncio
 import aiohttp
 import pandas as pd
-import clickhouse_connect
 import logging
 import json
 import os
+import re
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 import sys
 from dotenv import load_dotenv
 
+from clickhouse_pool import get_pool
+from clickhouse_writer import WriteBehindWriter
+from id_allocator import natural_key_ids
+from pipeline_metrics import QUEUE_DEPTH, ROWS_PARSED, TRANSFORM_SECONDS
+from pipeline_profiling import install_signal_trigger, profile_stage, profiling
+from rate_limiter import get_rate_limiter
+from retry_policy import RetryExhaustedError, RetryPolicy, fetch_json
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('data_collection.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
 logger = logging.getLogger(__name__)
 
+def configure_logging():
+    """Log to data_collection.log and stdout; only when run as a script, so importers keep their own logging"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('data_collection.log'),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
 # Configuration
 UN_COMTRADE_CONFIG = {
     'primary_key': '981ae9857dcd4788aada12fcdba5c8da',
     'secondary_key': '14aaf0a676fe40fa98772d42eee702a7',
-    'base_url': 'https://comtradeapi.un.org'
+    'base_url': os.getenv('COMTRADE_BASE_URL', 'https://comtradeapi.un.org'),
+    'requests_per_second': float(os.getenv('COMTRADE_REQUESTS_PER_SECOND', '1.0')),
+    'request_burst': int(os.getenv('COMTRADE_REQUEST_BURST', '1')),
+    # Full-volume pagination: one subquery per partner, each kept under maxRecords
+    'cmd_code': os.getenv('COMTRADE_CMD_CODE', 'AG6'),
+    'max_records': int(os.getenv('COMTRADE_MAX_RECORDS', '100000')),
+    # HS codes per chapter, for splitting a partner that hits maxRecords by chapter
+    'hs_reference_url': os.getenv(
+        'COMTRADE_HS_REFERENCE_URL', 'https://comtradeapi.un.org/files/v1/app/reference/HS.json'
+    ),
+    'max_concurrency': int(os.getenv('COMTRADE_MAX_CONCURRENCY', '4')),
+    # Write-behind inserts: batches waiting for ClickHouse before fetching pauses, and parallel inserts
+    'insert_queue_size': int(os.getenv('COMTRADE_INSERT_QUEUE_SIZE', '8')),
+    'insert_workers': int(os.getenv('COMTRADE_INSERT_WORKERS', '2')),
+    # Client-side buffer across country-years: flush at this many rows or after this many seconds
+    'flush_rows': int(os.getenv('COMTRADE_FLUSH_ROWS', '50000')),
+    'flush_seconds': float(os.getenv('COMTRADE_FLUSH_SECONDS', '10')),
+    # Let the server batch inserts too (async_insert); wait so insert errors are still reported
+    'async_insert': os.getenv('COMTRADE_ASYNC_INSERT', 'false').lower() == 'true',
+    'wait_for_async_insert': os.getenv('COMTRADE_WAIT_FOR_ASYNC_INSERT', 'true').lower() == 'true'
 }
 
+# API fields identifying one UN Comtrade observation
+COMTRADE_KEY_FIELDS = ['typeCode', 'freqCode', 'classificationCode', 'period', 'reporterCode', 'partnerCode', 'partner2Code', 'cmdCode', 'flowCode', 'customsCode', 'motCode']
+
+COMTRADE_COLUMNS = ['id', 'type_code', 'freq_code', 'cl_code', 'period', 'reporter_code', 'reporter_desc', 'reporter_iso', 'partner_code', 'partner_desc', 'partner_iso', 'partner2_code', 'partner2_desc', 'partner2_iso', 'classification_code', 'classification_search_code', 'is_leaf_code', 'trade_flow_code', 'trade_flow_desc', 'customs_code', 'customs_desc', 'mot_code', 'mot_desc', 'qty_unit_code', 'qty_unit_abbr', 'qty', 'alt_qty_unit_code', 'alt_qty_unit_abbr', 'alt_qty', 'net_wgt', 'gross_wgt', 'trade_value_usd', 'cif_value_usd', 'fob_value_usd', 'primary_value_usd', 'legacy_estimation_flag', 'is_reported', 'is_aggregate', 'published_date', 'data_source']
+
 CLICKHOUSE_CONFIG = {
     'host': os.getenv('CLICKHOUSE_HOST', 'localhost'),
     'port': int(os.getenv('CLICKHOUSE_PORT', '8123')),
@@ -54,12 +88,37 @@ CLICKHOUSE_CONFIG = {
 class DataCollector:
     def __init__(self):
         self.client = None
+        self.client_pool = None
+        self.writer = None
         self.session = None
+        self.rate_limiter = get_rate_limiter()
+        self.rate_limiter.configure_host(
+            UN_COMTRADE_CONFIG['base_url'],
+            rate=UN_COMTRADE_CONFIG['requests_per_second'],
+            burst=UN_COMTRADE_CONFIG['request_burst']
+        )
+        self.retry_policy = RetryPolicy.from_env('COMTRADE_RETRY')
+        self.requeue_rounds = int(os.getenv('COMTRADE_REQUEUE_ROUNDS', '2'))
+        # (country_code, year, partner_code): partner None for a whole reporter-year
+        self.failed_work_items = []
+        self.hs_chapter_codes: Optional[Dict[str, List[str]]] = None
 
     async def initialize(self):
         """Initialize ClickHouse client and HTTP session"""
         try:
-            self.client = clickhouse_connect.get_client(**CLICKHOUSE_CONFIG)
+            self.client_pool = get_pool('http', CLICKHOUSE_CONFIG)
+            self.client = self.client_pool.acquire()
+            self.writer = WriteBehindWriter(
+                self.client_pool,
+                'trade_finance_deck.un_comtrade_trade_data',
+                COMTRADE_COLUMNS,
+                max_pending=UN_COMTRADE_CONFIG['insert_queue_size'],
+                insert_workers=UN_COMTRADE_CONFIG['insert_workers'],
+                flush_rows=UN_COMTRADE_CONFIG['flush_rows'],
+                flush_interval=UN_COMTRADE_CONFIG['flush_seconds'],
+                async_insert=UN_COMTRADE_CONFIG['async_insert'],
+                wait_for_async_insert=UN_COMTRADE_CONFIG['wait_for_async_insert']
+            )
             self.session = aiohttp.ClientSession(
                 timeout=aiohttp.ClientTimeout(total=300)
             )
@@ -70,10 +129,13 @@ class DataCollector:
 
     async def close(self):
         """Clean up resources"""
+        if self.writer:
+            await self.writer.close()
         if self.session:
             await self.session.close()
         if self.client:
-            self.client.close()
+            self.client_pool.release(self.client)
+            self.client = None
 
     async def create_tables(self):
         """Create necessary ClickHouse tables"""
@@ -170,127 +232,330 @@ class DataCollector:
         logger.info(f"🌍 Starting UN Comtrade data collection for {len(countries)} countries and {len(years)} years")
 
         total_collected = 0
+        self.failed_work_items = []
+        pending = [(country_code, year) for country_code in countries for year in years]
+
+        for round_number in range(self.requeue_rounds + 1):
+            if round_number:
+                logger.info(f"🔁 Re-queue round {round_number}: retrying {len(pending)} country-years")
 
-        for country_code in countries:
-            for year in years:
+            deferred = []
+            for country_code, year in pending:
                 try:
-                    logger.info(f"📊 Collecting data for country {country_code}, year {year}")
+                    total_collected += await self._collect_country_year(country_code, year)
+                except RetryExhaustedError as e:
+                    logger.warning(f"⏳ Deferring {country_code}-{year}: {e}")
+                    deferred.append((country_code, year))
+                except Exception as e:
+                    logger.error(f"❌ Error collecting data for {country_code}-{year}: {e}")
+                    self.failed_work_items.append((country_code, year, None))
+
+            pending = deferred
+            if not pending:
+                break
+
+        # Wait for the write-behind inserts; country-years with a failed insert count as failed
+        await self.writer.flush()
+        for (country_code, year), rows in self.writer.failed_labels.items():
+            logger.error(f"❌ {rows} records for {country_code}-{year} were not inserted")
+            total_collected -= rows
+            if (country_code, year) not in pending:
+                pending.append((country_code, year))
+        self.writer.failed_labels.clear()
+        logger.info(f"📦 Insert buffer stats: {self.writer.stats()}")
+
+        self.failed_work_items.extend(
+            (country_code, year, None) for country_code, year in pending
+            if (country_code, year, None) not in self.failed_work_items
+        )
+        if pending:
+            logger.error(f"❌ {len(pending)} country-years failed after re-queueing: {pending}")
 
-                    # Rate limiting: wait 1 second between requests
-                    await asyncio.sleep(1)
+        logger.info(f"✅ UN Comtrade collection completed. Total records: {total_collected}")
 
-                    # Get final trade data
-                    url = f"{UN_COMTRADE_CONFIG['base_url']}/data/v1/get/C/A/HS"
-                    params = {
+    async def _comtrade_get(self, params: Dict):
+        """Rate-limited, retried GET against the UN Comtrade final-data endpoint"""
+        url = f"{UN_COMTRADE_CONFIG['base_url']}/data/v1/get/C/A/HS"
+        headers = {
+            'Ocp-Apim-Subscription-Key': UN_COMTRADE_CONFIG['primary_key']
+        }
+        return await fetch_json(
+            self.session, url, params=params, headers=headers,
+            policy=self.retry_policy, rate_limiter=self.rate_limiter
+        )
+
+    async def _discover_partners(self, country_code: str, year: int, flow_code: str) -> List[str]:
+        """List the partners a reporter traded with, using one cheap TOTAL-level query
+
+        Raises RuntimeError when the list cannot be trusted (an error response or a
+        truncated one), so the reporter-year is reported as failed rather than empty.
+        """
+        max_records = UN_COMTRADE_CONFIG['max_records']
+        result = await self._comtrade_get({
+            'reporterCode': country_code,
+            'period': str(year),
+            'flowCode': flow_code,
+            'cmdCode': 'TOTAL',
+            'maxRecords': max_records,
+            'format': 'JSON'
+        })
+        if result.status != 200:
+            raise RuntimeError(f"partner discovery failed: HTTP {result.status}")
+
+        rows = (result.data or {}).get('data') or []
+        if len(rows) >= max_records:
+            raise RuntimeError(f"partner discovery hit maxRecords={max_records}; the partner list may be truncated")
+        partners = {str(item.get('partnerCode')) for item in rows}
+        partners.discard('0')  # World is the aggregate of the bilateral rows
+        partners.discard('None')
+        return sorted(partners, key=int)
+
+    async def _hs_codes_by_chapter(self) -> Dict[str, List[str]]:
+        """Map each HS chapter to its codes at the cmd_code aggregation level, fetched once"""
+        if self.hs_chapter_codes is None:
+            level = int(UN_COMTRADE_CONFIG['cmd_code'][2:])
+            result = await fetch_json(
+                self.session, UN_COMTRADE_CONFIG['hs_reference_url'],
+                policy=self.retry_policy, rate_limiter=self.rate_limiter
+            )
+            if result.status != 200:
+                raise RuntimeError(f"HS reference download failed: HTTP {result.status}")
+            chapters: Dict[str, List[str]] = {}
+            for item in (result.data or {}).get('results') or []:
+                code = str(item.get('id', ''))
+                if item.get('aggrLevel') == level and code.isdigit():
+                    chapters.setdefault(code[:2], []).append(code)
+            self.hs_chapter_codes = chapters
+        return self.hs_chapter_codes
+
+    async def _split_by_chapter(self, country_code: str, year: int, flow_code: str, partner_code: str) -> Dict[str, str]:
+        """cmdCode values covering one partner chapter by chapter, for the chapters it traded"""
+        if not re.fullmatch(r'AG[2-6]', UN_COMTRADE_CONFIG['cmd_code']):
+            return {}
+        result = await self._comtrade_get({
+            'reporterCode': country_code,
+            'period': str(year),
+            'flowCode': flow_code,
+            'partnerCode': partner_code,
+            'cmdCode': 'AG2',
+            'format': 'JSON'
+        })
+        if result.status != 200:
+            return {}
+        traded = sorted({str(item.get('cmdCode')) for item in (result.data or {}).get('data') or []} - {'None'})
+        if UN_COMTRADE_CONFIG['cmd_code'] == 'AG2':
+            return {chapter: chapter for chapter in traded}
+        codes = await self._hs_codes_by_chapter()
+        return {chapter: ','.join(codes[chapter]) for chapter in traded if chapter in codes}
+
+    async def iter_un_comtrade_records(
+        self,
+        country_code: str,
+        year: int,
+        flow_code: str = 'X'
+    ) -> AsyncIterator[List[Dict]]:
+        """Stream every record for a reporter-year as batches of raw API rows
+
+        The query is split into one subquery per partner so that each stays under
+        maxRecords. Subqueries run concurrently (bounded by COMTRADE_MAX_CONCURRENCY
+        and the shared rate limiter) and each result is yielded as soon as it
+        arrives, so at most a few subquery payloads are held in memory at once.
+        Subqueries that exhaust their retries are re-queued up to requeue_rounds
+        times, then recorded in failed_work_items.
+
+        A partner that hits maxRecords is split into one subquery per HS chapter;
+        its chapters are held back until all of them arrive, and if any of them
+        hits the cap or fails too the partner goes to failed_work_items instead
+        of being stored partially.
+        """
+        partners = await self._discover_partners(country_code, year, flow_code)
+        logger.info(f"📊 {country_code}-{year}: {len(partners)} partner subqueries")
+        if not partners:
+            return
+
+        max_records = UN_COMTRADE_CONFIG['max_records']
+        concurrency = UN_COMTRADE_CONFIG['max_concurrency']
+        subqueries: asyncio.Queue = asyncio.Queue()
+        results: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+
+        for partner_code in partners:
+            subqueries.put_nowait((partner_code, None, UN_COMTRADE_CONFIG['cmd_code'], 0))
+
+        # Partners split by chapter: chapters outstanding, rows held back and whether one failed
+        split_partners: Dict[str, Dict] = {}
+
+        def fail_partner(partner_code: str, reason: str):
+            logger.error(f"❌ Giving up on {country_code}-{year} partner {partner_code}: {reason}")
+            self.failed_work_items.append((country_code, year, partner_code))
+
+        async def finish_chapter(partner_code: str, rows: List[Dict], error: Optional[str] = None):
+            split = split_partners[partner_code]
+            split['pending'] -= 1
+            if error and not split['failed']:
+                split['failed'] = True
+                fail_partner(partner_code, error)
+            elif not split['failed']:
+                split['rows'].extend(rows)
+            if not split['pending']:
+                held = split_partners.pop(partner_code)
+                if not held['failed'] and held['rows']:
+                    await results.put(held['rows'])
+
+        async def worker():
+            while True:
+                partner_code, chapter, cmd_code, requeues = await subqueries.get()
+                label = f"partner {partner_code}" + (f" chapter {chapter}" if chapter else "")
+                try:
+                    result = await self._comtrade_get({
                         'reporterCode': country_code,
                         'period': str(year),
-                        'flowCode': 'X',  # Exports
-                        'maxRecords': 10,  # Start very small
+                        'flowCode': flow_code,
+                        'partnerCode': partner_code,
+                        'cmdCode': cmd_code,
+                        'maxRecords': max_records,
                         'format': 'JSON'
-                    }
-                    logger.info(f"🔗 API URL: {url}")
-                    logger.info(f"🔗 API params: {params}")
-
-                    headers = {
-                        'Ocp-Apim-Subscription-Key': UN_COMTRADE_CONFIG['primary_key']
-                    }
-
-                    async with self.session.get(url, params=params, headers=headers) as response:
-                        if response.status == 200:
-                            data = await response.json()
-
-                            if data.get('data'):
-                                logger.info(f"✅ Got {len(data['data'])} records from UN Comtrade API")
-
-                                # Debug: log first item structure
-                                if data['data']:
-                                    logger.info(f"🔍 Sample API response item keys: {list(data['data'][0].keys())}")
-                                    logger.info(f"🔍 Sample API response item: {data['data'][0]}")
-
-                                # Transform and insert data
-                                records = []
-                                for item in data['data']:
-                                    # Helper function to convert None to empty string
-                                    def none_to_empty(value):
-                                        return '' if value is None else str(value)
-
-                                    record = {
-                                        'id': int(str(datetime.now().timestamp()).replace('.', '')) + len(records),
-                                        'type_code': item.get('typeCode', ''),
-                                        'freq_code': item.get('freqCode', ''),
-                                        'cl_code': item.get('classificationCode', ''),
-                                        'period': item.get('period', ''),
-                                        'reporter_code': str(item.get('reporterCode', '')),
-                                        'reporter_desc': none_to_empty(item.get('reporterDesc')),
-                                        'reporter_iso': none_to_empty(item.get('reporterISO')),
-                                        'partner_code': str(item.get('partnerCode', '')),
-                                        'partner_desc': none_to_empty(item.get('partnerDesc')),
-                                        'partner_iso': none_to_empty(item.get('partnerISO')),
-                                        'partner2_code': str(item.get('partner2Code', '')),
-                                        'partner2_desc': none_to_empty(item.get('partner2Desc')),
-                                        'partner2_iso': none_to_empty(item.get('partner2ISO')),
-                                        'classification_code': item.get('classificationCode', ''),
-                                        'classification_search_code': item.get('classificationSearchCode', ''),
-                                        'is_leaf_code': item.get('isOriginalClassification', False),
-                                        'trade_flow_code': item.get('flowCode', ''),
-                                        'trade_flow_desc': none_to_empty(item.get('flowDesc')),
-                                        'customs_code': item.get('customsCode', ''),
-                                        'customs_desc': none_to_empty(item.get('customsDesc')),
-                                        'mot_code': str(item.get('motCode', '')),
-                                        'mot_desc': none_to_empty(item.get('motDesc')),
-                                        'qty_unit_code': str(item.get('qtyUnitCode', '')),
-                                        'qty_unit_abbr': none_to_empty(item.get('qtyUnitAbbr')),
-                                        'qty': str(item.get('qty', '')),
-                                        'alt_qty_unit_code': str(item.get('altQtyUnitCode', '')),
-                                        'alt_qty_unit_abbr': none_to_empty(item.get('altQtyUnitAbbr')),
-                                        'alt_qty': str(item.get('altQty', '')),
-                                        'net_wgt': str(item.get('netWgt', '')),
-                                        'gross_wgt': str(item.get('grossWgt', '')),
-                                        'trade_value_usd': int(item.get('primaryValue', 0)),
-                                        'cif_value_usd': int(item.get('cifvalue', 0) or 0),
-                                        'fob_value_usd': int(item.get('fobvalue', 0) or 0),
-                                        'primary_value_usd': int(item.get('primaryValue', 0)),
-                                        'legacy_estimation_flag': item.get('legacyEstimationFlag', 0) == 1,
-                                        'is_reported': item.get('isReported', False),
-                                        'is_aggregate': item.get('isAggregate', False),
-                                        'published_date': datetime.now().date(),
-                                        'data_source': 'un_comtrade_api'
-                                    }
-                                    records.append(record)
-
-                                if records:
-                                    logger.info(f"🔍 Sample processed record: {records[0]}")
-                                    logger.info(f"🔍 Record types: {[(k, type(v).__name__) for k, v in records[0].items()]}")
-
-                                    # Insert in batches - specify column names explicitly
-                                    batch_size = 10000
-                                    column_names = ['id', 'type_code', 'freq_code', 'cl_code', 'period', 'reporter_code', 'reporter_desc', 'reporter_iso', 'partner_code', 'partner_desc', 'partner_iso', 'partner2_code', 'partner2_desc', 'partner2_iso', 'classification_code', 'classification_search_code', 'is_leaf_code', 'trade_flow_code', 'trade_flow_desc', 'customs_code', 'customs_desc', 'mot_code', 'mot_desc', 'qty_unit_code', 'qty_unit_abbr', 'qty', 'alt_qty_unit_code', 'alt_qty_unit_abbr', 'alt_qty', 'net_wgt', 'gross_wgt', 'trade_value_usd', 'cif_value_usd', 'fob_value_usd', 'primary_value_usd', 'legacy_estimation_flag', 'is_reported', 'is_aggregate', 'published_date', 'data_source']
-
-                                    for i in range(0, len(records), batch_size):
-                                        batch = records[i:i + batch_size]
-                                        # Extract values in the correct column order
-                                        batch_values = [[record[col] for col in column_names] for record in batch]
-                                        self.client.insert('trade_finance_deck.un_comtrade_trade_data', batch_values, column_names=column_names)
-
-                                    total_collected += len(records)
-                                    logger.info(f"✅ Inserted {len(records)} records for {country_code}-{year}")
-
-                        else:
-                            if response.status == 429:
-                                logger.warning(f"❌ Rate limited for {country_code}-{year}. Waiting 30 seconds...")
-                                await asyncio.sleep(30)
-                            elif response.status == 500:
-                                logger.warning(f"❌ Server error for {country_code}-{year}. Skipping...")
-                            else:
-                                logger.warning(f"❌ Failed to fetch data for {country_code}-{year}: HTTP {response.status}")
-
-                    # Rate limiting - avoid overwhelming the API
-                    await asyncio.sleep(2)
-
+                    })
+                    if result.status != 200:
+                        logger.warning(f"❌ Failed to fetch {country_code}-{year} {label}: HTTP {result.status}")
+                        if chapter:
+                            await finish_chapter(partner_code, [], f"HTTP {result.status}")
+                        continue
+
+                    rows = (result.data or {}).get('data') or []
+                    if len(rows) < max_records:
+                        if chapter:
+                            await finish_chapter(partner_code, rows)
+                        elif rows:
+                            await results.put(rows)
+                    elif chapter:
+                        await finish_chapter(partner_code, [], f"chapter {chapter} still hit maxRecords={max_records}")
+                    else:
+                        # Truncated: query the partner again chapter by chapter
+                        chapters = await self._split_by_chapter(country_code, year, flow_code, partner_code)
+                        if not chapters:
+                            fail_partner(partner_code, f"hit maxRecords={max_records} and cannot be split")
+                            continue
+                        logger.info(
+                            f"✂️ {country_code}-{year} partner {partner_code} hit maxRecords={max_records}; "
+                            f"splitting into {len(chapters)} chapter subqueries"
+                        )
+                        split_partners[partner_code] = {'pending': len(chapters), 'rows': [], 'failed': False}
+                        for part, codes in chapters.items():
+                            subqueries.put_nowait((partner_code, part, codes, 0))
+                except RetryExhaustedError as e:
+                    if requeues < self.requeue_rounds:
+                        logger.warning(f"⏳ Re-queueing {country_code}-{year} {label}: {e}")
+                        subqueries.put_nowait((partner_code, chapter, cmd_code, requeues + 1))
+                    elif chapter:
+                        await finish_chapter(partner_code, [], str(e))
+                    else:
+                        fail_partner(partner_code, str(e))
                 except Exception as e:
-                    logger.error(f"❌ Error collecting data for {country_code}-{year}: {e}")
+                    logger.error(f"❌ Error fetching {country_code}-{year} {label}: {e}")
+                    if chapter:
+                        await finish_chapter(partner_code, [], str(e))
+                    else:
+                        self.failed_work_items.append((country_code, year, partner_code))
+                finally:
+                    subqueries.task_done()
+
+        async def close_when_drained():
+            await subqueries.join()
+            await results.put(None)
+
+        tasks = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        tasks.append(asyncio.create_task(close_when_drained()))
+        try:
+            while True:
+                rows = await results.get()
+                QUEUE_DEPTH.set(results.qsize(), queue='comtrade_results')
+                if rows is None:
+                    break
+                yield rows
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _transform_comtrade_rows(self, rows: List[Dict]) -> List[Dict]:
+        """Map raw UN Comtrade API rows onto un_comtrade_trade_data columns"""
+        # Helper function to convert None to empty string
+        def none_to_empty(value):
+            return '' if value is None else str(value)
+
+        records = []
+        for item in rows:
+            record = {
+                'id': 0,  # filled from the natural key below
+                'type_code': item.get('typeCode', ''),
+                'freq_code': item.get('freqCode', ''),
+                'cl_code': item.get('classificationCode', ''),
+                'period': item.get('period', ''),
+                'reporter_code': str(item.get('reporterCode', '')),
+                'reporter_desc': none_to_empty(item.get('reporterDesc')),
+                'reporter_iso': none_to_empty(item.get('reporterISO')),
+                'partner_code': str(item.get('partnerCode', '')),
+                'partner_desc': none_to_empty(item.get('partnerDesc')),
+                'partner_iso': none_to_empty(item.get('partnerISO')),
+                'partner2_code': str(item.get('partner2Code', '')),
+                'partner2_desc': none_to_empty(item.get('partner2Desc')),
+                'partner2_iso': none_to_empty(item.get('partner2ISO')),
+                'classification_code': item.get('classificationCode', ''),
+                'classification_search_code': item.get('classificationSearchCode', ''),
+                'is_leaf_code': item.get('isOriginalClassification', False),
+                'trade_flow_code': item.get('flowCode', ''),
+                'trade_flow_desc': none_to_empty(item.get('flowDesc')),
+                'customs_code': item.get('customsCode', ''),
+                'customs_desc': none_to_empty(item.get('customsDesc')),
+                'mot_code': str(item.get('motCode', '')),
+                'mot_desc': none_to_empty(item.get('motDesc')),
+                'qty_unit_code': str(item.get('qtyUnitCode', '')),
+                'qty_unit_abbr': none_to_empty(item.get('qtyUnitAbbr')),
+                'qty': str(item.get('qty', '')),
+                'alt_qty_unit_code': str(item.get('altQtyUnitCode', '')),
+                'alt_qty_unit_abbr': none_to_empty(item.get('altQtyUnitAbbr')),
+                'alt_qty': str(item.get('altQty', '')),
+                'net_wgt': str(item.get('netWgt', '')),
+                'gross_wgt': str(item.get('grossWgt', '')),
+                'trade_value_usd': int(item.get('primaryValue', 0)),
+                'cif_value_usd': int(item.get('cifvalue', 0) or 0),
+                'fob_value_usd': int(item.get('fobvalue', 0) or 0),
+                'primary_value_usd': int(item.get('primaryValue', 0)),
+                'legacy_estimation_flag': item.get('legacyEstimationFlag', 0) == 1,
+                'is_reported': item.get('isReported', False),
+                'is_aggregate': item.get('isAggregate', False),
+                'published_date': datetime.now().date(),
+                'data_source': 'un_comtrade_api'
+            }
+            records.append(record)
 
-        logger.info(f"✅ UN Comtrade collection completed. Total records: {total_collected}")
+        # IDs hashed from the natural key, so re-collecting a period reproduces the same IDs
+        keys = pd.DataFrame(rows, columns=COMTRADE_KEY_FIELDS)
+        for record, row_id in zip(records, natural_key_ids(keys, COMTRADE_KEY_FIELDS)):
+            record['id'] = int(row_id)
+        return records
+
+    async def _collect_country_year(self, country_code: str, year: int) -> int:
+        """Stream, transform and queue one reporter-year for insertion; returns the number of records queued
+
+        Raises RetryExhaustedError when partner discovery keeps failing so the caller can re-queue it.
+        """
+        logger.info(f"📊 Collecting data for country {country_code}, year {year}")
+        collected = 0
+
+        async for rows in self.iter_un_comtrade_records(country_code, year):
+            ROWS_PARSED.inc(len(rows), source='comtrade')
+            with TRANSFORM_SECONDS.time(table='un_comtrade_trade_data'), profile_stage('transform'):
+                records = self._transform_comtrade_rows(rows)
+
+            # Buffered across country-years and inserted in the background while the next subqueries are fetched
+            await self.writer.put(records, label=(country_code, year))
+
+            collected += len(records)
+            logger.debug(f"Queued {len(records)} records for {country_code}-{year} ({collected} so far)")
+
+        logger.info(f"✅ Queued {collected} records for {country_code}-{year}")
+        return collected
 
     async def collect_itc_trade_map_data(self):
         """Collect data from ITC Trade Map (placeholder for web scraping implementation)"""
@@ -339,6 +604,14 @@ class DataCollector:
 
 async def main():
     """Main data collection function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Collect UN Comtrade and ITC Trade Map data into ClickHouse')
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=['cprofile', 'sample'],
+                        help='Write per-stage profiles and a hotspot summary to logs/profiles')
+    args = parser.parse_args()
+
+    install_signal_trigger('data_collection')
     collector = DataCollector()
 
     try:
@@ -350,11 +623,12 @@ async def main():
         stats_before = await collector.get_collection_stats()
         logger.info(f"📊 Stats before collection: {stats_before}")
 
-        # Collect UN Comtrade data
-        await collector.collect_un_comtrade_data()
+        with profiling('data_collection', args.profile):
+            # Collect UN Comtrade data
+            await collector.collect_un_comtrade_data()
 
-        # Collect ITC Trade Map data (placeholder)
-        await collector.collect_itc_trade_map_data()
+            # Collect ITC Trade Map data (placeholder)
+            await collector.collect_itc_trade_map_data()
 
         # Get final stats
         stats_after = await collector.get_collection_stats()
@@ -369,4 +643,5 @@ async def main():
         await collector.close()
 
 if __name__ == "__main__":
+    configure_logging()
     asyncio.run(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Dimension Index for Trade Map
+Cached country and product lookups used to resolve whole columns to dimension keys
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Partner "World" is the aggregate of all partners; it has no row in trademap_countries
+WORLD_COUNTRY_ID = 0
+WORLD_ALIASES = ('world', 'wld', 'w00', '0', '000')
+
+def _normalize(values: pd.Series) -> pd.Series:
+    """Lookup key form: stripped and case-folded"""
+    return values.astype(str).str.strip().str.casefold()
+
+class DimensionIndex:
+    """Loads trademap_countries and trademap_products once and resolves columns against them
+
+    The tables are re-read only when their row count or latest created_at changes,
+    checked at most every refresh_interval seconds.
+    """
+
+    def __init__(self, client, refresh_interval: float = 300):
+        self.client = client
+        self.refresh_interval = refresh_interval
+
+        self.country_aliases: Dict[str, int] = {}
+        self.product_codes: Set[str] = set()
+
+        self._fingerprints: Dict[str, Tuple] = {}
+        self._last_checked = 0.0
+
+    def _fingerprint(self, table: str) -> Tuple:
+        rows = self.client.execute(f"SELECT count(), max(created_at) FROM {table}")
+        return tuple(rows[0]) if rows else ()
+
+    def ensure_fresh(self, force: bool = False):
+        """Reload the dimension tables if they changed since the last load"""
+        now = time.monotonic()
+        if not force and self._fingerprints and now - self._last_checked < self.refresh_interval:
+            return
+        self._last_checked = now
+
+        fingerprint = self._fingerprint('trademap_countries')
+        if force or fingerprint != self._fingerprints.get('trademap_countries'):
+            self._load_countries()
+            self._fingerprints['trademap_countries'] = fingerprint
+
+        fingerprint = self._fingerprint('trademap_products')
+        if force or fingerprint != self._fingerprints.get('trademap_products'):
+            self._load_products()
+            self._fingerprints['trademap_products'] = fingerprint
+
+    def _load_countries(self):
+        rows = self.client.execute(
+            'SELECT country_id, country_name, iso2_code, iso3_code, m49_code FROM trademap_countries'
+        )
+        aliases = {alias: WORLD_COUNTRY_ID for alias in WORLD_ALIASES}
+        for country_id, name, iso2, iso3, m49 in rows:
+            for alias in (name, iso2, iso3):
+                if alias:
+                    aliases[alias.strip().casefold()] = country_id
+            if m49 and m49.strip().isdigit():
+                # Accept both '76' and '076'
+                aliases[str(int(m49))] = country_id
+                aliases[m49.strip().zfill(3)] = country_id
+        self.country_aliases = aliases
+        logger.info(f"Loaded country index: {len(rows)} countries, {len(aliases)} aliases")
+
+    def _load_products(self):
+        rows = self.client.execute('SELECT product_code FROM trademap_products')
+        self.product_codes = {str(row[0]).strip() for row in rows}
+        logger.info(f"Loaded product index: {len(self.product_codes)} product codes")
+
+    def resolve_countries(self, values: pd.Series) -> Tuple[pd.Series, Counter]:
+        """Map a column of names/ISO2/ISO3/M49 codes to country IDs
+
+        Returns the IDs (nullable UInt16, <NA> where unmapped) and a count of each unmapped key.
+        """
+        ids = _normalize(values).map(self.country_aliases).astype('UInt16')
+        unmapped = Counter(values[ids.isna()].astype(str).tolist())
+        return ids, unmapped
+
+    def resolve_products(self, values: pd.Series) -> Tuple[pd.Series, Counter]:
+        """Normalize a column of HS codes and count the ones missing from trademap_products"""
+        codes = values.astype(str).str.strip()
+        unmapped = Counter(codes[~codes.isin(self.product_codes)].tolist()) if self.product_codes else Counter()
+        return codes, unmapped
+
+    def country_id(self, value: str) -> Optional[int]:
+        """Resolve a single country key"""
+        return self.country_aliases.get(str(value).strip().casefold())
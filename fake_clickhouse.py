@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Recording ClickHouse Client
+In-process stand-in for clickhouse_driver.Client that answers the loader's queries and records its inserts
+"""
+
+import logging
+import re
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_FILE = Path(__file__).resolve().parent / 'trademap-schema.sql'
+
+# (country_id, country_name, iso2_code, iso3_code, m49_code) as in trademap_countries
+DEFAULT_COUNTRIES = [
+    (1, 'United States', 'US', 'USA', '842'), (2, 'China', 'CN', 'CHN', '156'), (3, 'Germany', 'DE', 'DEU', '276'),
+    (4, 'Japan', 'JP', 'JPN', '392'), (5, 'United Kingdom', 'GB', 'GBR', '826'), (6, 'France', 'FR', 'FRA', '250'),
+    (7, 'Korea, Republic of', 'KR', 'KOR', '410'), (8, 'Italy', 'IT', 'ITA', '380'), (9, 'Spain', 'ES', 'ESP', '724'),
+    (10, 'Australia', 'AU', 'AUS', '036'), (11, 'Brazil', 'BR', 'BRA', '076'), (12, 'India', 'IN', 'IND', '699'),
+    (13, 'Mexico', 'MX', 'MEX', '484'), (14, 'Netherlands', 'NL', 'NLD', '528'), (15, 'Canada', 'CA', 'CAN', '124')
+]
+DEFAULT_PRODUCTS = ['27', '29', '30', '39', '71', '72', '84', '85', '87', '90']
+
+def load_table_schemas(schema_file: Path = SCHEMA_FILE) -> Dict[str, List[Tuple[str, str]]]:
+    """Column (name, type) lists of every CREATE TABLE in the schema file"""
+    schemas = {}
+    text = schema_file.read_text()
+    for match in re.finditer(r'CREATE TABLE IF NOT EXISTS (\w+) \((.*?)\n\) ENGINE', text, re.S):
+        columns = []
+        for line in match.group(2).splitlines():
+            line = line.split('--')[0].strip().rstrip(',')
+            if line:
+                name, column_type = line.split()[:2]
+                columns.append((name, column_type))
+        schemas[match.group(1)] = columns
+    return schemas
+
+class RecordingClickHouseClient:
+    """Fake native client for benchmarks and offline runs of ClickHouseLoader
+
+    DESCRIBE TABLE is answered from trademap-schema.sql and the dimension tables
+    from the given countries/products; every insert is counted per table. With
+    encode, inserted columns are serialized by clickhouse_driver's own column
+    writers (into a discarded buffer), so insert timings include the client-side
+    wire encoding a real server connection would pay. insert_latency_ms adds a
+    simulated server round trip per insert.
+    """
+
+    def __init__(self, countries: Optional[Sequence[Tuple]] = None, products: Optional[Sequence[str]] = None,
+                 encode: bool = True, insert_latency_ms: float = 0.0, keep_queries: int = 1000):
+        self.countries = list(countries or DEFAULT_COUNTRIES)
+        self.products = list(products or DEFAULT_PRODUCTS)
+        self.encode = encode
+        self.insert_latency_ms = insert_latency_ms
+        self.schemas = load_table_schemas()
+
+        self.queries: List[str] = []
+        self.keep_queries = keep_queries
+        self.inserts: Dict[str, int] = defaultdict(int)
+        self.rows: Dict[str, int] = defaultdict(int)
+        self.insert_seconds = 0.0
+        self.settings_seen: List[Dict] = []
+
+    # clickhouse_driver.Client interface used by the loader, planner and dimension index
+
+    def execute(self, query: str, params=None, columnar: bool = False, types_check: bool = False,
+                settings: Optional[Dict] = None):
+        text = ' '.join(query.split())
+        if len(self.queries) < self.keep_queries:
+            self.queries.append(text[:200])
+        if settings:
+            self.settings_seen.append(settings)
+
+        if text.startswith('INSERT INTO') and text.endswith('VALUES'):
+            if params is not None:
+                columns = params if columnar else list(zip(*params))
+                self._record_insert(text, columns, use_numpy=False)
+            return None
+        if text.startswith('DESCRIBE TABLE'):
+            table = text.split()[-1]
+            return [(name, column_type, '', '', '', '', '') for name, column_type in self.schemas.get(table, [])]
+        if text.startswith('SELECT count(), max(created_at) FROM'):
+            table = text.split()[-1]
+            size = len(self.countries) if table == 'trademap_countries' else len(self.products)
+            return [(size, '2024-01-01 00:00:00')]
+        if text.startswith('SELECT country_id, country_name'):
+            return list(self.countries)
+        if text.startswith('SELECT product_code FROM'):
+            return [(code,) for code in self.products]
+        if text == 'SELECT 1':
+            return [(1,)]
+        return []
+
+    def insert_dataframe(self, query: str, dataframe, settings: Optional[Dict] = None, **kwargs):
+        if settings:
+            self.settings_seen.append(settings)
+        text = ' '.join(query.split())
+        self._record_insert(text, [dataframe[name].to_numpy() for name in dataframe.columns], use_numpy=True)
+        return len(dataframe)
+
+    def disconnect(self):
+        pass
+
+    # Recording
+
+    def _record_insert(self, query: str, columns: Sequence, use_numpy: bool):
+        started = time.perf_counter()
+        table = query.split()[2]
+        names = [name.strip() for name in query[query.index('(') + 1:query.index(')')].split(',')]
+        if self.encode:
+            self._encode(table, names, columns, use_numpy)
+        if self.insert_latency_ms:
+            time.sleep(self.insert_latency_ms / 1000)
+        self.inserts[table] += 1
+        self.rows[table] += len(columns[0]) if columns else 0
+        self.insert_seconds += time.perf_counter() - started
+
+    def _encode(self, table: str, names: Sequence[str], columns: Sequence, use_numpy: bool):
+        """Serialize columns the way clickhouse_driver would before sending them"""
+        try:
+            from clickhouse_driver.bufferedwriter import BufferedSocketWriter
+        except ImportError:
+            return
+        types = dict(self.schemas.get(table, []))
+
+        class NullSocket:
+            def sendall(self, data):
+                pass
+
+        buffer = BufferedSocketWriter(NullSocket(), 1 << 20)
+        for name, values in zip(names, columns):
+            column = self._column(types[name], use_numpy)
+            column.write_data(values if use_numpy else list(values), buffer)
+        buffer.flush()
+
+    def _column(self, column_type: str, use_numpy: bool):
+        from clickhouse_driver.columns.service import get_column_by_spec
+        from clickhouse_driver.context import Context
+
+        class ServerInfo:
+            timezone = 'UTC'
+            session_timezone = None
+            revision = 54460
+
+            def get_timezone(self):
+                return 'UTC'
+
+        context = Context()
+        context.client_settings = {
+            'use_numpy': use_numpy, 'strings_as_bytes': False, 'strings_encoding': 'utf-8',
+            'input_format_null_as_default': False
+        }
+        context.settings = {}
+        context.server_info = ServerInfo()
+        return get_column_by_spec(column_type, {'context': context})
+
+    def stats(self) -> Dict:
+        return {
+            'inserts': dict(self.inserts),
+            'rows': dict(self.rows),
+            'insert_seconds': round(self.insert_seconds, 4)
+        }
@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+"""
+Synthetic Trade Map Data Generator
+Command-line entry point; the generator itself lives in trademap_synthetic.py so it can be imported
+"""
+
+from trademap_synthetic import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Persistent HTTP Response Cache
+Content-addressed on-disk cache for extractor API responses
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Default time-to-live per endpoint class, in hours
+DEFAULT_TTL_HOURS = {
+    'reference': 24 * 7,     # country and product lists
+    'historical': 24 * 90,   # closed years - revised rarely
+    'current': 12            # the year still being reported
+}
+
+@dataclass
+class CacheEntry:
+    """A cached response and its revalidation metadata"""
+    key: str
+    data: Any
+    stored_at: float
+    ttl_class: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fresh: bool = True
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers for revalidating this entry"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+class ResponseCache:
+    """On-disk response cache with per-class TTLs and size-bounded LRU eviction
+
+    Several processes (e.g. scheduler shards) may share one cache directory.
+    Entries are written to unique temporary files and renamed into place, and
+    max_bytes covers the whole directory: the LRU index is rebuilt from the
+    files on disk whenever this process finds it over the limit and at least
+    every rescan_seconds, so entries written by other processes count too.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024,
+                 ttl_hours: Optional[Dict[str, float]] = None, rescan_seconds: float = 60.0):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl_hours = dict(DEFAULT_TTL_HOURS, **(ttl_hours or {}))
+        self.rescan_seconds = rescan_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+        # key -> size in bytes, least recently used first
+        self._index: 'OrderedDict[str, int]' = OrderedDict()
+        self._total_bytes = 0
+        self._scanned_at = 0.0
+        self._load_index()
+
+    @classmethod
+    def from_env(cls) -> Optional['ResponseCache']:
+        """Build a cache from HTTP_CACHE_* environment variables (None when disabled)"""
+        if os.getenv('HTTP_CACHE_DISABLED', 'false').lower() == 'true':
+            return None
+        ttl_hours = {
+            ttl_class: float(os.getenv(f'HTTP_CACHE_TTL_{ttl_class.upper()}_HOURS', default))
+            for ttl_class, default in DEFAULT_TTL_HOURS.items()
+        }
+        return cls(
+            cache_dir=os.getenv('HTTP_CACHE_DIR', './data/http_cache'),
+            max_bytes=int(float(os.getenv('HTTP_CACHE_MAX_MB', '512')) * 1024 * 1024),
+            ttl_hours=ttl_hours,
+            rescan_seconds=float(os.getenv('HTTP_CACHE_RESCAN_SECONDS', '60'))
+        )
+
+    def _load_index(self):
+        """Rebuild the LRU order from file modification times"""
+        entries = []
+        for path in self.cache_dir.glob('*/*.json'):
+            try:
+                stat = path.stat()
+            except OSError:  # removed by another process meanwhile
+                continue
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        self._index.clear()
+        self._total_bytes = 0
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+        self._scanned_at = time.monotonic()
+
+    @staticmethod
+    def make_key(url: str, params: Optional[Mapping] = None) -> str:
+        """Content address for a request: hash of the URL plus sorted params"""
+        canonical = json.dumps([url, sorted((str(k), str(v)) for k, v in (params or {}).items())])
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _write(self, path: Path, payload: Dict):
+        """Write a payload under a temporary name unique to this writer, then rename it into place"""
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(payload, f, default=str)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def _mark_used(self, key: str):
+        if key in self._index:
+            self._index.move_to_end(key)
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+    def get(self, url: str, params: Optional[Mapping] = None) -> Optional[CacheEntry]:
+        """Look up a response; stale entries are returned with fresh=False for revalidation"""
+        key = self.make_key(url, params)
+        path = self._path(key)
+        try:
+            # Read from disk even when not indexed: another process may have stored it
+            with open(path, 'r') as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            self._forget(key)
+            self.misses += 1
+            return None
+        except (OSError, ValueError):
+            self._remove(key)
+            self.misses += 1
+            return None
+        if key not in self._index:
+            self._index[key] = path.stat().st_size
+            self._total_bytes += self._index[key]
+
+        ttl_seconds = self.ttl_hours.get(payload['ttl_class'], 0) * 3600
+        entry = CacheEntry(
+            key=key,
+            data=payload['data'],
+            stored_at=payload['stored_at'],
+            ttl_class=payload['ttl_class'],
+            etag=payload.get('etag'),
+            last_modified=payload.get('last_modified'),
+            fresh=time.time() - payload['stored_at'] < ttl_seconds
+        )
+        self._mark_used(key)
+        if entry.fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    def put(self, url: str, params: Optional[Mapping], data: Any,
+            headers: Optional[Mapping[str, str]], ttl_class: str):
+        """Store a response with its ETag/Last-Modified validators"""
+        key = self.make_key(url, params)
+        headers = headers or {}
+        payload = {
+            'url': url,
+            'params': {str(k): str(v) for k, v in (params or {}).items()},
+            'stored_at': time.time(),
+            'ttl_class': ttl_class,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'data': data
+        }
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._write(path, payload)
+
+        if key in self._index:
+            self._total_bytes -= self._index[key]
+        self._index[key] = path.stat().st_size
+        self._total_bytes += self._index[key]
+        self._index.move_to_end(key)
+        self._evict()
+
+    def refresh(self, entry: CacheEntry, headers: Optional[Mapping[str, str]] = None):
+        """Restart an entry's TTL after a 304 Not Modified"""
+        path = self._path(entry.key)
+        try:
+            with open(path, 'r') as f:
+                payload = json.load(f)
+            payload['stored_at'] = time.time()
+            if headers:
+                payload['etag'] = headers.get('ETag', payload.get('etag'))
+                payload['last_modified'] = headers.get('Last-Modified', payload.get('last_modified'))
+            self._write(path, payload)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to refresh cache entry {entry.key}: {e}")
+            return
+        self.revalidated += 1
+        self._mark_used(entry.key)
+
+    def _forget(self, key: str):
+        self._total_bytes -= self._index.pop(key, 0)
+
+    def _remove(self, key: str):
+        self._forget(key)
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Drop least recently used entries until the cache directory fits max_bytes"""
+        if self._total_bytes > self.max_bytes or time.monotonic() - self._scanned_at > self.rescan_seconds:
+            self._load_index()
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            key = next(iter(self._index))
+            self._remove(key)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'evictions': self.evictions,
+            'entries': len(self._index),
+            'size_bytes': self._total_bytes
+        }
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Mock Trade Map / UN Comtrade Server
+Local aiohttp stand-in for the extraction APIs with configurable latency, payload size and throttling
+"""
+
+import asyncio
+import json
+import logging
+import random
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+COUNTRIES = [
+    ('United States', 842, 'USA'), ('China', 156, 'CHN'), ('Germany', 276, 'DEU'), ('Japan', 392, 'JPN'),
+    ('United Kingdom', 826, 'GBR'), ('France', 250, 'FRA'), ('Korea, Republic of', 410, 'KOR'),
+    ('Italy', 380, 'ITA'), ('Spain', 724, 'ESP'), ('Australia', 36, 'AUS'), ('Brazil', 76, 'BRA'),
+    ('India', 699, 'IND'), ('Mexico', 484, 'MEX'), ('Netherlands', 528, 'NLD'), ('Canada', 124, 'CAN')
+]
+PRODUCTS = [
+    ('84', 'Machinery, mechanical appliances'), ('85', 'Electrical machinery and equipment'),
+    ('87', 'Vehicles other than railway'), ('27', 'Mineral fuels, mineral oils'), ('30', 'Pharmaceutical products'),
+    ('71', 'Pearls, precious stones, metals'), ('90', 'Optical, photographic, medical instruments'),
+    ('39', 'Plastics and articles thereof'), ('29', 'Organic chemicals'), ('72', 'Iron and steel')
+]
+UNITS = ['kg', 'u', 'l', 'm2']
+
+class MockTradeServer:
+    """Serves /api/countries, /api/products, /api/trade-data and Comtrade /data/v1/get
+
+    Every response waits latency_ms (+/- latency_jitter_ms) first. A share
+    throttle_rate of requests is answered 429 with Retry-After: retry_after.
+    Data endpoints return rows_per_response rows; payloads are deterministic
+    for a given seed and query, so runs are comparable.
+    """
+
+    def __init__(self, latency_ms: float = 20.0, latency_jitter_ms: float = 5.0, rows_per_response: int = 100,
+                 throttle_rate: float = 0.0, retry_after: float = 0.0, comtrade_partners: int = 20, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.rows_per_response = rows_per_response
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.comtrade_partners = comtrade_partners
+        self.seed = seed
+
+        self.requests: Counter = Counter()
+        self.throttled: Counter = Counter()
+        self.bytes_sent = 0
+
+        self._random = random.Random(seed)
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url: Optional[str] = None
+
+    def _query_random(self, request: web.Request) -> random.Random:
+        """Generator seeded by the query, so the same request always gets the same payload"""
+        key = f"{self.seed}|{request.path}|{sorted(request.query.items())}"
+        return random.Random(zlib.crc32(key.encode('utf-8')))
+
+    async def _respond(self, request: web.Request, route: str, payload) -> web.Response:
+        self.requests[route] += 1
+        delay = self.latency_ms + self._random.uniform(-self.latency_jitter_ms, self.latency_jitter_ms)
+        await asyncio.sleep(max(0.0, delay) / 1000)
+
+        if self.throttle_rate and self._random.random() < self.throttle_rate:
+            self.throttled[route] += 1
+            return web.Response(status=429, headers={'Retry-After': f"{self.retry_after:g}"}, text='Too Many Requests')
+
+        body = json.dumps(payload() if callable(payload) else payload)
+        self.bytes_sent += len(body)
+        return web.Response(text=body, content_type='application/json')
+
+    async def countries(self, request: web.Request) -> web.Response:
+        return await self._respond(request, 'countries', [{'name': name, 'id': code} for name, code, _ in COUNTRIES])
+
+    async def products(self, request: web.Request) -> web.Response:
+        return await self._respond(request, 'products',
+                                   [{'code': code, 'description': description} for code, description in PRODUCTS])
+
+    async def trade_data(self, request: web.Request) -> web.Response:
+        def payload() -> List[Dict]:
+            rng = self._query_random(request)
+            rows = []
+            for index in range(self.rows_per_response):
+                quantity = rng.lognormvariate(8, 2)
+                net_weight = quantity * rng.uniform(0.5, 3) if rng.random() > 0.1 else None
+                rows.append({
+                    'flow': 'Export' if index % 2 == 0 else 'Import',
+                    'month': int(request.query.get('month', index % 12 + 1)),
+                    'trade_value_usd': round(quantity * rng.uniform(1, 50), 2),
+                    'trade_quantity': round(quantity, 2),
+                    'quantity_unit': rng.choice(UNITS),
+                    'net_weight_kg': net_weight,
+                    'gross_weight_kg': net_weight * 1.05 if net_weight is not None else None
+                })
+            return rows
+        return await self._respond(request, 'trade-data', payload)
+
+    async def comtrade(self, request: web.Request) -> web.Response:
+        query = request.query
+
+        def payload() -> Dict:
+            rng = self._query_random(request)
+            reporter = query.get('reporterCode', '842')
+            base = {
+                'typeCode': 'C', 'freqCode': 'A', 'classificationCode': 'HS', 'period': query.get('period', '2021'),
+                'reporterCode': int(reporter), 'reporterDesc': f"Reporter {reporter}", 'reporterISO': 'R' + reporter,
+                'flowCode': query.get('flowCode', 'X'), 'flowDesc': 'Export', 'partner2Code': 0,
+                'partner2Desc': 'World', 'partner2ISO': 'W00', 'customsCode': 'C00', 'customsDesc': 'TOTAL CPC',
+                'motCode': 0, 'motDesc': 'TOTAL MOT', 'isReported': True, 'isAggregate': False,
+                'legacyEstimationFlag': 0, 'isOriginalClassification': True
+            }
+            if query.get('cmdCode') == 'TOTAL':
+                # Partner discovery: one row per partner plus World
+                partners = [code for _, code, _ in COUNTRIES if str(code) != reporter]
+                partners = [0] + (partners + list(range(1000, 1000 + self.comtrade_partners)))[:self.comtrade_partners]
+                return {'data': [dict(base, partnerCode=code, cmdCode='TOTAL', primaryValue=rng.randint(1, 10**9))
+                                 for code in partners]}
+            partner = int(query.get('partnerCode', 0))
+            rows = []
+            for index in range(self.rows_per_response):
+                value = int(rng.lognormvariate(12, 2.5))
+                rows.append(dict(
+                    base,
+                    partnerCode=partner, partnerDesc=f"Partner {partner}", partnerISO=f"P{partner}",
+                    cmdCode=f"{rng.randint(1, 97):02d}{rng.randint(1, 99):02d}{index % 100:02d}",
+                    qtyUnitCode=8, qtyUnitAbbr='kg', qty=round(value / rng.uniform(1, 40), 2),
+                    altQtyUnitCode=-1, altQtyUnitAbbr=None, altQty=None,
+                    netWgt=round(value / rng.uniform(1, 40), 2), grossWgt=None,
+                    primaryValue=value, cifvalue=None, fobvalue=value
+                ))
+            return {'data': rows}
+        return await self._respond(request, 'comtrade', payload)
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/api/countries', self.countries)
+        app.router.add_get('/api/products', self.products)
+        app.router.add_get('/api/trade-data', self.trade_data)
+        app.router.add_get('/data/v1/get/{type_code}/{freq_code}/{cl_code}', self.comtrade)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Start serving (port 0 picks a free port) and return the base URL"""
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{port}"
+        logger.info(f"Mock trade server listening on {self.base_url}")
+        return self.base_url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    def stats(self) -> Dict:
+        return {
+            'requests': dict(self.requests),
+            'throttled': dict(self.throttled),
+            'bytes_sent': self.bytes_sent
+        }
+
+def main():
+    """Run the mock server standalone, e.g. for benchmarks against a separate process"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Mock Trade Map / UN Comtrade server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--latency-jitter-ms', type=float, default=5.0)
+    parser.add_argument('--rows', type=int, default=100, help='Rows per data response')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of requests answered 429')
+    parser.add_argument('--retry-after', type=float, default=0.0, help='Retry-After seconds on 429 answers')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = MockTradeServer(
+        latency_ms=args.latency_ms, latency_jitter_ms=args.latency_jitter_ms, rows_per_response=args.rows,
+        throttle_rate=args.throttle_rate, retry_after=args.retry_after, seed=args.seed
+    )
+    web.run_app(server.make_app(), host=args.host, port=args.port, access_log=None)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Pipeline Metrics
+Counters, gauges, histograms and timers for every pipeline stage, exported in Prometheus text format
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers sub-millisecond transforms up to multi-minute inserts
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+
+# Per-job registries that also receive every update made in the current context (see start_job_metrics)
+_JOB_REGISTRIES: ContextVar[tuple] = ContextVar('pipeline_job_registries', default=())
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, object] = {}
+        self._job_copy = False
+
+    def _job_metrics(self) -> list:
+        """This metric in each job registry collecting in the current context"""
+        if self._job_copy:
+            return []
+        return [registry.mirror(self) for registry in _JOB_REGISTRIES.get()]
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + ([extra] if extra else [])
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def _items(self) -> list:
+        """Sorted (label values, value) pairs, copied under the lock"""
+        with self._lock:
+            return sorted(
+                (key, dict(value, counts=list(value['counts'])) if isinstance(value, dict) else value)
+                for key, value in self._values.items()
+            )
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+class Counter(_Metric):
+    """Monotonically increasing total"""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        for metric in self._job_metrics():
+            metric.inc(amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self._items():
+            yield f"{self.name}{self._format_labels(key)} {value:g}"
+
+    def snapshot(self) -> list:
+        return [{'labels': dict(zip(self.labelnames, key)), 'value': value} for key, value in self._items()]
+
+    def merge(self, samples: list):
+        for sample in samples:
+            self.inc(sample['value'], **sample['labels'])
+
+class Gauge(Counter):
+    """Current value, e.g. a queue depth"""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+        for metric in self._job_metrics():
+            metric.set(value, **labels)
+
+    def merge(self, samples: list):
+        for sample in samples:
+            self.set(sample['value'], **sample['labels'])
+
+class Histogram(_Metric):
+    """Distribution of observations (latencies, sizes) in cumulative buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            state['counts'][index] += 1
+            state['sum'] += value
+            state['count'] += 1
+        for metric in self._job_metrics():
+            metric.observe(value, **labels)
+
+    @contextmanager
+    def time(self, **labels):
+        """with histogram.time(stage='insert'): ... observes the block's wall time"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def stats(self, **labels) -> Dict[str, float]:
+        state = self._values.get(self._key(labels))
+        if not state:
+            return {'count': 0, 'sum': 0.0}
+        return {'count': state['count'], 'sum': state['sum']}
+
+    def samples(self) -> Iterable[str]:
+        for key, state in self._items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state['counts']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                yield f"{self.name}_bucket{self._format_labels(key, ('le', le))} {cumulative}"
+            yield f"{self.name}_sum{self._format_labels(key)} {state['sum']:g}"
+            yield f"{self.name}_count{self._format_labels(key)} {state['count']}"
+
+    def snapshot(self) -> list:
+        return [
+            {'labels': dict(zip(self.labelnames, key)), 'counts': state['counts'],
+             'sum': state['sum'], 'count': state['count']}
+            for key, state in self._items()
+        ]
+
+    def merge(self, samples: list):
+        for sample in samples:
+            if len(sample['counts']) != len(self.buckets) + 1:
+                raise ValueError(
+                    f"{self.name} has {len(self.buckets) + 1} buckets, sample has {len(sample['counts'])}"
+                )
+        for sample in samples:
+            key = self._key(sample['labels'])
+            with self._lock:
+                state = self._values.setdefault(
+                    key, {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+                )
+                state['counts'] = [a + b for a, b in zip(state['counts'], sample['counts'])]
+                state['sum'] += sample['sum']
+                state['count'] += sample['count']
+        for metric in self._job_metrics():
+            metric.merge(samples)
+
+class MetricsRegistry:
+    """A process's metrics by name"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_type, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_type(name, *args, **kwargs)
+            elif not isinstance(metric, metric_type):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help_text, labelnames, buckets)
+
+    def mirror(self, metric: _Metric) -> _Metric:
+        """This registry's copy of another registry's metric, created on first use"""
+        kwargs = {'buckets': metric.buckets} if isinstance(metric, Histogram) else {}
+        copy = self._register(type(metric), metric.name, metric.help, metric.labelnames, **kwargs)
+        copy._job_copy = True
+        return copy
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Every metric's current samples as JSON-serializable data"""
+        return {
+            name: {'type': metric.kind, 'help': metric.help, 'labels': list(metric.labelnames),
+                   'samples': metric.snapshot()}
+            for name, metric in self._metrics.items()
+        }
+
+    def merge(self, snapshot: Dict[str, Dict]):
+        """Add another process's snapshot (counters and histograms add up, gauges are replaced)"""
+        types = {'counter': self.counter, 'gauge': self.gauge, 'histogram': self.histogram}
+        for name, data in snapshot.items():
+            register = types.get(data.get('type'))
+            if register is None:
+                continue
+            try:
+                register(name, data.get('help', ''), data.get('labels', ())).merge(data.get('samples', []))
+            except ValueError as e:
+                logger.warning(f"Skipping metric {name} from snapshot: {e}")
+
+    def reset(self):
+        for metric in self._metrics.values():
+            metric.reset()
+
+    def dump(self, path) -> Path:
+        """Write snapshot() as JSON"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+        return path
+
+def start_job_metrics() -> Tuple[MetricsRegistry, Token]:
+    """A fresh registry that also receives every metric update made in the current context
+
+    Updates from tasks and to_thread/executor calls started afterwards count too
+    (they inherit the context), while other jobs running concurrently in the same
+    process do not; nested jobs each get every update. Pass the token to
+    stop_job_metrics when the job ends.
+    """
+    registry = MetricsRegistry()
+    return registry, _JOB_REGISTRIES.set(_JOB_REGISTRIES.get() + (registry,))
+
+def stop_job_metrics(token: Token):
+    """Stop collecting into the registry from start_job_metrics"""
+    _JOB_REGISTRIES.reset(token)
+
+def render_snapshot(snapshot: Dict[str, Dict]) -> str:
+    """Prometheus text for a stored snapshot (e.g. a per-job dump)"""
+    registry = MetricsRegistry()
+    registry.merge(snapshot)
+    return registry.render_prometheus()
+
+REGISTRY = MetricsRegistry()
+
+# Extraction
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'trademap_http_request_seconds', 'Latency of one HTTP attempt', ['host', 'status'])
+HTTP_RESPONSE_BYTES = REGISTRY.counter(
+    'trademap_http_response_bytes_total', 'Response body bytes downloaded', ['host'])
+HTTP_RETRIES = REGISTRY.counter(
+    'trademap_http_retries_total', 'HTTP attempts that were retried', ['host', 'reason'])
+ROWS_PARSED = REGISTRY.counter(
+    'trademap_rows_parsed_total', 'Rows parsed from API responses', ['source'])
+# Loading
+TRANSFORM_SECONDS = REGISTRY.histogram(
+    'trademap_transform_seconds', 'Time to transform one batch into table columns', ['table'])
+INSERT_SECONDS = REGISTRY.histogram(
+    'trademap_insert_seconds', 'Latency of one ClickHouse insert', ['table'])
+ROWS_INSERTED = REGISTRY.counter(
+    'trademap_rows_inserted_total', 'Rows inserted into ClickHouse', ['table'])
+INSERT_FAILURES = REGISTRY.counter(
+    'trademap_insert_failures_total', 'ClickHouse inserts that raised', ['table'])
+QUEUE_DEPTH = REGISTRY.gauge(
+    'trademap_queue_depth', 'Batches waiting in a pipeline queue', ['queue'])
+# Scheduler
+JOB_SECONDS = REGISTRY.histogram(
+    'trademap_job_seconds', 'Duration of scheduler jobs', ['job_type', 'status'])
+
+def _dump_on_exit(path: str):
+    try:
+        REGISTRY.dump(path)
+    except Exception as e:
+        logger.warning(f"Failed to write metrics to {path}: {e}")
+
+# A parent process (the scheduler) sets PIPELINE_METRICS_FILE to collect a child's metrics
+if os.getenv('PIPELINE_METRICS_FILE'):
+    atexit.register(_dump_on_exit, os.environ['PIPELINE_METRICS_FILE'])
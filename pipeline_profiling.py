@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Pipeline Profiling
+Opt-in per-stage profiles (fetch, parse, transform, insert) with a top-N hotspot summary
+
+Pipeline code marks its stages with profile_stage(); that is a no-op unless a
+profiler is running. Two kinds of profiler:
+
+- 'cprofile' (--profile on the command-line tools): a deterministic cProfile
+  per stage and thread, written as <stage>.prof for pstats/snakeviz. Exact for
+  synchronous stages; a stage that awaits also records whatever the event loop
+  runs until the stage resumes.
+- 'sample': a background thread samples every thread's stack every few
+  milliseconds and attributes each sample to the innermost open stage of that
+  stack, so interleaved coroutines are told apart. Written as <stage>.folded
+  collapsed stacks (flamegraph.pl, speedscope). Overhead is a stack walk per
+  interval, which is what makes it safe to start on a running job: send the
+  process SIGUSR1 (trademap-scheduler.py --profile-job JOB_ID does this).
+
+Output goes to logs/profiles/<name>_<pid>_<timestamp>/ with a summary.txt of
+the hottest functions per stage.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import cProfile
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cprofile', 'sample')
+DEFAULT_PROFILE_DIR = 'logs/profiles'
+DEFAULT_SAMPLE_INTERVAL = 0.005  # seconds
+DEFAULT_TOP_N = 25
+UNSTAGED = 'other'
+
+# Leaf frames of threads that are parked, not working (event loop select, idle executor workers)
+IDLE_FRAMES = {('selectors.py', 'select'), ('thread.py', '_worker'), ('threading.py', 'wait')}
+
+FrameKey = Tuple[str, str, int]  # function name, file, first line
+
+class StageProfiler:
+    """Profiles the stages entered between start() and stop()"""
+
+    def __init__(self, name: str, mode: str = 'cprofile', out_dir: str = DEFAULT_PROFILE_DIR,
+                 top_n: int = DEFAULT_TOP_N, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r} (expected one of {PROFILE_MODES})")
+        self.name = name
+        self.mode = mode
+        self.out_dir = Path(out_dir)
+        self.top_n = top_n
+        self.interval = interval
+
+        self.stage_entries: Counter = Counter()
+        self.stage_seconds: Dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+        self._started_at = 0.0
+        self._wall_seconds = 0.0
+
+        # cprofile: one profile per (stage, thread), and each thread's open stages
+        self._profiles: Dict[Tuple[str, int], cProfile.Profile] = {}
+        self._local = threading.local()
+        self.conflicts = 0
+
+        # sample: open stages by frame, and the collected stacks per stage
+        self._open_frames: Dict[object, List[str]] = {}
+        self._stacks: Dict[str, Counter] = defaultdict(Counter)
+        self.samples = 0
+        self._sampler: Optional[threading.Thread] = None
+        self._stop_sampling = threading.Event()
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        if self.mode == 'sample':
+            self._sampler = threading.Thread(target=self._sample_loop, name='stage-profiler', daemon=True)
+            self._sampler.start()
+
+    def stop(self) -> Path:
+        """Stop profiling and write the per-stage profiles and summary; returns their directory"""
+        self._wall_seconds = time.perf_counter() - self._started_at
+        if self._sampler is not None:
+            self._stop_sampling.set()
+            self._sampler.join()
+        else:
+            # Stages still open in this thread (an exception unwound past them)
+            for stage in reversed(getattr(self._local, 'stack', [])):
+                self._profiles[(stage, threading.get_ident())].disable()
+            self._local.stack = []
+        return self.write()
+
+    @contextmanager
+    def stage(self, stage: str, frame):
+        """Attribute the block to stage; frame is the caller's (how samples find their stage)"""
+        self._enter(stage, frame)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.stage_entries[stage] += 1
+                self.stage_seconds[stage] += elapsed
+            self._exit(stage, frame)
+
+    def _enter(self, stage: str, frame):
+        if self.mode == 'sample':
+            with self._lock:
+                self._open_frames.setdefault(frame, []).append(stage)
+            return
+        stack = self._local.__dict__.setdefault('stack', [])
+        if stack:
+            self._thread_profile(stack[-1]).disable()
+        stack.append(stage)
+        self._enable(stage)
+
+    def _exit(self, stage: str, frame):
+        if self.mode == 'sample':
+            with self._lock:
+                stages = self._open_frames.get(frame)
+                if stages:
+                    stages.pop()
+                    if not stages:
+                        del self._open_frames[frame]
+            return
+        stack = getattr(self._local, 'stack', [])
+        if stage not in stack:
+            return
+        top = stack[-1]
+        # Coroutines can leave their stages out of order; drop the latest matching entry
+        del stack[len(stack) - 1 - stack[::-1].index(stage)]
+        if not stack or stack[-1] != top:
+            self._thread_profile(top).disable()
+            if stack:
+                self._enable(stack[-1])
+
+    def _thread_profile(self, stage: str) -> cProfile.Profile:
+        key = (stage, threading.get_ident())
+        profile = self._profiles.get(key)
+        if profile is None:
+            import cProfile
+            with self._lock:
+                profile = self._profiles.setdefault(key, cProfile.Profile())
+        return profile
+
+    def _enable(self, stage: str):
+        try:
+            self._thread_profile(stage).enable()
+        except ValueError:
+            # Another profiler (or, on 3.12+, another thread's profile) holds the hook
+            self.conflicts += 1
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self._stop_sampling.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self._record_sample(frame)
+
+    def _record_sample(self, frame):
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+            return
+        stage = None
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            if stage is None:
+                stages = self._open_frames.get(frame)
+                if stages:
+                    stage = stages[-1]
+            frame = frame.f_back
+        stack.reverse()
+        with self._lock:
+            self._stacks[stage or UNSTAGED][tuple(stack)] += 1
+            self.samples += 1
+
+    def write(self) -> Path:
+        directory = self.out_dir / f"{self.name}_{os.getpid()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        directory.mkdir(parents=True, exist_ok=True)
+        sections = self._write_cprofile(directory) if self.mode == 'cprofile' else self._write_samples(directory)
+
+        header = [
+            f"{self.name} ({self.mode}) pid {os.getpid()}, profiled {self._wall_seconds:.1f}s",
+            '',
+            f"{'stage':<12} {'entries':>10} {'seconds':>10}",
+        ]
+        for stage in sorted(self.stage_entries, key=lambda stage: -self.stage_seconds[stage]):
+            header.append(f"{stage:<12} {self.stage_entries[stage]:>10} {self.stage_seconds[stage]:>10.3f}")
+        header.append('(seconds are summed over concurrent entries, so they can exceed the wall time)')
+        if self.conflicts:
+            header.append(f"{self.conflicts} stage entries were not profiled: another profiler was active")
+        with open(directory / 'summary.txt', 'w') as f:
+            f.write('\n'.join(header + sections) + '\n')
+        logger.info(f"Wrote profiles to {directory}")
+        return directory
+
+    def _write_cprofile(self, directory: Path) -> List[str]:
+        import pstats
+
+        by_stage: Dict[str, List[cProfile.Profile]] = defaultdict(list)
+        for (stage, _), profile in self._profiles.items():
+            by_stage[stage].append(profile)
+
+        sections = []
+        for stage, profiles in sorted(by_stage.items()):
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(str(directory / f"{stage}.prof"))
+
+            text = io.StringIO()
+            stats.stream = text
+            stats.strip_dirs().sort_stats('tottime').print_stats(self.top_n)
+            sections.extend(['', f"== {stage}: top {self.top_n} by own time ==", text.getvalue().strip()])
+        return sections
+
+    def _write_samples(self, directory: Path) -> List[str]:
+        sections = [f"{self.samples} samples every {self.interval * 1000:g}ms"]
+        for stage, stacks in sorted(self._stacks.items(), key=lambda item: -sum(item[1].values())):
+            total = sum(stacks.values())
+            with open(directory / f"{stage}.folded", 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(';'.join(_frame_label(key) for key in stack) + f" {count}\n")
+
+            own: Counter = Counter()
+            inclusive: Counter = Counter()
+            for stack, count in stacks.items():
+                own[stack[-1]] += count
+                for key in set(stack):
+                    inclusive[key] += count
+            sections.extend(['', f"== {stage}: {total} samples ({total / max(self.samples, 1):.0%}) =="])
+            sections.append(f"{'own':>7} {'incl':>7}  function")
+            for key, count in own.most_common(self.top_n):
+                sections.append(f"{count / total:>7.1%} {inclusive[key] / total:>7.1%}  {_frame_label(key)}")
+        return sections
+
+def _frame_label(key: FrameKey) -> str:
+    name, filename, line = key
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+_active: Optional[StageProfiler] = None
+_active_lock = threading.Lock()
+_signal_started: Optional[StageProfiler] = None
+
+def profile_stage(stage: str):
+    """with profile_stage('parse'): ... - attributes the block to a stage while a profiler runs"""
+    profiler = _active
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(stage, sys._getframe(1))
+
+def profile_iter(stage: str, iterable: Iterable) -> Iterator:
+    """Yield from iterable, attributing the work of producing each item to a stage"""
+    iterator = iter(iterable)
+    while True:
+        with profile_stage(stage):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+def start_profiling(name: str, mode: str = 'cprofile', **kwargs) -> Optional[StageProfiler]:
+    """Start the process-wide profiler; returns None if one is already running"""
+    global _active
+    with _active_lock:
+        if _active is not None:
+            return None
+        profiler = StageProfiler(name, mode, **kwargs)
+        profiler.start()
+        _active = profiler
+        return profiler
+
+def stop_profiling(profiler: Optional[StageProfiler] = None) -> Optional[Path]:
+    """Stop the running profiler (only if it is `profiler`, when given) and write its output"""
+    global _active
+    with _active_lock:
+        if _active is None or (profiler is not None and _active is not profiler):
+            return None
+        profiler, _active = _active, None
+    return profiler.stop()
+
+@contextmanager
+def profiling(name: str, mode: Optional[str]):
+    """Profile the enclosed run when mode is set (the --profile option of the command-line tools)"""
+    if not mode:
+        yield None
+        return
+    profiler = start_profiling(name, mode)
+    try:
+        yield profiler
+    finally:
+        directory = stop_profiling(profiler)
+        if directory:
+            print(f"Profiles written to {directory}")
+
+def install_signal_trigger(name: str, seconds: Optional[float] = None):
+    """SIGUSR1 samples this process for `seconds` (PIPELINE_PROFILE_SECONDS, default 30); a second SIGUSR1 stops early
+
+    Must be called from the main thread. The profile name includes PIPELINE_JOB_ID
+    when the scheduler started this process for a job.
+    """
+    if not hasattr(signal, 'SIGUSR1'):
+        return
+    seconds = seconds or float(os.getenv('PIPELINE_PROFILE_SECONDS', '30'))
+    job_id = os.getenv('PIPELINE_JOB_ID')
+    profile_name = f"{name}_{job_id}" if job_id else name
+
+    def finish(profiler: StageProfiler):
+        global _signal_started
+        if stop_profiling(profiler) is not None and _signal_started is profiler:
+            _signal_started = None
+
+    def handler(signum, frame):
+        global _signal_started
+        if _signal_started is not None and _signal_started is _active:
+            # Write the files off the signal handler
+            threading.Thread(target=finish, args=(_signal_started,), daemon=True).start()
+            return
+        profiler = start_profiling(profile_name, 'sample')
+        if profiler is None:
+            logger.warning("SIGUSR1 ignored: a profiler is already running")
+            return
+        _signal_started = profiler
+        logger.info(f"Sampling profile started for {seconds:g}s")
+        timer = threading.Timer(seconds, finish, args=(profiler,))
+        timer.daemon = True
+        timer.start()
+
+    signal.signal(signal.SIGUSR1, handler)
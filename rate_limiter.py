@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Token Bucket Rate Limiter
+Shared request budget for the Trade Map extractor and UN Comtrade collector
+"""
+
+import asyncio
+import logging
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows - file-backed buckets are unavailable
+    fcntl = None
+
+class TokenBucket:
+    """In-process token bucket, safe for concurrent coroutines"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: int = 1):
+        """Wait until tokens are available and take them"""
+        # Waiters queue on the lock, so the bucket is drained in FIFO order
+        async with self._lock:
+            while True:
+                self._refill(time.monotonic())
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+class FileTokenBucket:
+    """Token bucket whose state lives in a locked file shared by several processes
+
+    Point the state directory at /dev/shm to keep the state in shared memory.
+    """
+
+    _STATE = struct.Struct('dd')  # tokens, wall-clock timestamp of last refill
+
+    def __init__(self, path: Path, rate: float, burst: int = 1):
+        if fcntl is None:
+            raise RuntimeError("File-backed rate limiting requires fcntl (POSIX only)")
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.rate = rate
+        self.burst = max(1, burst)
+
+    def _try_take(self, tokens: int) -> float:
+        """Take tokens if available; otherwise return seconds to wait"""
+        with open(self.path, 'a+b') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read(self._STATE.size)
+                now = time.time()
+                if len(raw) == self._STATE.size:
+                    available, updated = self._STATE.unpack(raw)
+                    available = min(self.burst, available + max(0.0, now - updated) * self.rate)
+                else:
+                    available = float(self.burst)
+
+                wait = 0.0
+                if available >= tokens:
+                    available -= tokens
+                else:
+                    wait = (tokens - available) / self.rate
+
+                f.seek(0)
+                f.truncate()
+                f.write(self._STATE.pack(available, now))
+                f.flush()
+                return wait
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    async def acquire(self, tokens: int = 1):
+        """Wait until tokens are available and take them"""
+        while True:
+            wait = await asyncio.to_thread(self._try_take, tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+class RateLimiter:
+    """Per-host token buckets with optional cross-process shared state"""
+
+    def __init__(self, default_rate: float = 1.0, default_burst: int = 1,
+                 state_dir: Optional[str] = None):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.state_dir = Path(state_dir) if state_dir else None
+        self.host_limits: Dict[str, Tuple[float, int]] = {}
+        self.buckets: Dict[str, object] = {}
+
+    @classmethod
+    def from_env(cls) -> 'RateLimiter':
+        """Build a limiter from RATE_LIMIT_* environment variables"""
+        return cls(
+            default_rate=float(os.getenv('RATE_LIMIT_DEFAULT_RPS', '1.0')),
+            default_burst=int(os.getenv('RATE_LIMIT_DEFAULT_BURST', '1')),
+            state_dir=os.getenv('RATE_LIMIT_STATE_DIR') or None
+        )
+
+    @staticmethod
+    def _host(url_or_host: str) -> str:
+        return urlparse(url_or_host).netloc or url_or_host
+
+    def configure_host(self, url_or_host: str, rate: float, burst: int = 1, override: bool = False):
+        """Set the request budget for a host (keeps an existing budget unless override)"""
+        host = self._host(url_or_host)
+        if host in self.host_limits and not override:
+            return
+        self.host_limits[host] = (rate, burst)
+        self.buckets.pop(host, None)
+        logger.info(f"Rate limit for {host}: {rate} req/s, burst {burst}")
+
+    def _bucket(self, host: str):
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            rate, burst = self.host_limits.get(host, (self.default_rate, self.default_burst))
+            if self.state_dir:
+                bucket = FileTokenBucket(self.state_dir / f"{host.replace(':', '_')}.bucket", rate, burst)
+            else:
+                bucket = TokenBucket(rate, burst)
+            self.buckets[host] = bucket
+        return bucket
+
+    async def acquire(self, url_or_host: str, tokens: int = 1):
+        """Wait for the host's budget to allow another request"""
+        await self._bucket(self._host(url_or_host)).acquire(tokens)
+
+_shared_limiter: Optional[RateLimiter] = None
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide limiter shared by every extractor and collector"""
+    global _shared_limiter
+    if _shared_limiter is None:
+        _shared_limiter = RateLimiter.from_env()
+    return _shared_limiter
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+HTTP Retry Engine
+Exponential backoff with jitter and Retry-After support for the data collectors
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Dict, Mapping, Optional, Tuple
+from urllib.parse import urlparse
+
+from pipeline_metrics import HTTP_REQUEST_SECONDS, HTTP_RESPONSE_BYTES, HTTP_RETRIES
+from pipeline_profiling import profile_stage
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class RetryPolicy:
+    """Backoff settings for retryable HTTP failures"""
+    max_attempts: int = 5
+    base_delay: float = 1.0  # seconds, doubled on every attempt
+    max_delay: float = 120.0
+    jitter: float = 0.5  # fraction of the delay randomized away
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    @classmethod
+    def from_env(cls, prefix: str = 'HTTP_RETRY') -> 'RetryPolicy':
+        """Build a policy from <prefix>_* environment variables"""
+        return cls(
+            max_attempts=int(os.getenv(f'{prefix}_MAX_ATTEMPTS', '5')),
+            base_delay=float(os.getenv(f'{prefix}_BASE_DELAY', '1.0')),
+            max_delay=float(os.getenv(f'{prefix}_MAX_DELAY', '120.0')),
+            jitter=float(os.getenv(f'{prefix}_JITTER', '0.5'))
+        )
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry number `attempt` (1-based)"""
+        if retry_after is not None:
+            # The server told us when to come back; honour it exactly
+            return min(retry_after, self.max_delay)
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay * (1 - self.jitter * random.random())
+
+@dataclass
+class HttpResult:
+    """Outcome of a request made through fetch_json"""
+    status: int
+    headers: Mapping[str, str]
+    data: Any = None
+    attempts: int = 1
+
+class RetryExhaustedError(Exception):
+    """Raised when a request still fails after every allowed attempt"""
+
+    def __init__(self, url: str, attempts: int, last_status: Optional[int] = None,
+                 last_error: Optional[Exception] = None):
+        self.url = url
+        self.attempts = attempts
+        self.last_status = last_status
+        self.last_error = last_error
+        reason = f"HTTP {last_status}" if last_status else repr(last_error)
+        super().__init__(f"{url} failed after {attempts} attempts ({reason})")
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+async def fetch_json(
+    session: aiohttp.ClientSession,
+    url: str,
+    params: Optional[Dict] = None,
+    headers: Optional[Dict] = None,
+    policy: Optional[RetryPolicy] = None,
+    rate_limiter=None
+) -> HttpResult:
+    """GET a JSON resource, retrying throttling, server errors and network failures
+
+    Non-retryable statuses are returned to the caller as-is (data is None).
+    """
+    import aiohttp
+
+    policy = policy or RetryPolicy()
+    host = urlparse(url).netloc
+    last_status = None
+    last_error = None
+
+    for attempt in range(1, policy.max_attempts + 1):
+        if rate_limiter is not None:
+            await rate_limiter.acquire(url)
+
+        retry_after = None
+        status = 'error'
+        started = time.perf_counter()
+        try:
+            with profile_stage('fetch'):
+                async with session.get(url, params=params, headers=headers) as response:
+                    status = str(response.status)
+                    if response.status == 200:
+                        body = await response.read()
+                        HTTP_RESPONSE_BYTES.inc(len(body), host=host)
+                        with profile_stage('parse'):
+                            data = await response.json(content_type=None)
+                        return HttpResult(response.status, response.headers, data, attempt)
+                    if response.status not in policy.retry_statuses:
+                        return HttpResult(response.status, response.headers, None, attempt)
+                    last_status = response.status
+                    last_error = None
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            last_status = None
+            last_error = e
+        finally:
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, host=host, status=status)
+
+        if attempt == policy.max_attempts:
+            break
+
+        delay = policy.backoff_delay(attempt, retry_after)
+        reason = f"HTTP {last_status}" if last_status else repr(last_error)
+        HTTP_RETRIES.inc(host=host, reason=str(last_status) if last_status else type(last_error).__name__)
+        logger.warning(f"Retrying {url} in {delay:.1f}s after {reason} (attempt {attempt}/{policy.max_attempts})")
+        await asyncio.sleep(delay)
+
+    raise RetryExhaustedError(url, policy.max_attempts, last_status, last_error)
@@ -12,9 +12,12 @@ import pandas as pd
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
+import shutil
 import subprocess
 import sys
+import tempfile
 import time
+from collections import Counter
 
 # Configure logging
 logging.basicConfig(
@@ -45,6 +48,11 @@ class TradeMapPipelineTester:
         status_icon = "✅" if status == "PASSED" else "❌" if status == "FAILED" else "⚠️"
         logger.info(f"{status_icon} {test_name}: {message}")
 
+    def clickhouse_pool(self):
+        """Pool shared by the ClickHouse tests, so the suite connects once"""
+        from clickhouse_pool import get_pool, native_params_from_env
+        return get_pool('native', dict(native_params_from_env(), connect_timeout=5))
+
     async def test_dependencies(self) -> bool:
         """Test that all required dependencies are installed"""
         start_time = time.time()
@@ -116,16 +124,8 @@ class TradeMapPipelineTester:
         start_time = time.time()
 
         try:
-            import clickhouse_driver
-
-            client = clickhouse_driver.Client(
-                host=os.getenv('CLICKHOUSE_HOST', 'localhost'),
-                port=int(os.getenv('CLICKHOUSE_PORT', '9000')),
-                user=os.getenv('CLICKHOUSE_USER', 'default'),
-                password=os.getenv('CLICKHOUSE_PASSWORD', ''),
-                database=os.getenv('CLICKHOUSE_DATABASE', 'primero_tradefinance'),
-                connect_timeout=5
-            )
+            pool = self.clickhouse_pool()
+            client = pool.acquire()
 
             # Test connection with a simple query
             result = client.execute("SELECT 1 as test")
@@ -136,7 +136,7 @@ class TradeMapPipelineTester:
                     "Successfully connected to ClickHouse",
                     time.time() - start_time
                 )
-                client.disconnect()
+                pool.release(client)
                 return True
             else:
                 self.log_test_result(
@@ -161,15 +161,8 @@ class TradeMapPipelineTester:
         start_time = time.time()
 
         try:
-            import clickhouse_driver
-
-            client = clickhouse_driver.Client(
-                host=os.getenv('CLICKHOUSE_HOST', 'localhost'),
-                port=int(os.getenv('CLICKHOUSE_PORT', '9000')),
-                user=os.getenv('CLICKHOUSE_USER', 'default'),
-                password=os.getenv('CLICKHOUSE_PASSWORD', ''),
-                database=os.getenv('CLICKHOUSE_DATABASE', 'primero_tradefinance')
-            )
+            pool = self.clickhouse_pool()
+            client = pool.acquire()
 
             # Check if tables exist
             required_tables = [
@@ -198,7 +191,7 @@ class TradeMapPipelineTester:
                     f"All {len(required_tables)} tables created successfully",
                     time.time() - start_time
                 )
-                client.disconnect()
+                pool.release(client)
                 return True
             else:
                 missing_tables = set(required_tables) - set(existing_tables)
@@ -208,7 +201,7 @@ class TradeMapPipelineTester:
                     f"Missing tables: {', '.join(missing_tables)}",
                     time.time() - start_time
                 )
-                client.disconnect()
+                pool.release(client)
                 return False
 
         except Exception as e:
@@ -320,6 +313,643 @@ class TradeMapPipelineTester:
             )
             return False
 
+    async def test_parquet_staging(self) -> bool:
+        """Test the typed Parquet staging round trip"""
+        start_time = time.time()
+
+        try:
+            from trademap_staging import TRADE_RECORD_SCHEMA, read_staged, write_staged
+
+            source = pd.read_csv(self.test_data_dir / "test_trade_data.csv")
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                staged_dir = Path(tmp_dir) / "test_trade_data_staged"
+                write_staged(source, staged_dir)
+
+                # Memory-mapped read of the partitioned dataset
+                staged = read_staged(staged_dir, memory_map=True)
+                partitions = sorted(path.relative_to(staged_dir).parts[0] for path in staged_dir.glob('*/*/*.parquet'))
+
+            problems = []
+            if len(staged) != len(source):
+                problems.append(f"{len(staged)} rows read back, expected {len(source)}")
+            if set(staged.columns) != set(TRADE_RECORD_SCHEMA.names):
+                problems.append(f"unexpected columns {sorted(staged.columns)}")
+            if staged['trade_value_usd'].sum() != source['trade_value_usd'].sum():
+                problems.append("trade values changed in the round trip")
+            if staged['net_weight_kg'].isna().sum() != source['net_weight_kg'].isna().sum():
+                problems.append("missing weights were not preserved as nulls")
+
+            if problems:
+                self.log_test_result(
+                    "Parquet Staging",
+                    "FAILED",
+                    "; ".join(problems),
+                    time.time() - start_time
+                )
+                return False
+
+            self.log_test_result(
+                "Parquet Staging",
+                "PASSED",
+                f"Round-tripped {len(staged)} records through {len(partitions)} reporter partitions",
+                time.time() - start_time
+            )
+            return True
+
+        except Exception as e:
+            self.log_test_result(
+                "Parquet Staging",
+                "FAILED",
+                f"Parquet staging test failed: {e}",
+                time.time() - start_time
+            )
+            return False
+
+    async def test_view_rebuild(self) -> bool:
+        """Test that the summary views are rebuilt through staging tables, partition by partition"""
+        start_time = time.time()
+
+        try:
+            from clickhouse_loader import VIEW_REBUILD_QUERIES, ClickHouseLoader, view_partitions
+            from fake_clickhouse import RecordingClickHouseClient
+
+            client = RecordingClickHouseClient(keep_queries=10000)
+            loader = ClickHouseLoader(client=client, rebuild_views=False)
+            try:
+                loader.begin_trade_flows_load()
+                loader.insert_trade_flows(pd.read_csv(self.test_data_dir / "test_trade_data.csv"))
+                loader.finish_trade_flows_load()
+                skipped = [query for query in client.queries if '_rebuild_' in query]
+
+                client.queries.clear()
+                years = sorted(loader.loaded_years)
+                loader.rebuild_materialized_views(years)
+            finally:
+                loader.close()
+
+            problems = []
+            if skipped:
+                problems.append(f"rebuild_views=False still rebuilt: {skipped[:2]}")
+            if any('DROP PARTITION' in query for query in client.queries):
+                problems.append("view partitions were dropped before the new rows existed")
+            for view in VIEW_REBUILD_QUERIES:
+                staging = f"{view}_rebuild_{os.getpid()}"
+                steps = [query for query in client.queries if staging in query]
+                expected = (
+                    [f"DROP TABLE IF EXISTS {staging}", f"CREATE TABLE {staging} AS `.inner.{view}`",
+                     f"INSERT INTO {staging}"]
+                    + [f"ALTER TABLE `.inner.{view}` REPLACE PARTITION {partition} FROM {staging}"
+                       for partition in view_partitions(view, years)]
+                    + [f"DROP TABLE IF EXISTS {staging}"]
+                )
+                if len(steps) != len(expected) or not all(
+                        step.startswith(prefix) for step, prefix in zip(steps, expected)):
+                    problems.append(f"{view}: unexpected rebuild steps {steps}")
+
+            if problems:
+                self.log_test_result(
+                    "View Rebuild",
+                    "FAILED",
+                    "; ".join(problems),
+                    time.time() - start_time
+                )
+                return False
+
+            self.log_test_result(
+                "View Rebuild",
+                "PASSED",
+                f"Rebuilt {len(VIEW_REBUILD_QUERIES)} views for {years} via REPLACE PARTITION",
+                time.time() - start_time
+            )
+            return True
+
+        except Exception as e:
+            self.log_test_result(
+                "View Rebuild",
+                "FAILED",
+                f"View rebuild test failed: {e}",
+                time.time() - start_time
+            )
+            return False
+
+    async def test_write_behind_writer(self) -> bool:
+        """Test write-behind flushing, batching and failure accounting against a threaded fake pool"""
+        start_time = time.time()
+
+        try:
+            import threading
+            from clickhouse_writer import WriteBehindWriter
+
+            class FakeClient:
+                def __init__(self):
+                    self.batches = []
+                    self.threads = set()
+
+                def insert(self, table, values, column_names=None, settings=None):
+                    self.batches.append(len(values))
+                    self.threads.add(threading.get_ident())
+                    if any(value < 0 for _, value in values):
+                        raise RuntimeError("rejected row")
+
+            class FakePool:
+                def __init__(self):
+                    self.client = FakeClient()
+
+                async def run_async(self, func, *args):
+                    return await asyncio.to_thread(func, self.client, *args)
+
+            pool = FakePool()
+            writer = WriteBehindWriter(pool, 'trade', ['id', 'value'], insert_workers=2, insert_batch_size=2,
+                                       flush_rows=5, flush_interval=0.05)
+
+            def rows(count, value=1):
+                return [{'id': i, 'value': value} for i in range(count)]
+
+            problems = []
+            await writer.put(rows(5), label='a')  # reaches flush_rows
+            await writer.put(rows(2), label='b')  # flushed by the timer
+            await asyncio.sleep(0.2)
+            # One flush in two chunks: [e, e] is written, [f (rejected), g] fails
+            await writer.put(rows(2), label='e')
+            await writer.put(rows(1, value=-1), label='f')
+            await writer.put(rows(1), label='g')
+            timer = writer._flush_timer
+            await writer.flush()  # explicit flush cancels the pending timer
+            if timer is None or not timer.cancelled() or writer._flush_timer is not None:
+                problems.append("explicit flush did not cancel the flush timer")
+            await writer.put(rows(3), label='d')
+            timer = writer._flush_timer
+            await writer.close()
+            if timer is None or not timer.cancelled():
+                problems.append("close did not cancel the flush timer")
+
+            stats = writer.stats()
+            expected_stats = {
+                'rows_queued': 14, 'rows_inserted': 12, 'rows_buffered': 0, 'inserts': 7, 'flushes': 4,
+                'flush_reasons': {'rows': 1, 'time': 1, 'explicit': 1, 'close': 1}, 'max_flush_rows': 5,
+                'failed_inserts': 1, 'failed_rows': 2
+            }
+            mismatched = {key: stats[key] for key, value in expected_stats.items() if stats[key] != value}
+            if mismatched:
+                problems.append(f"unexpected stats {mismatched}")
+            if writer.failed_labels != {'f': 1, 'g': 1}:
+                problems.append(f"failed_labels {writer.failed_labels} instead of {{'f': 1, 'g': 1}}")
+            if sorted(pool.client.batches) != sorted([2, 2, 1, 2, 2, 2, 2, 1]):
+                problems.append(f"insert batch sizes {pool.client.batches}")
+            if threading.get_ident() in pool.client.threads:
+                problems.append("inserts ran on the event loop thread")
+
+            if problems:
+                self.log_test_result(
+                    "Write-Behind Writer",
+                    "FAILED",
+                    "; ".join(problems),
+                    time.time() - start_time
+                )
+                return False
+
+            self.log_test_result(
+                "Write-Behind Writer",
+                "PASSED",
+                f"Flushes {stats['flush_reasons']}, {stats['rows_inserted']} rows in {stats['inserts']} inserts",
+                time.time() - start_time
+            )
+            return True
+
+        except Exception as e:
+            self.log_test_result(
+                "Write-Behind Writer",
+                "FAILED",
+                f"Write-behind writer test failed: {e}",
+                time.time() - start_time
+            )
+            return False
+
+    async def test_rate_limiter(self) -> bool:
+        """Test the token bucket and that the file-backed bucket shares one budget across processes"""
+        start_time = time.time()
+
+        try:
+            from rate_limiter import RateLimiter, TokenBucket
+
+            problems = []
+
+            # burst 2 at 20/s: six requests need four refills, about 0.2 s
+            bucket = TokenBucket(rate=20, burst=2)
+            started = time.monotonic()
+            await asyncio.gather(*(bucket.acquire() for _ in range(6)))
+            elapsed = time.monotonic() - started
+            if not 0.18 <= elapsed < 0.6:
+                problems.append(f"in-process bucket took {elapsed:.3f}s for 6 requests (expected ~0.2s)")
+
+            with tempfile.TemporaryDirectory() as state_dir:
+                # Two processes drawing from one file-backed bucket: 10 requests at 20/s, burst 1
+                script = (
+                    "import asyncio, sys\n"
+                    "from rate_limiter import RateLimiter\n"
+                    "limiter = RateLimiter(state_dir=sys.argv[1])\n"
+                    "limiter.configure_host('http://shared.test', rate=20, burst=1)\n"
+                    "async def main():\n"
+                    "    for _ in range(5):\n"
+                    "        await limiter.acquire('http://shared.test/path')\n"
+                    "asyncio.run(main())\n"
+                )
+                started = time.monotonic()
+                processes = [
+                    await asyncio.create_subprocess_exec(sys.executable, '-c', script, state_dir, cwd=os.getcwd())
+                    for _ in range(2)
+                ]
+                returncodes = [await process.wait() for process in processes]
+                elapsed = time.monotonic() - started
+                if any(returncodes):
+                    problems.append(f"limiter processes exited with {returncodes}")
+                elif elapsed < 0.45:
+                    problems.append(f"two processes made 10 requests in {elapsed:.3f}s; the budget was not shared")
+
+                limiter = RateLimiter(state_dir=state_dir, default_rate=1000, default_burst=10)
+                await limiter.acquire('http://other.test/a')
+                states = sorted(path.name for path in Path(state_dir).iterdir())
+                if states != ['other.test.bucket', 'shared.test.bucket']:
+                    problems.append(f"unexpected per-host state files {states}")
+
+            if problems:
+                self.log_test_result(
+                    "Rate Limiter",
+                    "FAILED",
+                    "; ".join(problems),
+                    time.time() - start_time
+                )
+                return False
+
+            self.log_test_result(
+                "Rate Limiter",
+                "PASSED",
+                "Token bucket paced requests and two processes shared one file-backed budget",
+                time.time() - start_time
+            )
+            return True
+
+        except Exception as e:
+            self.log_test_result(
+                "Rate Limiter",
+                "FAILED",
+                f"Rate limiter test failed: {e}",
+                time.time() - start_time
+            )
+            return False
+
+    async def test_fetch_retries(self) -> bool:
+        """Test fetch_json retries, Retry-After handling and retry exhaustion against a local server"""
+        start_time = time.time()
+
+        try:
+            import aiohttp
+            from aiohttp import web
+            from retry_policy import RetryExhaustedError, RetryPolicy, fetch_json, parse_retry_after
+
+            calls = Counter()
+
+            async def flaky(request):
+                calls['flaky'] += 1
+                if calls['flaky'] <= 2:
+                    return web.Response(status=503)
+                return web.json_response({'ok': True})
+
+            async def throttled(request):
+                calls['throttled'] += 1
+                if calls['throttled'] == 1:
+                    return web.Response(status=429, headers={'Retry-After': '0.3'})
+                return web.json_response({'ok': True})
+
+            async def missing(request):
+                calls['missing'] += 1
+                return web.Response(status=404)
+
+            async def down(request):
+                calls['down'] += 1
+                return web.Response(status=500)
+
+            app = web.Application()
+            for name, handler in (('flaky', flaky), ('throttled', throttled), ('missing', missing), ('down', down)):
+                app.router.add_get(f'/{name}', handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            base_url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+            problems = []
+            policy = RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=1.0, jitter=0)
+            try:
+                async with aiohttp.ClientSession() as session:
+                    result = await fetch_json(session, f"{base_url}/flaky", policy=policy)
+                    if result.status != 200 or result.data != {'ok': True} or result.attempts != 3:
+                        problems.append(f"flaky: status {result.status} after {result.attempts} attempts")
+
+                    started = time.monotonic()
+                    result = await fetch_json(session, f"{base_url}/throttled", policy=policy)
+                    waited = time.monotonic() - started
+                    if result.status != 200 or result.attempts != 2 or waited < 0.3:
+                        problems.append(f"throttled: status {result.status}, waited {waited:.3f}s of Retry-After 0.3")
+
+                    result = await fetch_json(session, f"{base_url}/missing", policy=policy)
+                    if result.status != 404 or calls['missing'] != 1:
+                        problems.append(f"404 was retried ({calls['missing']} calls)")
+
+                    try:
+                        await fetch_json(session, f"{base_url}/down", policy=policy)
+                        problems.append("persistent 500s did not raise RetryExhaustedError")
+                    except RetryExhaustedError as e:
+                        if e.attempts != 3 or e.last_status != 500 or calls['down'] != 3:
+                            problems.append(f"exhaustion after {calls['down']} calls: {e}")
+            finally:
+                await runner.cleanup()
+
+            if parse_retry_after('5') != 5.0 or parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') != 0.0:
+                problems.append("Retry-After seconds or past HTTP-date parsed wrongly")
+            if RetryPolicy(base_delay=1, max_delay=4, jitter=0).backoff_delay(5) != 4:
+                problems.append("backoff delay not capped at max_delay")
+
+            if problems:
+                self.log_test_result(
+                    "HTTP Retries",
+                    "FAILED",
+                    "; ".join(problems),
+                    time.time() - start_time
+                )
+                return False
+
+            self.log_test_result(
+                "HTTP Retries",
+                "PASSED",
+                f"Retried 503s and a 429 after its Retry-After, gave up after {calls['down']} 500s",
+                time.time() - start_time
+            )
+            return True
+
+        except Exception as e:
+            self.log_test_result(
+                "HTTP Retries",
+                "FAILED",
+                f"HTTP retry test failed: {e}",
+                time.time() - start_time
+            )
+            return False
+
+    async def test_response_cache(self) -> bool:
+        """Test response cache TTLs, ETag revalidation and size-bounded LRU eviction"""
+        start_time = time.time()
+
+        try:
+            from http_cache import ResponseCache
+
+            problems = []
+            with tempfile.TemporaryDirectory() as cache_dir:
+                cache = ResponseCache(cache_dir, ttl_hours={'current': 0.3 / 3600})
+                url = 'https://api.example.test/data'
+                cache.put(url, {'year': 2024}, {'rows': [1, 2]}, {'ETag': '"v1"'}, 'current')
+
+                entry = cache.get(url, {'year': 2024})
+                if entry is None or not entry.fresh or entry.data != {'rows': [1, 2]}:
+                    problems.append("a new entry was not served fresh")
+                if cache.get(url, {'year': 2023}) is not None:
+                    problems.append("different params hit the same entry")
+
+                await asyncio.sleep(0.4)
+                entry = cache.get(url, {'year': 2024})
+                if entry is None or entry.fresh:
+                    problems.append("an entry past its TTL was still fresh")
+                elif entry.validators() != {'If-None-Match': '"v1"'}:
+                    problems.append(f"revalidation headers {entry.validators()}")
+                else:
+                    # A 304 restarts the TTL and may bring a new validator
+                    cache.refresh(entry, {'ETag': '"v2"'})
+                    entry = cache.get(url, {'year': 2024})
+                    if not entry.fresh or entry.etag != '"v2"' or cache.revalidated != 1:
+                        problems.append("refresh after 304 did not restart the TTL")
+
+                # Other processes sharing the directory see the entry
+                if ResponseCache(cache_dir).get(url, {'year': 2024}) is None:
+                    problems.append("a second cache on the directory missed the entry")
+
+            with tempfile.TemporaryDirectory() as cache_dir:
+                cache = ResponseCache(cache_dir, max_bytes=2500)
+                payload = 'x' * 1000
+                for name in ('a', 'b'):
+                    cache.put(url, {'page': name}, payload, None, 'reference')
+                    await asyncio.sleep(0.01)
+                cache.get(url, {'page': 'a'})  # a becomes the most recently used
+                await asyncio.sleep(0.01)
+                cache.put(url, {'page': 'c'}, payload, None, 'reference')
+                kept = [name for name in ('a', 'b', 'c') if cache.get(url, {'page': name}) is not None]
+                if kept != ['a', 'c'] or cache.evictions != 1:
+                    problems.append(f"LRU eviction kept {kept} after {cache.evictions} evictions")
+                leftovers = [path.name for path in Path(cache_dir).rglob('*.tmp')]
+                if leftovers:
+                    problems.append(f"temporary files left behind: {leftovers}")
+
+            if problems:
+                self.log_test_result(
+                    "Response Cache",
+                    "FAILED",
+                    "; ".join(problems),
+                    time.time() - start_time
+                )
+                return False
+
+            self.log_test_result(
+                "Response Cache",
+                "PASSED",
+                "Entries expired, revalidated by ETag and were evicted least recently used first",
+                time.time() - start_time
+            )
+            return True
+
+        except Exception as e:
+            self.log_test_result(
+                "Response Cache",
+                "FAILED",
+                f"Response cache test failed: {e}",
+                time.time() - start_time
+            )
+            return False
+
+    async def test_incremental_planner(self) -> bool:
+        """Test that the planner picks missing, unavailable and stale cells and mark_done records row counts"""
+        start_time = time.time()
+
+        try:
+            from fake_clickhouse import RecordingClickHouseClient
+            from trademap_planner import IncrementalPlanner
+
+            now = datetime.now()
+            year = now.year
+
+            class WatermarkClient(RecordingClickHouseClient):
+                """Answers the watermark query and keeps availability inserts"""
+
+                def __init__(self, watermarks):
+                    super().__init__(encode=False)
+                    self.watermarks = watermarks
+                    self.availability_rows = []
+
+                def execute(self, query, params=None, **kwargs):
+                    text = ' '.join(query.split())
+                    if text.startswith('INSERT INTO trademap_data_availability'):
+                        self.availability_rows.extend(params)
+                        return None
+                    if 'FROM trademap_data_availability' in text:
+                        return [row for row in self.watermarks if row[0] in params['country_ids']]
+                    return super().execute(query, params, **kwargs)
+
+            # United States (id 1): a closed year loaded long ago, an empty closed year,
+            # the previous year just loaded and the current year loaded two days ago
+            client = WatermarkClient([
+                (1, year - 3, 0, 1, now - timedelta(days=400)),
+                (1, year - 2, 0, 0, now - timedelta(days=400)),
+                (1, year - 1, 0, 1, now),
+                (1, year, 0, 1, now - timedelta(days=2))
+            ])
+            planner = IncrementalPlanner(client=client, stale_after_hours=24, closed_year_lag=1)
+            cells = planner.plan(['United States', 'China', 'Atlantis'], year - 3, year)
+
+            problems = []
+            planned = [(cell.country, cell.year, cell.reason) for cell in cells]
+            expected = [('United States', year - 2, 'unavailable'), ('United States', year, 'stale')] + [
+                ('China', planned_year, 'missing') for planned_year in range(year - 3, year + 1)
+            ]
+            if planned != expected:
+                problems.append(f"planned {planned}, expected {expected}")
+
+            monthly = planner.plan(['China'], year, year, include_monthly=True)
+            if [cell.month for cell in monthly] != list(range(1, 13)):
+                problems.append(f"monthly plan covered months {[cell.month for cell in monthly]}")
+
+            planner.mark_done(cells[:2], {('United States', year - 2, 0): 120})
+            rows = client.availability_rows
+            if [(row['country_id'], row['year'], row['data_available']) for row in rows] != [
+                    (1, year - 2, True), (1, year, False)]:
+                problems.append(f"mark_done stored {[(row['year'], row['data_available']) for row in rows]}")
+            if len({row['id'] for row in rows}) != len(rows):
+                problems.append("mark_done reused row IDs")
+
+            if problems:
+                self.log_test_result(
+                    "Incremental Planner",
+                    "FAILED",
+                    "; ".join(problems),
+                    time.time() - start_time
+                )
+                return False
+
+            self.log_test_result(
+                "Incremental Planner",
+                "PASSED",
+                f"Planned {len(cells)} cells and stored empty cells as unavailable",
+                time.time() - start_time
+            )
+            return True
+
+        except Exception as e:
+            self.log_test_result(
+                "Incremental Planner",
+                "FAILED",
+                f"Incremental planner test failed: {e}",
+                time.time() - start_time
+            )
+            return False
+
+    async def test_id_allocators(self) -> bool:
+        """Test Snowflake block allocation, worker ID configuration and natural-key IDs"""
+        start_time = time.time()
+
+        try:
+            import numpy as np
+            import id_allocator
+            from id_allocator import (MAX_WORKER_ID, SEQUENCE_BITS, WORKER_BITS, SnowflakeAllocator,
+                                      natural_key_ids)
+
+            problems = []
+
+            # More than one millisecond's worth of sequence in a single block
+            first, second = SnowflakeAllocator(worker_id=5), SnowflakeAllocator(worker_id=6)
+            block = first.allocate(10000)
+            more = first.allocate(10)
+            single = first.next_id()
+            ids = np.concatenate([block, more, np.array([single], dtype='uint64')])
+            if not np.all(np.diff(ids.astype(object)) > 0):
+                problems.append("IDs did not strictly increase across blocks")
+            workers = set(((ids >> np.uint64(SEQUENCE_BITS)) & np.uint64(MAX_WORKER_ID)).tolist())
+            if workers != {5}:
+                problems.append(f"worker bits {workers} instead of {{5}}")
+            if np.intersect1d(block, second.allocate(10000)).size:
+                problems.append("allocators with different worker IDs produced the same ID")
+            if int(ids.max()) >> (SEQUENCE_BITS + WORKER_BITS + 41):
+                problems.append("IDs overflowed 63 bits")
+
+            # Worker ID from the environment, validated; warned about when hashed
+            previous = os.environ.pop('ID_WORKER_ID', None)
+            try:
+                os.environ['ID_WORKER_ID'] = '7'
+                if SnowflakeAllocator().worker_id != 7:
+                    problems.append("ID_WORKER_ID was ignored")
+                os.environ['ID_WORKER_ID'] = str(MAX_WORKER_ID + 1)
+                try:
+                    SnowflakeAllocator()
+                    problems.append("an out-of-range ID_WORKER_ID was accepted")
+                except ValueError:
+                    pass
+                del os.environ['ID_WORKER_ID']
+                warnings = []
+                handler = logging.Handler(level=logging.WARNING)
+                handler.emit = warnings.append
+                id_allocator.logger.addHandler(handler)
+                try:
+                    SnowflakeAllocator()
+                finally:
+                    id_allocator.logger.removeHandler(handler)
+                if not warnings:
+                    problems.append("the host/PID fallback worker ID logged no warning")
+            finally:
+                os.environ.pop('ID_WORKER_ID', None)
+                if previous is not None:
+                    os.environ['ID_WORKER_ID'] = previous
+
+            # Natural keys: stable across calls, string-compared, distinct per key
+            keys = pd.DataFrame({'reporter': ['842', '842', '156'], 'year': [2024, 2024, 2024]})
+            hashed = natural_key_ids(keys, ['reporter', 'year'])
+            again = natural_key_ids(pd.DataFrame({'reporter': [842], 'year': ['2024']}), ['reporter', 'year'])
+            if hashed[0] != hashed[1] or hashed[0] == hashed[2] or again[0] != hashed[0]:
+                problems.append(f"natural-key IDs {hashed.tolist()} / {again.tolist()}")
+            if int(hashed.max()) >= 1 << 63:
+                problems.append("natural-key IDs do not fit Int64")
+
+            if problems:
+                self.log_test_result(
+                    "ID Allocators",
+                    "FAILED",
+                    "; ".join(problems),
+                    time.time() - start_time
+                )
+                return False
+
+            self.log_test_result(
+                "ID Allocators",
+                "PASSED",
+                f"Allocated {len(ids)} increasing IDs for worker 5; natural keys hashed stably",
+                time.time() - start_time
+            )
+            return True
+
+        except Exception as e:
+            self.log_test_result(
+                "ID Allocators",
+                "FAILED",
+                f"ID allocator test failed: {e}",
+                time.time() - start_time
+            )
+            return False
+
     async def test_scheduler(self) -> bool:
         """Test scheduler functionality"""
         start_time = time.time()
@@ -413,6 +1043,14 @@ class TradeMapPipelineTester:
             ("ClickHouse Schema", self.test_clickhouse_schema),
             ("Data Extraction", self.test_data_extraction),
             ("Data Loading", self.test_data_loading),
+            ("Parquet Staging", self.test_parquet_staging),
+            ("View Rebuild", self.test_view_rebuild),
+            ("Write-Behind Writer", self.test_write_behind_writer),
+            ("Rate Limiter", self.test_rate_limiter),
+            ("HTTP Retries", self.test_fetch_retries),
+            ("Response Cache", self.test_response_cache),
+            ("Incremental Planner", self.test_incremental_planner),
+            ("ID Allocators", self.test_id_allocators),
             ("Scheduler", self.test_scheduler),
             ("End-to-End Pipeline", self.test_end_to_end_pipeline)
         ]
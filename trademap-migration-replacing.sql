@@ -0,0 +1,109 @@
+-- Migrate trademap_trade_flows from MergeTree to ReplacingMergeTree
+-- Run once against databases created before the table was keyed on its natural key:
+--   clickhouse-client --multiquery < trademap-migration-replacing.sql
+-- Duplicate rows left by earlier daily re-extractions collapse to their latest version,
+-- and the summary views are rebuilt from the de-duplicated rows.
+
+USE primero_tradefinance;
+
+-- 1. New table with the current definition (keep in sync with trademap-schema.sql)
+CREATE TABLE IF NOT EXISTS trademap_trade_flows_replacing (
+    id UInt64,
+    reporter_country_id UInt16,
+    partner_country_id UInt16,
+    product_code String,
+    trade_flow String,
+    year UInt16,
+    month UInt8,
+    quarter UInt8,
+    trade_value_usd UInt64,
+    trade_quantity UInt64,
+    quantity_unit String,
+    net_weight_kg UInt64,
+    gross_weight_kg UInt64,
+    cif_value_usd UInt64,
+    fob_value_usd UInt64,
+    customs_value_usd UInt64,
+    insurance_value_usd UInt64,
+    freight_value_usd UInt64,
+    auxiliary_value_usd UInt64,
+    trade_regime String,
+    partner_region String,
+    reporter_region String,
+    data_source String,
+    last_updated DateTime,
+    created_at DateTime DEFAULT now()
+) ENGINE = ReplacingMergeTree(last_updated)
+PARTITION BY toYYYYMM(toDate(concat(toString(year), '-', toString(month), '-01')))
+ORDER BY (reporter_country_id, partner_country_id, product_code, trade_flow, year, month)
+TTL toDate(created_at) + INTERVAL 10 YEARS
+SETTINGS index_granularity = 8192,
+         non_replicated_deduplication_window = 1000;
+
+-- 2. Copy the latest version of every natural key. Rows loaded before natural-key IDs
+--    get their ID recomputed by the next load of the same period.
+INSERT INTO trademap_trade_flows_replacing
+SELECT * FROM trademap_trade_flows
+ORDER BY reporter_country_id, partner_country_id, product_code, trade_flow, year, month, last_updated DESC
+LIMIT 1 BY reporter_country_id, partner_country_id, product_code, trade_flow, year, month;
+
+-- 3. The views sum every insert, so they are dropped with the old table and rebuilt below
+DROP VIEW IF EXISTS trademap_yearly_trade_summary_mv;
+DROP VIEW IF EXISTS trademap_monthly_trends_mv;
+DROP VIEW IF EXISTS trademap_country_rankings_mv;
+
+-- 4. Swap atomically; the old data stays available as trademap_trade_flows_replacing until dropped
+EXCHANGE TABLES trademap_trade_flows AND trademap_trade_flows_replacing;
+
+-- 5. Re-create the materialized views (same definitions as trademap-schema.sql)
+CREATE MATERIALIZED VIEW IF NOT EXISTS trademap_yearly_trade_summary_mv
+ENGINE = SummingMergeTree()
+PARTITION BY toYYYYMM(toDate(concat(toString(year), '-12-31')))
+ORDER BY (reporter_country_id, partner_country_id, product_code, year)
+AS SELECT
+    reporter_country_id,
+    partner_country_id,
+    product_code,
+    year,
+    sum(trade_value_usd) as total_trade_value_usd,
+    sum(trade_quantity) as total_trade_quantity,
+    count() as transaction_count,
+    avg(trade_value_usd) as avg_transaction_value
+FROM trademap_trade_flows
+WHERE month > 0
+GROUP BY reporter_country_id, partner_country_id, product_code, year;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS trademap_monthly_trends_mv
+ENGINE = SummingMergeTree()
+PARTITION BY toYYYYMM(toDate(concat(toString(year), '-', lpad(toString(month), 2, '0'), '-01')))
+ORDER BY (reporter_country_id, product_code, year, month)
+AS SELECT
+    reporter_country_id,
+    product_code,
+    year,
+    month,
+    sum(trade_value_usd) as monthly_trade_value_usd,
+    sum(trade_quantity) as monthly_trade_quantity,
+    count() as monthly_transaction_count
+FROM trademap_trade_flows
+GROUP BY reporter_country_id, product_code, year, month;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS trademap_country_rankings_mv
+ENGINE = SummingMergeTree()
+PARTITION BY toYYYYMM(toDate(concat(toString(year), '-12-31')))
+ORDER BY (year, product_code, trade_value_usd DESC)
+AS SELECT
+    year,
+    product_code,
+    reporter_country_id,
+    sum(trade_value_usd) as yearly_trade_value_usd,
+    rowNumberInAllBlocks() as global_rank
+FROM trademap_trade_flows
+WHERE trade_flow = 'Export'
+GROUP BY year, product_code, reporter_country_id
+ORDER BY yearly_trade_value_usd DESC;
+
+-- 6. Backfill the views from the de-duplicated rows:
+--      python clickhouse-loader.py --rebuild-views
+--    and once the numbers check out:
+--      DROP TABLE trademap_trade_flows_replacing;
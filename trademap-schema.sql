@@ -9,6 +9,7 @@ CREATE TABLE IF NOT EXISTS trademap_countries (
     country_name String,
     iso2_code String,
     iso3_code String,
+    m49_code String,  -- UN M49 numeric code, as used by UN Comtrade
     region String,
     subregion String,
     data_available_from_year UInt16,
@@ -22,6 +23,9 @@ CREATE TABLE IF NOT EXISTS trademap_countries (
 ORDER BY country_id
 TTL toDate(created_at) + INTERVAL 10 YEARS;
 
+-- Databases created before m49_code was added
+ALTER TABLE trademap_countries ADD COLUMN IF NOT EXISTS m49_code String DEFAULT '' AFTER iso3_code;
+
 -- Products reference table (HS codes)
 CREATE TABLE IF NOT EXISTS trademap_products (
     product_code String,
@@ -45,6 +49,9 @@ ORDER BY product_code
 TTL toDate(created_at) + INTERVAL 10 YEARS;
 
 -- Core trade flows table
+-- One row per natural key; a re-loaded row replaces the older version (highest last_updated wins).
+-- Read with FINAL (or argMax) where exact totals matter before background merges catch up.
+-- Existing MergeTree installs: see trademap-migration-replacing.sql
 CREATE TABLE IF NOT EXISTS trademap_trade_flows (
     id UInt64,
     reporter_country_id UInt16,
@@ -71,11 +78,12 @@ CREATE TABLE IF NOT EXISTS trademap_trade_flows (
     data_source String,
     last_updated DateTime,
     created_at DateTime DEFAULT now()
-) ENGINE = MergeTree()
+) ENGINE = ReplacingMergeTree(last_updated)
 PARTITION BY toYYYYMM(toDate(concat(toString(year), '-', toString(month), '-01')))
-ORDER BY (reporter_country_id, partner_country_id, product_code, year, month)
+ORDER BY (reporter_country_id, partner_country_id, product_code, trade_flow, year, month)
 TTL toDate(created_at) + INTERVAL 10 YEARS
-SETTINGS index_granularity = 8192;
+SETTINGS index_granularity = 8192,
+         non_replicated_deduplication_window = 1000;  -- honour insert_deduplication_token on retried/repeated batches
 
 -- Trade indicators aggregated table
 CREATE TABLE IF NOT EXISTS trademap_trade_indicators (
@@ -245,11 +253,11 @@ ORDER BY yearly_trade_value_usd DESC;
 
 -- Insert sample metadata for testing
 INSERT INTO trademap_countries VALUES
-(1, 'United States', 'US', 'USA', 'Americas', 'Northern America', 1988, 2024, true, true, true, '2024-01-01', now()),
-(2, 'China', 'CN', 'CHN', 'Asia', 'Eastern Asia', 1980, 2024, true, true, true, '2024-01-01', now()),
-(3, 'Germany', 'DE', 'DEU', 'Europe', 'Western Europe', 1988, 2024, true, true, true, '2024-01-01', now()),
-(4, 'United Kingdom', 'GB', 'GBR', 'Europe', 'Northern Europe', 1988, 2024, true, true, true, '2024-01-01', now()),
-(5, 'Japan', 'JP', 'JPN', 'Asia', 'Eastern Asia', 1988, 2024, true, true, true, '2024-01-01', now());
+(1, 'United States', 'US', 'USA', '842', 'Americas', 'Northern America', 1988, 2024, true, true, true, '2024-01-01', now()),
+(2, 'China', 'CN', 'CHN', '156', 'Asia', 'Eastern Asia', 1980, 2024, true, true, true, '2024-01-01', now()),
+(3, 'Germany', 'DE', 'DEU', '276', 'Europe', 'Western Europe', 1988, 2024, true, true, true, '2024-01-01', now()),
+(4, 'United Kingdom', 'GB', 'GBR', '826', 'Europe', 'Northern Europe', 1988, 2024, true, true, true, '2024-01-01', now()),
+(5, 'Japan', 'JP', 'JPN', '392', 'Asia', 'Eastern Asia', 1988, 2024, true, true, true, '2024-01-01', now());
 
 INSERT INTO trademap_products VALUES
 ('85', 'Electrical machinery and equipment and parts thereof; sound recorders and reproducers, television image and sound recorders and reproducers, and parts and accessories of such articles', 2, '', '16', 'Machinery and mechanical appliances; electrical equipment; parts thereof; sound recorders and reproducers, television image and sound recorders and reproducers, and parts and accessories of such articles', '85', 'Electrical machinery and equipment and parts thereof; sound recorders and reproducers, television image and sound recorders and reproducers, and parts and accessories of such articles', '', '', '8517', 'Phones', 1988, 2024, '2024-01-01', now()),
@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+"""
+Trade Map Data Extractor
+Extracts trade data from ITC Trade Map website and prepares for ClickHouse ingestion
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass
+import os
+from pathlib import Path
+
+from http_cache import ResponseCache
+from pipeline_metrics import QUEUE_DEPTH, ROWS_PARSED
+from pipeline_profiling import install_signal_trigger, profile_stage, profiling
+from rate_limiter import RateLimiter, get_rate_limiter
+from trademap_planner import load_plan
+from retry_policy import HttpResult, RetryExhaustedError, RetryPolicy, fetch_json
+
+# aiohttp, pandas and NumPy (via trademap_records) are imported where they are first
+# needed, so --help, argument errors and empty plans exit without loading them
+if TYPE_CHECKING:
+    import aiohttp
+    from trademap_records import TradeRecordBatch
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+@dataclass
+class DataAvailabilityRecord:
+    """Data availability tracking"""
+    country_id: int
+    year: int
+    month: int
+    data_available: bool
+    last_checked: datetime
+    data_quality_score: int
+
+class TradeMapExtractor:
+    """Main extractor class for Trade Map data"""
+
+    def __init__(
+        self,
+        base_url: str = "https://www.trademap.org",
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        response_cache: Optional[ResponseCache] = None
+    ):
+        self.base_url = base_url
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.data_dir = Path("./data/trademap")
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+
+        # Rate limiting - token bucket shared with every other client in the process
+        # (and across processes when RATE_LIMIT_STATE_DIR is set)
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.rate_limiter.configure_host(
+            self.base_url,
+            rate=float(os.getenv('TRADEMAP_REQUESTS_PER_SECOND', '1.0')),
+            burst=int(os.getenv('TRADEMAP_REQUEST_BURST', '1'))
+        )
+        self.retry_policy = retry_policy or RetryPolicy.from_env('TRADEMAP_RETRY')
+        self.requeue_rounds = int(os.getenv('TRADEMAP_REQUEUE_ROUNDS', '2'))
+        # Combinations still failing after every re-queue round of the last run
+        self.failed_work_items: List[Tuple[str, str, int, Optional[int]]] = []
+        # Records extracted per (reporter, year, month or 0) cell in the last run
+        self.cell_rows: Counter = Counter()
+
+        # Persistent response cache - survives between scheduler runs
+        self.response_cache = response_cache if response_cache is not None else ResponseCache.from_env()
+
+        # Data cache
+        self.countries_cache: Dict[str, int] = {}
+        self.products_cache: Dict[str, str] = {}
+
+    async def __aenter__(self):
+        """Context manager entry"""
+        import aiohttp
+        self.session = aiohttp.ClientSession(
+            headers={
+                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+                'Accept': 'application/json, text/plain, */*',
+                'Accept-Language': 'en-US,en;q=0.9',
+                'Referer': f'{self.base_url}/'
+            }
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit"""
+        if self.session:
+            await self.session.close()
+
+    async def _get_json(self, url: str, params: Optional[Dict] = None, ttl_class: str = 'current') -> HttpResult:
+        """Rate-limited GET with retries, served from the response cache when fresh
+
+        Stale cache entries are revalidated with If-None-Match/If-Modified-Since;
+        a 304 answer reuses the cached body without spending a download.
+        """
+        with profile_stage('fetch'):
+            entry = self.response_cache.get(url, params) if self.response_cache else None
+        if entry and entry.fresh:
+            return HttpResult(200, {}, entry.data, attempts=0)
+
+        result = await fetch_json(
+            self.session, url, params=params,
+            headers=entry.validators() if entry else None,
+            policy=self.retry_policy, rate_limiter=self.rate_limiter
+        )
+
+        if result.status == 304 and entry:
+            self.response_cache.refresh(entry, result.headers)
+            return HttpResult(200, result.headers, entry.data, result.attempts)
+        if result.status == 200 and self.response_cache:
+            self.response_cache.put(url, params, result.data, result.headers, ttl_class)
+        return result
+
+    async def get_countries_list(self) -> Dict[str, int]:
+        """Get list of available countries"""
+        if self.countries_cache:
+            return self.countries_cache
+
+        try:
+            url = f"{self.base_url}/api/countries"
+            result = await self._get_json(url, ttl_class='reference')
+
+            if result.status == 200:
+                self.countries_cache = {item['name']: item['id'] for item in result.data}
+                logger.info(f"Loaded {len(self.countries_cache)} countries")
+                return self.countries_cache
+            else:
+                logger.warning(f"Failed to get countries list: {result.status}")
+                return {}
+
+        except Exception as e:
+            logger.error(f"Error getting countries list: {e}")
+            return {}
+
+    async def get_products_list(self) -> Dict[str, str]:
+        """Get list of available products"""
+        if self.products_cache:
+            return self.products_cache
+
+        try:
+            url = f"{self.base_url}/api/products"
+            result = await self._get_json(url, ttl_class='reference')
+
+            if result.status == 200:
+                self.products_cache = {item['code']: item['description'] for item in result.data}
+                logger.info(f"Loaded {len(self.products_cache)} products")
+                return self.products_cache
+            else:
+                logger.warning(f"Failed to get products list: {result.status}")
+                return {}
+
+        except Exception as e:
+            logger.error(f"Error getting products list: {e}")
+            return {}
+
+    async def extract_trade_data(
+        self,
+        reporter_country: str,
+        partner_country: str,
+        product_code: str,
+        year: int,
+        month: Optional[int] = None
+    ) -> TradeRecordBatch:
+        """Extract trade data for specific parameters"""
+        from trademap_records import TradeRecordBatch
+
+        try:
+            # Construct API URL (this would need to be reverse-engineered from Trade Map)
+            params = {
+                'reporter': reporter_country,
+                'partner': partner_country,
+                'product': product_code,
+                'year': year,
+                'flow': 'export'  # or 'import'
+            }
+
+            if month:
+                params['month'] = month
+
+            url = f"{self.base_url}/api/trade-data"
+            ttl_class = 'historical' if year < datetime.now().year else 'current'
+            result = await self._get_json(url, params=params, ttl_class=ttl_class)
+
+            if result.status == 200:
+                # Columns straight from the response; no per-row record objects
+                with profile_stage('parse'):
+                    batch = TradeRecordBatch.from_api_items(
+                        reporter_country, partner_country, product_code, year, month, result.data
+                    )
+                ROWS_PARSED.inc(len(batch), source='trademap')
+                return batch
+            else:
+                logger.warning(f"Failed to extract trade data: {result.status}")
+                return TradeRecordBatch.empty()
+
+        except RetryExhaustedError:
+            # Let bulk extraction re-queue the work item instead of dropping it
+            raise
+        except Exception as e:
+            logger.error(f"Error extracting trade data: {e}")
+            return TradeRecordBatch.empty()
+
+    async def extract_bulk_data(
+        self,
+        countries: List[str],
+        products: List[str],
+        start_year: int,
+        end_year: int,
+        include_monthly: bool = False,
+        max_concurrency: int = 1,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> TradeRecordBatch:
+        """Extract bulk trade data
+
+        The reporter x product x year (x month) combinations run as an asyncio
+        task pool of at most max_concurrency requests; 1 walks them one at a
+        time. Every request goes through the shared rate limiter, so the global
+        budget holds, and records are returned in the same order as the
+        combinations regardless of completion order. Combinations that still
+        fail after the retry policy is exhausted are re-queued for up to
+        requeue_rounds further passes.
+        """
+        work_items = self.build_work_items(countries, products, start_year, end_year, include_monthly)
+        return await self.extract_work_items(work_items, max_concurrency, progress_callback)
+
+    @staticmethod
+    def build_work_items(
+        countries: List[str],
+        products: List[str],
+        start_year: int,
+        end_year: int,
+        include_monthly: bool = False
+    ) -> List[Tuple[str, str, int, Optional[int]]]:
+        """Every reporter x product x year (x month) combination"""
+        months: List[Optional[int]] = list(range(1, 13)) if include_monthly else [None]
+        return [
+            (reporter, product, year, month)
+            for reporter in countries
+            for product in products
+            for year in range(start_year, end_year + 1)
+            for month in months
+        ]
+
+    async def extract_work_items(
+        self,
+        work_items: List[Tuple[str, str, int, Optional[int]]],
+        max_concurrency: int = 1,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> TradeRecordBatch:
+        """Extract an explicit list of (reporter, product, year, month) combinations"""
+        from trademap_records import TradeRecordBatch
+        results: List[TradeRecordBatch] = [TradeRecordBatch.empty() for _ in work_items]
+        async for index, records in self.iter_work_items(work_items, max_concurrency, progress_callback):
+            results[index] = records
+        return TradeRecordBatch.concat(results)
+
+    async def iter_work_items(
+        self,
+        work_items: List[Tuple[str, str, int, Optional[int]]],
+        max_concurrency: int = 1,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> AsyncIterator[Tuple[int, TradeRecordBatch]]:
+        """Yield (work item index, records) as each combination completes
+
+        Finished batches wait in a queue bounded by max_concurrency; while the
+        consumer is busy, workers hold their results instead of piling them up.
+        """
+        from trademap_records import TradeRecordBatch
+
+        total = len(work_items)
+        self.cell_rows = Counter()
+        logger.info(f"Starting bulk extraction for {total} combinations (max_concurrency={max_concurrency})")
+
+        workers = max(1, max_concurrency)
+        finished: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_concurrency))
+        completed = 0
+        progress_step = max(1, total // 20)
+
+        async def run(index: int) -> bool:
+            nonlocal completed
+            reporter, product, year, month = work_items[index]
+            try:
+                records = await self.extract_trade_data(reporter, 'World', product, year, month)
+            except RetryExhaustedError as e:
+                logger.warning(f"Deferring {reporter}-{product}-{year}-{month or 0}: {e}")
+                return False
+            except Exception as e:
+                # Re-queued like an exhausted retry and reported in failed_work_items if it keeps failing
+                logger.error(f"Error processing {reporter}-{product}-{year}-{month or 0}: {e}")
+                return False
+            finally:
+                completed += 1
+                if progress_callback:
+                    progress_callback(completed, total)
+                if completed % progress_step == 0 or completed == total:
+                    logger.info(f"Progress: {completed}/{total} combinations processed")
+            self.cell_rows[(reporter, year, month or 0)] += len(records)
+            await finished.put((index, records))
+            return True
+
+        async def run_round(indices: List[int]) -> List[int]:
+            """Run indices on a fixed set of workers sharing one iterator; returns those to re-queue"""
+            remaining = iter(indices)
+            deferred: List[int] = []
+
+            async def worker():
+                for index in remaining:
+                    if not await run(index):
+                        deferred.append(index)
+
+            await asyncio.gather(*(worker() for _ in range(min(workers, len(indices)))))
+            return sorted(deferred)
+
+        async def run_rounds():
+            nonlocal total
+            pending = list(range(len(work_items)))
+            for round_number in range(self.requeue_rounds + 1):
+                if round_number:
+                    logger.info(f"Re-queue round {round_number}: retrying {len(pending)} combinations")
+                    total += len(pending)
+                pending = await run_round(pending)
+                if not pending:
+                    break
+
+            self.failed_work_items = [work_items[index] for index in pending]
+            if pending:
+                logger.error(
+                    f"{len(self.failed_work_items)} combinations failed after re-queueing: {self.failed_work_items[:10]}"
+                )
+            await finished.put(None)
+
+        producer = asyncio.create_task(run_rounds())
+        try:
+            while True:
+                item = await finished.get()
+                QUEUE_DEPTH.set(finished.qsize(), queue='extractor_results')
+                if item is None:
+                    break
+                yield item
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
+
+    def save_to_csv(self, records: TradeRecordBatch, filename: str):
+        """Save records to CSV file"""
+        from trademap_streaming import records_to_frame
+        df = records_to_frame(records)
+        filepath = self.data_dir / filename
+        df.to_csv(filepath, index=False)
+        logger.info(f"Saved {len(records)} records to {filepath}")
+
+    def save_to_parquet(self, records: TradeRecordBatch, dirname: str, basename: str = 'part'):
+        """Save records as a Parquet dataset partitioned by reporter and year
+
+        Shards of one job write into the same dataset under different basenames.
+        """
+        from trademap_staging import write_staged
+        from trademap_streaming import records_to_frame
+        write_staged(records_to_frame(records), self.data_dir / dirname, basename=basename)
+
+    def save_metadata(self, metadata: Dict, filename: str):
+        """Save metadata to JSON file"""
+        filepath = self.data_dir / filename
+        with open(filepath, 'w') as f:
+            json.dump(metadata, f, indent=2, default=str)
+        logger.info(f"Saved metadata to {filepath}")
+
+class TradeMapDataPipeline:
+    """Complete data pipeline for Trade Map integration"""
+
+    def __init__(self):
+        self.extractor = TradeMapExtractor()
+        self.clickhouse_config = {
+            'host': os.getenv('CLICKHOUSE_HOST', 'localhost'),
+            'port': int(os.getenv('CLICKHOUSE_PORT', '8123')),
+            'user': os.getenv('CLICKHOUSE_USER', 'default'),
+            'password': os.getenv('CLICKHOUSE_PASSWORD', ''),
+            'database': os.getenv('CLICKHOUSE_DATABASE', 'primero_tradefinance')
+        }
+        self.max_concurrency = int(os.getenv('TRADEMAP_MAX_CONCURRENCY', '1'))
+        self.staging_format = os.getenv('TRADEMAP_STAGING_FORMAT', 'parquet').lower()
+        self.streamed_years = set()
+
+    async def run_full_pipeline(
+        self,
+        plan_path: Optional[str] = None,
+        stream: bool = False,
+        ingest: bool = False,
+        countries: Optional[List[str]] = None,
+        products: Optional[List[str]] = None,
+        start_year: int = 2020,
+        end_year: int = 2024,
+        include_monthly: bool = False,
+        output_name: Optional[str] = None,
+        shard_id: Optional[str] = None
+    ) -> Dict:
+        """Run the complete data extraction and ingestion pipeline
+
+        With a plan file (written by the scheduler's incremental planner) only
+        the planned (country, year, month) cells are extracted; otherwise every
+        combination of countries x products x years. With stream, record
+        batches go straight from the extractor into ClickHouse and no file is
+        written; otherwise the records are staged (Parquet unless
+        TRADEMAP_STAGING_FORMAT=csv) and, with ingest, loaded from there
+        in-process. A shard_id keeps a shard's staged files and metadata apart
+        from the other shards of the same job.
+
+        Returns a summary with the record count, staged path, failed combinations,
+        records per (country, year, month) cell and, when streaming, the years
+        loaded into ClickHouse.
+        """
+
+        logger.info(f"Starting Trade Map data pipeline{f' (shard {shard_id})' if shard_id else ''}")
+        summary = {
+            'shard': shard_id, 'records': 0, 'staged': None, 'failed_work_items': [], 'cell_rows': [],
+            'loaded_years': []
+        }
+
+        async with self.extractor as extractor:
+            try:
+                # Step 1: Get reference data
+                logger.info("Fetching reference data...")
+                reference_countries = await extractor.get_countries_list()
+                reference_products = await extractor.get_products_list()
+
+                # Save metadata
+                metadata = {
+                    'countries_count': len(reference_countries),
+                    'products_count': len(reference_products),
+                    'extraction_timestamp': datetime.now().isoformat(),
+                    'data_source': 'ITC Trade Map'
+                }
+                metadata_file = f"extraction_metadata_{shard_id}.json" if shard_id else 'extraction_metadata.json'
+                extractor.save_metadata(metadata, metadata_file)
+
+                # Step 2: Extract trade data
+                logger.info("Extracting trade data...")
+                if plan_path:
+                    cells, target_products = load_plan(Path(plan_path))
+                    logger.info(f"Extracting {len(cells)} planned cells from {plan_path}")
+                    work_items = [
+                        (cell.country, product, cell.year, cell.month or None)
+                        for cell in cells
+                        for product in target_products
+                    ]
+                else:
+                    target_countries = countries or ['United States', 'China', 'Germany', 'Japan', 'United Kingdom']
+                    target_products = products or ['85', '84', '87']  # Electronics, Machinery, Vehicles
+
+                    work_items = extractor.build_work_items(
+                        target_countries, target_products, start_year, end_year, include_monthly=include_monthly
+                    )
+
+                if stream:
+                    # Steps 3-4: Insert batches as they arrive - no full dataset in memory, no CSV
+                    record_count = await self.stream_to_clickhouse(work_items)
+                    summary['loaded_years'] = sorted(self.streamed_years)
+                else:
+                    records = await extractor.extract_work_items(work_items, max_concurrency=self.max_concurrency)
+                    record_count = len(records)
+
+                    # Step 3: Save raw data
+                    if records:
+                        filename = output_name or f"trade_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                        if self.staging_format == 'csv':
+                            filename += f"_{shard_id}.csv" if shard_id else '.csv'
+                            extractor.save_to_csv(records, filename)
+                        else:
+                            extractor.save_to_parquet(records, filename, basename=f"{shard_id or 'part'}")
+                        summary['staged'] = str(extractor.data_dir / filename)
+
+                        # Step 4: Ingest to ClickHouse
+                        if ingest:
+                            await self.ingest_to_clickhouse(filename)
+
+                summary['records'] = record_count
+                summary['failed_work_items'] = extractor.failed_work_items
+                summary['cell_rows'] = [[*cell, rows] for cell, rows in sorted(extractor.cell_rows.items())]
+                logger.info(f"Pipeline completed successfully. Processed {record_count} records.")
+                if extractor.response_cache:
+                    logger.info(f"Response cache stats: {extractor.response_cache.stats()}")
+                return summary
+
+            except Exception as e:
+                logger.error(f"Pipeline failed: {e}")
+                raise
+
+    async def stream_to_clickhouse(self, work_items: List[Tuple[str, str, int, Optional[int]]]) -> int:
+        """Extract work items and insert their records while extraction continues
+
+        The years the rows landed in are kept in streamed_years.
+        """
+        from trademap_streaming import StreamingIngestor
+        ingestor = StreamingIngestor.from_env()
+        try:
+            async with ingestor:
+                async for _, records in self.extractor.iter_work_items(work_items, max_concurrency=self.max_concurrency):
+                    await ingestor.put(records)
+        finally:
+            self.streamed_years = set(ingestor.loaded_years)
+        return ingestor.rows_received
+
+    async def ingest_to_clickhouse(self, csv_filename: str):
+        """Ingest a staged CSV file or Parquet dataset to ClickHouse"""
+
+        try:
+            from clickhouse_loader import ClickHouseLoader
+
+            def load():
+                loader = ClickHouseLoader()
+                try:
+                    loader.load_trade_flows_data(str(self.extractor.data_dir / csv_filename))
+                finally:
+                    loader.close()
+
+            logger.info(f"Ingesting {csv_filename} to ClickHouse database: {self.clickhouse_config['database']}")
+            await asyncio.to_thread(load)
+
+        except Exception as e:
+            logger.error(f"ClickHouse ingestion failed: {e}")
+            raise
+
+def __getattr__(name: str):
+    """Record types are re-exported here, but trademap_records is only imported when asked for"""
+    if name in ('TradeDataRecord', 'TradeRecordBatch'):
+        import trademap_records
+        return getattr(trademap_records, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+async def main():
+    """Main entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Trade Map Data Extractor')
+    parser.add_argument('--plan', help='JSON plan of (country, year, month) cells to extract')
+    parser.add_argument('--stream', action='store_true',
+                        help='Insert records into ClickHouse while extracting instead of staging files')
+    parser.add_argument('--ingest', action='store_true',
+                        help='Load the staged data into ClickHouse after extraction')
+    parser.add_argument('--countries', nargs='+', help='Reporter countries to extract (without --plan)')
+    parser.add_argument('--products', nargs='+', help='HS product codes to extract (without --plan)')
+    parser.add_argument('--start-year', type=int, default=2020)
+    parser.add_argument('--end-year', type=int, default=2024)
+    parser.add_argument('--monthly', action='store_true', help='Extract monthly instead of yearly data')
+    parser.add_argument('--output', help='Staging file/dataset name shared by all shards of a job')
+    parser.add_argument('--shard', help='Shard identifier when run as one of several worker processes')
+    parser.add_argument('--status-file', help='Write a JSON summary of this run (records, failures) here')
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=['cprofile', 'sample'],
+                        help='Write per-stage profiles and a hotspot summary to logs/profiles')
+    args = parser.parse_args()
+
+    install_signal_trigger('trademap_extractor')
+    pipeline = TradeMapDataPipeline()
+    status = {'shard': args.shard, 'status': 'failed'}
+
+    try:
+        with profiling('trademap_extractor', args.profile):
+            summary = await pipeline.run_full_pipeline(
+                plan_path=args.plan, stream=args.stream, ingest=args.ingest,
+                countries=args.countries, products=args.products,
+                start_year=args.start_year, end_year=args.end_year, include_monthly=args.monthly,
+                output_name=args.output, shard_id=args.shard
+            )
+        status = dict(summary, status='completed')
+    except KeyboardInterrupt:
+        logger.info("Pipeline interrupted by user")
+        status['error'] = 'interrupted'
+    except Exception as e:
+        logger.error(f"Pipeline failed: {e}")
+        status['error'] = str(e)
+        return 1
+    finally:
+        if args.status_file:
+            with open(args.status_file, 'w') as f:
+                json.dump(status, f, indent=2, default=str)
+
+    return 0
+
+if __name__ == "__main__":
+    exit_code = asyncio.run(main())
+    exit(exit_code)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Incremental Extraction Planner
+Decides which (country, year, month) cells need extracting from trademap_data_availability
+"""
+
+import json
+import logging
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from dimension_index import DimensionIndex
+from id_allocator import get_id_allocator
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PlannedCell:
+    """One unit of incremental work: a reporter and period"""
+    country: str
+    country_id: int
+    year: int
+    month: int  # 0 = yearly data
+    reason: str = 'missing'  # 'missing', 'unavailable' or 'stale'
+
+class IncrementalPlanner:
+    """Plans delta extractions from the availability watermarks"""
+
+    def __init__(self, client=None, data_type: str = 'trade_flows',
+                 stale_after_hours: float = 24, closed_year_lag: int = 1):
+        if client is None:
+            from clickhouse_pool import get_pool
+            client = get_pool('native').acquire()
+        self.client = client
+        self.dimensions = DimensionIndex(client)
+        self.data_type = data_type
+        self.stale_after = timedelta(hours=stale_after_hours)
+        # Years older than current_year - closed_year_lag are treated as final
+        self.closed_year_lag = closed_year_lag
+
+    def get_country_ids(self, country_names: List[str]) -> Dict[str, int]:
+        """Resolve country names (or ISO/M49 codes) against trademap_countries"""
+        self.dimensions.ensure_fresh()
+        resolved = {name: self.dimensions.country_id(name) for name in country_names}
+        return {name: country_id for name, country_id in resolved.items() if country_id is not None}
+
+    def load_watermarks(self, country_ids: List[int]) -> Dict[Tuple[int, int, int], Tuple[bool, datetime]]:
+        """Latest availability state and load time per (country_id, year, month)"""
+        rows = self.client.execute(
+            '''
+            SELECT country_id, year, month,
+                   argMax(data_available, last_checked) AS available,
+                   max(last_checked) AS loaded_at
+            FROM trademap_data_availability
+            WHERE data_type = %(data_type)s AND country_id IN %(country_ids)s
+            GROUP BY country_id, year, month
+            ''',
+            {'data_type': self.data_type, 'country_ids': tuple(country_ids)}
+        )
+        return {(row[0], row[1], row[2]): (bool(row[3]), row[4]) for row in rows}
+
+    def plan(self, countries: List[str], start_year: int, end_year: int,
+             include_monthly: bool = False) -> List[PlannedCell]:
+        """List the cells that are missing, unavailable, or stale"""
+        country_ids = self.get_country_ids(countries)
+        unknown = [name for name in countries if name not in country_ids]
+        if unknown:
+            logger.warning(f"Countries not in trademap_countries, skipped by planner: {unknown}")
+
+        watermarks = self.load_watermarks(list(country_ids.values())) if country_ids else {}
+        now = datetime.now()
+        last_closed_year = now.year - self.closed_year_lag - 1
+        months = list(range(1, 13)) if include_monthly else [0]
+
+        cells = []
+        for name in countries:
+            country_id = country_ids.get(name)
+            if country_id is None:
+                continue
+            for year in range(start_year, end_year + 1):
+                for month in months:
+                    watermark = watermarks.get((country_id, year, month))
+                    if watermark is None:
+                        reason = 'missing'
+                    elif not watermark[0]:
+                        reason = 'unavailable'
+                    elif year > last_closed_year and now - watermark[1] >= self.stale_after:
+                        reason = 'stale'
+                    else:
+                        continue
+                    cells.append(PlannedCell(name, country_id, year, month, reason))
+
+        total = len(country_ids) * (end_year - start_year + 1) * len(months)
+        logger.info(f"Incremental plan: {len(cells)} of {total} cells need extraction")
+        return cells
+
+    def mark_done(self, cells: List[PlannedCell], cell_rows: Dict[Tuple[str, int, int], int]):
+        """Record successfully loaded cells so later plans skip them
+
+        cell_rows holds the records loaded per (country, year, month); a cell that
+        came back empty is stored as unavailable, so later plans check it again.
+        """
+        if not cells:
+            return
+        now = datetime.now()
+        ids = get_id_allocator().allocate(len(cells))
+        data = [{
+            'id': int(row_id),
+            'data_type': self.data_type,
+            'country_id': cell.country_id,
+            'year': cell.year,
+            'month': cell.month,
+            'data_available': cell_rows.get((cell.country, cell.year, cell.month), 0) > 0,
+            'last_checked': now,
+            'data_quality_score': 95,
+            'completeness_percent': 100,
+            'timeliness_days': 0,
+            'created_at': now
+        } for row_id, cell in zip(ids, cells)]
+
+        self.client.execute(
+            'INSERT INTO trademap_data_availability VALUES',
+            data,
+            types_check=True
+        )
+        empty = sum(1 for row in data if not row['data_available'])
+        logger.info(f"Marked {len(cells)} cells as loaded ({empty} without data)")
+
+def save_plan(path: Path, cells: List[PlannedCell], products: List[str]):
+    """Write a plan file for trademap-extractor.py --plan"""
+    with open(path, 'w') as f:
+        json.dump({'products': products, 'cells': [asdict(cell) for cell in cells]}, f, indent=2)
+
+def load_plan(path: Path) -> Tuple[List[PlannedCell], List[str]]:
+    """Read a plan file written by save_plan"""
+    with open(path, 'r') as f:
+        plan = json.load(f)
+    return [PlannedCell(**cell) for cell in plan['cells']], plan.get('products', [])
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Trade Map Record Containers
+Row dataclass and a compact column-oriented batch of extracted trade flow records
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+@dataclass
+class TradeDataRecord:
+    """Data structure for trade flow records"""
+    reporter_country: str
+    partner_country: str
+    product_code: str
+    trade_flow: str  # Import/Export
+    year: int
+    month: int
+    trade_value_usd: float
+    trade_quantity: float
+    quantity_unit: str
+    net_weight_kg: Optional[float] = None
+    gross_weight_kg: Optional[float] = None
+
+# Column order and storage: dictionary-encoded strings are pandas Categoricals, the rest NumPy arrays
+CATEGORICAL_COLUMNS = ['reporter_country', 'partner_country', 'product_code', 'trade_flow', 'quantity_unit']
+NUMERIC_DTYPES = {
+    'year': 'uint16',
+    'month': 'uint8',
+    'trade_value_usd': 'float64',
+    'trade_quantity': 'float64',
+    'net_weight_kg': 'float64',  # NaN where the source had no weight
+    'gross_weight_kg': 'float64'
+}
+RECORD_COLUMNS = [
+    'reporter_country', 'partner_country', 'product_code', 'trade_flow', 'year', 'month',
+    'trade_value_usd', 'trade_quantity', 'quantity_unit', 'net_weight_kg', 'gross_weight_kg'
+]
+
+def _optional_float(value) -> float:
+    return math.nan if value is None else float(value)
+
+class TradeRecordBatch:
+    """A page of trade flow records stored as typed columns
+
+    Country, product, flow and unit strings are dictionary-encoded, so a batch costs a
+    few bytes per row instead of one TradeDataRecord object per row. It still behaves
+    as a sequence of TradeDataRecord for code that wants rows, and converts to a
+    DataFrame or Arrow table without copying the column buffers.
+    """
+
+    __slots__ = ('columns',)
+
+    def __init__(self, columns: Mapping[str, object]):
+        self.columns: Dict[str, object] = {}
+        for name in RECORD_COLUMNS:
+            values = columns[name]
+            if name in CATEGORICAL_COLUMNS:
+                self.columns[name] = values if isinstance(values, pd.Categorical) else pd.Categorical(values)
+            else:
+                self.columns[name] = np.asarray(values, dtype=NUMERIC_DTYPES[name])
+
+    @classmethod
+    def empty(cls) -> 'TradeRecordBatch':
+        return cls({name: [] for name in RECORD_COLUMNS})
+
+    @classmethod
+    def from_api_items(cls, reporter_country: str, partner_country: str, product_code: str,
+                       year: int, month: Optional[int], items: Sequence[Mapping]) -> 'TradeRecordBatch':
+        """Build a batch straight from one /api/trade-data response"""
+        count = len(items)
+
+        def constant(value: str) -> pd.Categorical:
+            return pd.Categorical.from_codes(np.zeros(count, dtype='int8'), [value])
+
+        def numbers(key: str, default, convert=float, dtype='float64') -> np.ndarray:
+            return np.fromiter((convert(item.get(key, default)) for item in items), dtype=dtype, count=count)
+
+        return cls({
+            'reporter_country': constant(reporter_country),
+            'partner_country': constant(partner_country),
+            'product_code': constant(product_code),
+            'trade_flow': pd.Categorical([item.get('flow', 'Export') for item in items]),
+            'year': np.full(count, year, dtype='uint16'),
+            'month': np.full(count, month, dtype='uint8') if month else numbers('month', 0, int, 'uint8'),
+            'trade_value_usd': numbers('trade_value_usd', 0),
+            'trade_quantity': numbers('trade_quantity', 0),
+            'quantity_unit': pd.Categorical([item.get('quantity_unit', '') for item in items]),
+            'net_weight_kg': numbers('net_weight_kg', None, _optional_float),
+            'gross_weight_kg': numbers('gross_weight_kg', None, _optional_float)
+        })
+
+    @classmethod
+    def from_records(cls, records: Iterable[TradeDataRecord]) -> 'TradeRecordBatch':
+        """Encode TradeDataRecord rows as a batch"""
+        records = list(records)
+        return cls({
+            name: [
+                _optional_float(getattr(record, name)) if name.endswith('_kg') else getattr(record, name)
+                for record in records
+            ]
+            for name in RECORD_COLUMNS
+        })
+
+    @classmethod
+    def concat(cls, batches: Iterable['TradeRecordBatch']) -> 'TradeRecordBatch':
+        """Join batches into one; dictionaries are merged, codes re-mapped"""
+        batches = [batch for batch in batches if len(batch)]
+        if not batches:
+            return cls.empty()
+        if len(batches) == 1:
+            return batches[0]
+        columns = {}
+        for name in RECORD_COLUMNS:
+            parts = [batch.columns[name] for batch in batches]
+            columns[name] = union_categoricals(parts) if name in CATEGORICAL_COLUMNS else np.concatenate(parts)
+        return cls(columns)
+
+    def __len__(self) -> int:
+        return len(self.columns['year'])
+
+    def __iter__(self) -> Iterator[TradeDataRecord]:
+        for index in range(len(self)):
+            yield self._record(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TradeRecordBatch({name: values[index] for name, values in self.columns.items()})
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('record index out of range')
+        return self._record(index)
+
+    def _record(self, index: int) -> TradeDataRecord:
+        net_weight = float(self.columns['net_weight_kg'][index])
+        gross_weight = float(self.columns['gross_weight_kg'][index])
+        return TradeDataRecord(
+            reporter_country=self.columns['reporter_country'][index],
+            partner_country=self.columns['partner_country'][index],
+            product_code=self.columns['product_code'][index],
+            trade_flow=self.columns['trade_flow'][index],
+            year=int(self.columns['year'][index]),
+            month=int(self.columns['month'][index]),
+            trade_value_usd=float(self.columns['trade_value_usd'][index]),
+            trade_quantity=float(self.columns['trade_quantity'][index]),
+            quantity_unit=self.columns['quantity_unit'][index],
+            net_weight_kg=None if math.isnan(net_weight) else net_weight,
+            gross_weight_kg=None if math.isnan(gross_weight) else gross_weight
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the column buffers (codes and dictionaries included)"""
+        total = 0
+        for values in self.columns.values():
+            if isinstance(values, pd.Categorical):
+                total += values.codes.nbytes + int(values.categories.memory_usage(deep=True))
+            else:
+                total += values.nbytes
+        return total
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame over the same buffers (categorical string columns)"""
+        return pd.DataFrame({name: self.columns[name] for name in RECORD_COLUMNS}, copy=False)
+
+    def to_arrow(self):
+        """pyarrow Table; categorical columns become dictionary arrays"""
+        import pyarrow as pa
+        return pa.Table.from_pandas(self.to_frame(), preserve_index=False)
+
+    def __repr__(self) -> str:
+        return f"TradeRecordBatch({len(self)} records, {self.nbytes} bytes)"
+
+def as_record_batch(records) -> TradeRecordBatch:
+    """Accept a TradeRecordBatch or any sequence of TradeDataRecord"""
+    if isinstance(records, TradeRecordBatch):
+        return records
+    return TradeRecordBatch.from_records(records)
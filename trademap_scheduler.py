@@ -0,0 +1,1019 @@
+#!/usr/bin/env python3
+"""
+Trade Map Data Scheduler
+Schedules regular data extraction and ingestion from Trade Map
+"""
+
+import asyncio
+import logging
+import os
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+import shutil
+import subprocess
+import sys
+import signal
+import atexit
+import time
+
+from pipeline_metrics import (
+    JOB_SECONDS, REGISTRY, MetricsRegistry, render_snapshot, start_job_metrics, stop_job_metrics
+)
+from pipeline_profiling import install_signal_trigger
+from trademap_planner import PlannedCell, save_plan
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+LOGS_DIR = Path("./logs")
+
+def _catches_signal(pid: int, signum: int) -> bool:
+    """Whether a process has a handler for signum (Linux /proc; assumed elsewhere)"""
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for line in f:
+                if line.startswith('SigCgt:'):
+                    return bool(int(line.split()[1], 16) >> (signum - 1) & 1)
+    except OSError:
+        pass
+    return True
+
+def profile_running_job(job_id: str, logs_dir: Path = LOGS_DIR) -> List[int]:
+    """Signal a running job's processes to take a sampling profile; returns the PIDs signalled"""
+    running_file = logs_dir / 'running_jobs.json'
+    running = {}
+    if running_file.exists():
+        with open(running_file, 'r') as f:
+            running = json.load(f)
+    if job_id not in running:
+        raise ValueError(f"Job {job_id} is not running (running: {', '.join(running) or 'none'})")
+
+    signalled = []
+    for pid in running[job_id]['pids']:
+        if not _catches_signal(pid, signal.SIGUSR1):
+            # Not yet past startup: the default action would kill it
+            logger.warning(f"Process {pid} of job {job_id} has no profiling trigger installed; skipped")
+            continue
+        try:
+            os.kill(pid, signal.SIGUSR1)
+            signalled.append(pid)
+        except ProcessLookupError:
+            logger.warning(f"Process {pid} of job {job_id} has already exited")
+    return signalled
+
+class TradeMapScheduler:
+    """Scheduler for Trade Map data extraction and ingestion"""
+
+    def __init__(self):
+        self.data_dir = Path("./data/trademap")
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+
+        self.config_dir = Path("./config")
+        self.config_dir.mkdir(parents=True, exist_ok=True)
+
+        self.logs_dir = LOGS_DIR
+        self.logs_dir.mkdir(parents=True, exist_ok=True)
+
+        # Scheduler configuration
+        self.config = {
+            'extraction_interval_hours': 24,  # Daily extraction
+            'retention_days': 90,  # Keep data for 90 days
+            'max_concurrent_jobs': 3,  # Extractor worker processes per job
+            'shard_by': 'reporter',  # Split jobs by 'reporter' country or HS 'chapter'
+            'retry_attempts': 3,
+            'retry_delay_minutes': 5,
+            'ingestion_workers': 3,  # Staged files loaded concurrently
+            'ingestion_retry_delay_seconds': 30,  # Pause before retrying a failed file
+            'ingestion_in_process': True,  # Load in this process over pooled connections instead of a loader process
+            'incremental_extraction': True,  # Only extract cells missing/stale in trademap_data_availability
+            'stale_after_hours': 24,  # Re-extract open periods older than this
+            'closed_year_lag': 1,  # Years before (current year - lag) are final and never re-extracted
+            'streaming_ingestion': True,  # Extractor inserts into ClickHouse as it goes; no CSV or loader process
+            'worker_id_range': [0, 1023],  # ID_WORKER_ID values: the first for this process, the rest for children; disjoint per host
+            'metrics_host': '127.0.0.1',
+            'metrics_port': 9108,  # Prometheus /metrics endpoint while the scheduler loop runs; 0 disables it
+            'notification_email': os.getenv('NOTIFICATION_EMAIL', ''),
+            'slack_webhook': os.getenv('SLACK_WEBHOOK', '')
+        }
+
+        # Load configuration
+        self.load_config()
+
+        # Incremental planner (created on first use - needs a ClickHouse connection)
+        self.planner = None
+
+        # Job tracking
+        self.running_jobs: Dict[str, Dict] = {}  # job_id -> type, start time and process IDs (for --profile-job)
+        self.job_history = []
+        self.ingestion_manifest = self.load_ingestion_manifest()
+        self.shutdown_event = asyncio.Event()
+
+        # One summary view rebuild at a time across overlapping jobs
+        self.view_rebuild_lock = asyncio.Lock()
+
+        # Distinct Snowflake worker IDs for this process and each child it starts
+        first_worker_id, last_worker_id = self.config['worker_id_range']
+        if last_worker_id <= first_worker_id:
+            raise ValueError("worker_id_range needs room for this process and its children")
+        self.worker_id = int(os.environ.setdefault('ID_WORKER_ID', str(first_worker_id)))
+        self.child_worker_ids = [
+            worker_id for worker_id in range(first_worker_id, last_worker_id + 1) if worker_id != self.worker_id
+        ]
+        self.child_worker_count = 0
+
+        # Register signal handlers
+        signal.signal(signal.SIGINT, self.signal_handler)
+        signal.signal(signal.SIGTERM, self.signal_handler)
+        atexit.register(self.cleanup)
+
+        # SIGUSR1 samples in-process work (e.g. in-process ingestion) for a while
+        install_signal_trigger('trademap_scheduler')
+
+    def load_config(self):
+        """Load scheduler configuration"""
+        config_file = self.config_dir / 'scheduler_config.json'
+        if config_file.exists():
+            try:
+                with open(config_file, 'r') as f:
+                    loaded_config = json.load(f)
+                    self.config.update(loaded_config)
+                logger.info("Loaded scheduler configuration")
+            except Exception as e:
+                logger.error(f"Failed to load config: {e}")
+
+    def save_config(self):
+        """Save scheduler configuration"""
+        config_file = self.config_dir / 'scheduler_config.json'
+        try:
+            with open(config_file, 'w') as f:
+                json.dump(self.config, f, indent=2)
+            logger.info("Saved scheduler configuration")
+        except Exception as e:
+            logger.error(f"Failed to save config: {e}")
+
+    def signal_handler(self, signum, frame):
+        """Handle shutdown signals"""
+        logger.info(f"Received signal {signum}, shutting down...")
+        self.shutdown_event.set()
+
+    def cleanup(self):
+        """Cleanup function"""
+        logger.info("Performing cleanup...")
+        # Save job history
+        self.save_job_history()
+
+    def save_job_history(self):
+        """Save job execution history"""
+        history_file = self.logs_dir / 'job_history.json'
+        try:
+            with open(history_file, 'w') as f:
+                json.dump(self.job_history[-100:], f, indent=2, default=str)  # Keep last 100 jobs
+        except Exception as e:
+            logger.error(f"Failed to save job history: {e}")
+
+    def load_job_history(self):
+        """Load job execution history"""
+        history_file = self.logs_dir / 'job_history.json'
+        if history_file.exists():
+            try:
+                with open(history_file, 'r') as f:
+                    self.job_history = json.load(f)
+                logger.info(f"Loaded {len(self.job_history)} job history records")
+            except Exception as e:
+                logger.error(f"Failed to load job history: {e}")
+
+    def _track_job(self, job_id: str, job_type: Optional[str] = None, started_pid: Optional[int] = None,
+                   exited_pid: Optional[int] = None, done: bool = False):
+        """Keep logs/running_jobs.json listing each running job's processes"""
+        if done:
+            self.running_jobs.pop(job_id, None)
+        elif job_id not in self.running_jobs:
+            self.running_jobs[job_id] = {
+                'job_type': job_type, 'start_time': datetime.now().isoformat(), 'pids': [os.getpid()]
+            }
+        pids = self.running_jobs.get(job_id, {}).get('pids', [])
+        if started_pid is not None:
+            pids.append(started_pid)
+        if exited_pid in pids:
+            pids.remove(exited_pid)
+        try:
+            with open(self.logs_dir / 'running_jobs.json', 'w') as f:
+                json.dump(self.running_jobs, f, indent=2)
+        except Exception as e:
+            logger.error(f"Failed to save running jobs: {e}")
+
+    def _assign_worker_id(self, env: Dict):
+        """Give a child process its own ID_WORKER_ID, cycling through worker_id_range"""
+        env['ID_WORKER_ID'] = str(self.child_worker_ids[self.child_worker_count % len(self.child_worker_ids)])
+        self.child_worker_count += 1
+
+    def _child_metrics_file(self, env: Dict, name: str) -> Path:
+        """Have a child process dump its metrics on exit (see pipeline_metrics)"""
+        path = self.logs_dir / f"metrics_child_{name}.json"
+        path.unlink(missing_ok=True)
+        env['PIPELINE_METRICS_FILE'] = str(path)
+        return path
+
+    def _merge_child_metrics(self, path: Path):
+        """Fold a finished child's metrics into this process's registry (and its job's)
+
+        Gauges are left out: the queues they measured went away with the child.
+        """
+        if not path.exists():
+            return
+        try:
+            with open(path, 'r') as f:
+                snapshot = json.load(f)
+            REGISTRY.merge({name: data for name, data in snapshot.items() if data.get('type') != 'gauge'})
+        except Exception as e:
+            logger.warning(f"Failed to read child metrics {path}: {e}")
+        finally:
+            path.unlink(missing_ok=True)
+
+    def _dump_job_metrics(self, job_record: Dict, job_metrics: MetricsRegistry, started: float):
+        """Write the metrics collected for a job alone to logs/metrics_<job_id>.json"""
+        JOB_SECONDS.observe(time.perf_counter() - started, job_type=job_record['job_type'], status=job_record['status'])
+        metrics_file = self.logs_dir / f"metrics_{job_record['job_id']}.json"
+        try:
+            with open(metrics_file, 'w') as f:
+                json.dump(job_metrics.snapshot(), f)
+            job_record['metrics_file'] = str(metrics_file)
+        except Exception as e:
+            logger.error(f"Failed to write job metrics: {e}")
+
+    def load_ingestion_manifest(self) -> Dict[str, Dict]:
+        """Load the record of staged files already loaded into ClickHouse"""
+        manifest_file = self.data_dir / 'ingestion_manifest.json'
+        if manifest_file.exists():
+            try:
+                with open(manifest_file, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Failed to load ingestion manifest: {e}")
+        return {}
+
+    def save_ingestion_manifest(self):
+        """Save the ingestion manifest (written to a temporary file, then renamed)"""
+        manifest_file = self.data_dir / 'ingestion_manifest.json'
+        try:
+            tmp_file = manifest_file.with_suffix('.tmp')
+            with open(tmp_file, 'w') as f:
+                json.dump(self.ingestion_manifest, f, indent=2, default=str)
+            os.replace(tmp_file, manifest_file)
+        except Exception as e:
+            logger.error(f"Failed to save ingestion manifest: {e}")
+
+    @staticmethod
+    def _staged_signature(path: Path) -> List:
+        """Size and modification time of a staged file, or of every file in a dataset directory"""
+        files = [p for p in path.rglob('*') if p.is_file()] if path.is_dir() else [path]
+        stats = [p.stat() for p in files]
+        return [len(stats), sum(st.st_size for st in stats), max((st.st_mtime for st in stats), default=0)]
+
+    def _is_loaded(self, path: Path) -> bool:
+        """True if the manifest has this staged file loaded in its current state"""
+        entry = self.ingestion_manifest.get(path.name)
+        return bool(entry) and entry['status'] == 'loaded' and entry['signature'] == self._staged_signature(path)
+
+    async def run_extraction_job(self, job_config: Dict) -> Dict:
+        """Run a single extraction job"""
+        job_id = job_config.get('job_id', f"job_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        start_time = datetime.now()
+        (job_metrics, metrics_token), started = start_job_metrics(), time.perf_counter()
+
+        logger.info(f"Starting extraction job: {job_id}")
+        self._track_job(job_id, 'extraction')
+
+        # Create job record
+        job_record = {
+            'job_id': job_id,
+            'job_type': 'extraction',
+            'config': job_config,
+            'start_time': start_time.isoformat(),
+            'status': 'running',
+            'attempts': 0
+        }
+
+        try:
+            # Plan the delta from availability watermarks
+            plan_cells = None
+            if job_config.get('incremental'):
+                plan_cells = await self._plan_incremental(job_config)
+                if plan_cells is not None:
+                    job_record['planned_cells'] = len(plan_cells)
+                    if not plan_cells:
+                        logger.info(f"Extraction job {job_id}: all cells up to date, nothing to extract")
+                        job_record['status'] = 'skipped'
+                        job_record['message'] = 'All cells up to date'
+                        job_record['end_time'] = datetime.now().isoformat()
+                        return job_record
+
+
+            # Split the job into shards, each run by its own extractor process
+            shards = self._build_shards(job_id, job_config, plan_cells)
+            job_record['shards'] = {shard['shard_id']: {'status': 'pending'} for shard in shards}
+
+            # Run extraction with retries; completed shards are not run again
+            for attempt in range(self.config['retry_attempts']):
+                job_record['attempts'] = attempt + 1
+
+                try:
+                    pending = [shard for shard in shards if job_record['shards'][shard['shard_id']]['status'] != 'completed']
+                    job_record['shards'].update(await self._execute_extraction(job_id, pending))
+                    success = all(result['status'] == 'completed' for result in job_record['shards'].values())
+                    if success:
+                        job_record['status'] = 'completed'
+                        job_record['end_time'] = datetime.now().isoformat()
+                        job_record['duration_seconds'] = (datetime.now() - start_time).total_seconds()
+                        job_record['records'] = sum(result.get('records', 0) for result in job_record['shards'].values())
+                        job_record['failed_work_items'] = [
+                            item for result in job_record['shards'].values() for item in result.get('failed_work_items', [])
+                        ]
+
+                        if self.config['streaming_ingestion']:
+                            # The extractors already loaded everything they extracted; the shards
+                            # leave the summary views alone so they are rebuilt once here
+                            loaded = await self._rebuild_views(
+                                year for result in job_record['shards'].values() for year in result.get('loaded_years', [])
+                            )
+                        else:
+                            # Run ingestion if extraction succeeded
+                            staged_files = sorted({
+                                result['staged'] for result in job_record['shards'].values() if result.get('staged')
+                            })
+                            ingestion = await self.run_ingestion_job(dict(job_config, staged_files=staged_files))
+                            loaded = ingestion['status'] != 'failed' and all(self._is_loaded(Path(path)) for path in staged_files)
+
+                        # Advance the watermarks only once the data is actually loaded, and
+                        # never for a cell with a combination that failed to extract
+                        if plan_cells and loaded:
+                            failed_cells = {
+                                (reporter, year, month or 0)
+                                for reporter, _, year, month in job_record['failed_work_items']
+                            }
+                            done_cells = [
+                                cell for cell in plan_cells
+                                if (cell.country, cell.year, cell.month) not in failed_cells
+                            ]
+                            if len(done_cells) < len(plan_cells):
+                                logger.warning(
+                                    f"Extraction job {job_id}: {len(plan_cells) - len(done_cells)} cells "
+                                    f"left stale after failed combinations"
+                                )
+                            cell_rows = {}
+                            for result in job_record['shards'].values():
+                                for country, year, month, rows in result.get('cell_rows', []):
+                                    cell_rows[(country, year, month)] = cell_rows.get((country, year, month), 0) + rows
+                            await self._mark_cells_done(done_cells, cell_rows)
+
+                        logger.info(f"Extraction job {job_id} completed successfully")
+                        break
+                    else:
+                        failed = [shard_id for shard_id, result in job_record['shards'].items() if result['status'] != 'completed']
+                        raise Exception(f"Extraction failed for shards {failed}")
+
+                except Exception as e:
+                    logger.warning(f"Extraction attempt {attempt + 1} failed: {e}")
+                    if attempt < self.config['retry_attempts'] - 1:
+                        await asyncio.sleep(self.config['retry_delay_minutes'] * 60)
+                    else:
+                        job_record['status'] = 'failed'
+                        job_record['error'] = str(e)
+                        job_record['end_time'] = datetime.now().isoformat()
+
+            if job_record['status'] == 'failed' and self.config['streaming_ingestion']:
+                # Failed shards may have streamed part of their rows before giving up
+                if plan_cells:
+                    years = {cell.year for cell in plan_cells}
+                else:
+                    years = range(job_config.get('start_year', 2020), job_config.get('end_year', datetime.now().year) + 1)
+                await self._rebuild_views(years)
+
+        except Exception as e:
+            logger.error(f"Extraction job {job_id} failed: {e}")
+            job_record['status'] = 'failed'
+            job_record['error'] = str(e)
+            job_record['end_time'] = datetime.now().isoformat()
+
+        finally:
+            # Save job record
+            self._track_job(job_id, done=True)
+            self._dump_job_metrics(job_record, job_metrics, started)
+            stop_job_metrics(metrics_token)
+            self.job_history.append(job_record)
+            self.save_job_history()
+
+            # Send notifications if configured
+            if job_record['status'] == 'failed':
+                await self.send_failure_notification(job_record)
+
+        return job_record
+
+    def _get_planner(self):
+        """Create the incremental planner on first use"""
+        if self.planner is None:
+            from trademap_planner import IncrementalPlanner
+            self.planner = IncrementalPlanner(
+                stale_after_hours=self.config['stale_after_hours'],
+                closed_year_lag=self.config['closed_year_lag']
+            )
+        return self.planner
+
+    async def _plan_incremental(self, job_config: Dict) -> Optional[List]:
+        """Plan the cells to extract; None means fall back to a full extraction"""
+        try:
+            planner = self._get_planner()
+            return await asyncio.to_thread(
+                planner.plan,
+                job_config.get('countries', []),
+                job_config.get('start_year', datetime.now().year),
+                job_config.get('end_year', datetime.now().year),
+                job_config.get('include_monthly', False)
+            )
+        except Exception as e:
+            logger.warning(f"Incremental planning failed, running full extraction: {e}")
+            return None
+
+    async def _rebuild_views(self, years) -> bool:
+        """Rebuild the summary views for the years a job loaded, once and one job at a time"""
+        years = sorted(set(years))
+        if not years:
+            return True
+
+        from clickhouse_loader import ClickHouseLoader
+
+        def rebuild():
+            loader = ClickHouseLoader()
+            try:
+                if loader.ingest_mode == 'upsert':
+                    loader.rebuild_materialized_views(years)
+            finally:
+                loader.close()
+
+        try:
+            async with self.view_rebuild_lock:
+                await asyncio.to_thread(rebuild)
+            logger.info(f"Rebuilt summary views for {years}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to rebuild summary views for {years}: {e}")
+            return False
+
+    async def _mark_cells_done(self, cells: List, cell_rows: Dict):
+        """Record loaded cells and whether they had any rows in trademap_data_availability"""
+        try:
+            await asyncio.to_thread(self._get_planner().mark_done, cells, cell_rows)
+        except Exception as e:
+            logger.error(f"Failed to update availability watermarks: {e}")
+
+    def _build_shards(self, job_id: str, job_config: Dict, plan_cells: Optional[List[PlannedCell]]) -> List[Dict]:
+        """Split a job into at most max_concurrent_jobs shards by reporter or HS chapter"""
+        workers = max(1, self.config['max_concurrent_jobs'])
+        products = job_config.get('products', [])
+        if plan_cells:
+            countries = list(dict.fromkeys(cell.country for cell in plan_cells))
+        else:
+            countries = job_config.get('countries', [])
+
+        if self.config['shard_by'] == 'chapter':
+            # Keep every product of an HS chapter in the same shard
+            chapters = list(dict.fromkeys(code[:2] for code in products))
+            groups = [chapters[i::workers] for i in range(min(workers, len(chapters)))]
+            splits = [(countries, [code for code in products if code[:2] in group]) for group in groups]
+        else:
+            groups = [countries[i::workers] for i in range(min(workers, len(countries)))]
+            splits = [(group, products) for group in groups]
+
+        shards = []
+        for index, (shard_countries, shard_products) in enumerate(splits or [(countries, products)]):
+            shard = {
+                'shard_id': f"shard{index:02d}",
+                'countries': shard_countries,
+                'products': shard_products,
+                'start_year': job_config.get('start_year', 2020),
+                'end_year': job_config.get('end_year', datetime.now().year),
+                'include_monthly': job_config.get('include_monthly', False)
+            }
+            if plan_cells:
+                shard_plan = self.config_dir / f"extraction_plan_{job_id}_{shard['shard_id']}.json"
+                save_plan(shard_plan, [cell for cell in plan_cells if cell.country in shard_countries], shard_products)
+                shard['plan_file'] = str(shard_plan)
+            shards.append(shard)
+
+        logger.info(f"Job {job_id}: {len(shards)} shard(s) by {self.config['shard_by']}")
+        return shards
+
+    async def _execute_extraction(self, job_id: str, shards: List[Dict]) -> Dict[str, Dict]:
+        """Run the shards as extractor processes, at most max_concurrent_jobs at a time"""
+        semaphore = asyncio.Semaphore(max(1, self.config['max_concurrent_jobs']))
+        results = await asyncio.gather(*(self._run_extraction_shard(job_id, shard, semaphore) for shard in shards))
+        return {shard['shard_id']: result for shard, result in zip(shards, results)}
+
+    async def _run_extraction_shard(self, job_id: str, shard: Dict, semaphore: asyncio.Semaphore) -> Dict:
+        """Execute one extraction shard and return its status"""
+        shard_id = shard['shard_id']
+        status_file = self.logs_dir / f"extraction_{job_id}_{shard_id}.json"
+        result = {'status': 'failed'}
+
+        async with semaphore:
+            try:
+                # Run the extraction script
+                cmd = [
+                    sys.executable,
+                    'trademap-extractor.py',
+                    '--shard', shard_id,
+                    '--output', f"trade_data_{job_id}",
+                    '--status-file', str(status_file)
+                ]
+
+                if self.config['streaming_ingestion']:
+                    cmd.append('--stream')
+
+                # Add the shard's slice of the job
+                if 'plan_file' in shard:
+                    cmd.extend(['--plan', shard['plan_file']])
+                else:
+                    if shard['countries']:
+                        cmd.extend(['--countries', *shard['countries']])
+                    if shard['products']:
+                        cmd.extend(['--products', *shard['products']])
+                    cmd.extend(['--start-year', str(shard['start_year']), '--end-year', str(shard['end_year'])])
+                    if shard['include_monthly']:
+                        cmd.append('--monthly')
+
+                # Shards share one request budget through the file-backed rate limiter
+                # and leave the summary view rebuild to the job
+                env = dict(os.environ, PIPELINE_JOB_ID=job_id, CLICKHOUSE_REBUILD_VIEWS='false')
+                env.setdefault('RATE_LIMIT_STATE_DIR', str(self.config_dir / 'rate_limits'))
+                self._assign_worker_id(env)
+                metrics_file = self._child_metrics_file(env, f"{job_id}_{shard_id}")
+
+                # Run the command
+                process = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    cwd=os.getcwd(),
+                    env=env
+                )
+
+                self._track_job(job_id, started_pid=process.pid)
+                stdout, stderr = await process.communicate()
+                self._track_job(job_id, exited_pid=process.pid)
+                self._merge_child_metrics(metrics_file)
+
+                if status_file.exists():
+                    with open(status_file, 'r') as f:
+                        result = json.load(f)
+                result['returncode'] = process.returncode
+
+                if process.returncode == 0 and result.get('status') == 'completed':
+                    logger.info(f"Extraction shard {shard_id} completed: {result.get('records', 0)} records")
+                    if stdout:
+                        logger.debug(f"Extraction stdout: {stdout.decode()}")
+                else:
+                    result['status'] = 'failed'
+                    logger.error(f"Extraction shard {shard_id} failed with return code {process.returncode}")
+                    if stderr:
+                        logger.error(f"Extraction stderr: {stderr.decode()}")
+
+            except Exception as e:
+                logger.error(f"Failed to execute extraction shard {shard_id}: {e}")
+                result = {'status': 'failed', 'error': str(e)}
+
+        return result
+
+    async def run_ingestion_job(self, job_config: Dict) -> Dict:
+        """Run data ingestion job"""
+        job_id = f"ingest_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        start_time = datetime.now()
+        (job_metrics, metrics_token), started = start_job_metrics(), time.perf_counter()
+
+        logger.info(f"Starting ingestion job: {job_id}")
+        self._track_job(job_id, 'ingestion')
+
+        job_record = {
+            'job_id': job_id,
+            'job_type': 'ingestion',
+            'config': job_config,
+            'start_time': start_time.isoformat(),
+            'status': 'running'
+        }
+
+        try:
+            # Every staged file (CSV files and Parquet dataset directories) not yet loaded in its current state
+            staged_files = set(self.data_dir.glob("trade_data_*"))
+            staged_files.update(Path(path) for path in job_config.get('staged_files', []))
+            pending = sorted(
+                (path for path in staged_files if path.exists() and not self._is_loaded(path)),
+                key=lambda path: path.stat().st_mtime
+            )
+            if not pending:
+                logger.info("No pending staged files to ingest")
+                job_record['status'] = 'skipped'
+                job_record['message'] = 'No pending staged files'
+                return job_record
+
+            # Load the backlog concurrently, oldest first; each file retries on its own
+            logger.info(f"Ingesting {len(pending)} staged files with {self.config['ingestion_workers']} workers")
+            semaphore = asyncio.Semaphore(max(1, self.config['ingestion_workers']))
+            loaded_years = set()
+            results = await asyncio.gather(*(
+                self._ingest_staged_file(path, semaphore, job_id, loaded_years) for path in pending
+            ))
+
+            job_record['files'] = {path.name: ('loaded' if ok else 'failed') for path, ok in zip(pending, results)}
+            job_record['status'] = 'completed' if all(results) else 'failed'
+            if not all(results):
+                job_record['error'] = f"{results.count(False)} of {len(pending)} staged files failed to load"
+
+            # The loaders leave the summary views alone; rebuild every year touched, failed files included
+            if not await self._rebuild_views(loaded_years):
+                job_record['status'] = 'failed'
+                job_record.setdefault('error', 'Summary view rebuild failed')
+
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {e}")
+            job_record['status'] = 'failed'
+            job_record['error'] = str(e)
+
+        finally:
+            job_record['end_time'] = datetime.now().isoformat()
+            job_record['duration_seconds'] = (datetime.now() - start_time).total_seconds()
+
+            self._track_job(job_id, done=True)
+            self._dump_job_metrics(job_record, job_metrics, started)
+            stop_job_metrics(metrics_token)
+            self.job_history.append(job_record)
+            self.save_job_history()
+
+        return job_record
+
+    async def _ingest_staged_file(self, path: Path, semaphore: asyncio.Semaphore, job_id: str,
+                                  loaded_years: set) -> bool:
+        """Load one staged file with retries and record the outcome in the manifest"""
+        async with semaphore:
+            signature = self._staged_signature(path)
+            success = False
+            attempts = 0
+            max_attempts = max(1, self.config['retry_attempts'])
+            while attempts < max_attempts:
+                attempts += 1
+                success = await self._execute_ingestion(str(path), job_id, loaded_years)
+                if success:
+                    break
+                if attempts < max_attempts:
+                    logger.warning(f"Retrying ingestion of {path.name} (attempt {attempts + 1})")
+                    await asyncio.sleep(self.config['ingestion_retry_delay_seconds'])
+
+            previous = self.ingestion_manifest.get(path.name, {})
+            self.ingestion_manifest[path.name] = {
+                'status': 'loaded' if success else 'failed',
+                'signature': signature,
+                'attempts': previous.get('attempts', 0) + attempts,
+                'updated_at': datetime.now().isoformat()
+            }
+            self.save_ingestion_manifest()
+            return success
+
+    async def _execute_ingestion(self, csv_file: str, job_id: str, loaded_years: set) -> bool:
+        """Execute data ingestion, adding the years it loaded to loaded_years"""
+        if self.config['ingestion_in_process']:
+            return await self._execute_ingestion_in_process(csv_file, loaded_years)
+
+        try:
+            status_file = self.logs_dir / f"ingestion_{job_id}_{Path(csv_file).name}.json"
+            status_file.unlink(missing_ok=True)
+            cmd = [
+                sys.executable,
+                'clickhouse-loader.py',
+                f"--status-file={status_file}",
+                csv_file
+            ]
+
+            # The job rebuilds the summary views once after all its files
+            env = dict(os.environ, PIPELINE_JOB_ID=job_id, CLICKHOUSE_REBUILD_VIEWS='false')
+            self._assign_worker_id(env)
+            metrics_file = self._child_metrics_file(env, Path(csv_file).name)
+
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=os.getcwd(),
+                env=env
+            )
+
+            self._track_job(job_id, started_pid=process.pid)
+            stdout, stderr = await process.communicate()
+            self._track_job(job_id, exited_pid=process.pid)
+            self._merge_child_metrics(metrics_file)
+
+            if status_file.exists():
+                with open(status_file, 'r') as f:
+                    loaded_years.update(json.load(f).get('loaded_years', []))
+                status_file.unlink()
+
+            if process.returncode == 0:
+                logger.info(f"Ingestion completed successfully for {csv_file}")
+                if stdout:
+                    logger.debug(f"Ingestion stdout: {stdout.decode()}")
+                return True
+            else:
+                logger.error(f"Ingestion failed with return code {process.returncode}")
+                if stderr:
+                    logger.error(f"Ingestion stderr: {stderr.decode()}")
+                return False
+
+        except Exception as e:
+            logger.error(f"Failed to execute ingestion: {e}")
+            return False
+
+    async def _execute_ingestion_in_process(self, csv_file: str, loaded_years: set) -> bool:
+        """Load a staged file in a worker thread; the loader reuses this process's pooled connections"""
+        from clickhouse_loader import ClickHouseLoader
+
+        def load():
+            loader = ClickHouseLoader(rebuild_views=False)
+            try:
+                loader.load_trade_flows_data(csv_file)
+            finally:
+                loaded_years.update(int(year) for year in loader.loaded_years)
+                loader.close()
+
+        try:
+            await asyncio.to_thread(load)
+            logger.info(f"Ingestion completed successfully for {csv_file}")
+            return True
+        except Exception as e:
+            logger.error(f"Ingestion failed for {csv_file}: {e}")
+            return False
+
+    async def send_failure_notification(self, job_record: Dict):
+        """Send failure notification"""
+        message = f"Trade Map Data Pipeline Alert\n\nJob {job_record['job_id']} failed\nError: {job_record.get('error', 'Unknown error')}\nTime: {job_record.get('end_time', 'Unknown')}"
+
+        # Email notification (if configured)
+        if self.config.get('notification_email'):
+            # This would need email library implementation
+            logger.info(f"Would send email notification to {self.config['notification_email']}")
+
+        # Slack notification (if configured)
+        if self.config.get('slack_webhook'):
+            # This would need HTTP client implementation
+            logger.info("Would send Slack notification")
+
+    async def run_cleanup_job(self):
+        """Run data cleanup job"""
+        logger.info("Running data cleanup job")
+
+        try:
+            # Remove old data files
+            cutoff_date = datetime.now() - timedelta(days=self.config['retention_days'])
+
+            for csv_file in self.data_dir.glob("*.csv"):
+                if csv_file.stat().st_mtime < cutoff_date.timestamp():
+                    csv_file.unlink()
+                    logger.info(f"Removed old data file: {csv_file}")
+
+            # Staged Parquet datasets are directories
+            for dataset_dir in self.data_dir.glob("trade_data_*"):
+                if dataset_dir.is_dir() and dataset_dir.stat().st_mtime < cutoff_date.timestamp():
+                    shutil.rmtree(dataset_dir)
+                    logger.info(f"Removed old staged dataset: {dataset_dir}")
+
+            # Forget manifest entries of staged files that no longer exist
+            removed = [name for name in self.ingestion_manifest if not (self.data_dir / name).exists()]
+            for name in removed:
+                del self.ingestion_manifest[name]
+            if removed:
+                self.save_ingestion_manifest()
+
+            # Clean up old log files
+            for log_file in self.logs_dir.glob("*.log"):
+                if log_file.stat().st_mtime < cutoff_date.timestamp():
+                    log_file.unlink()
+                    logger.info(f"Removed old log file: {log_file}")
+
+            for metrics_file in self.logs_dir.glob("metrics_*.json"):
+                if metrics_file.stat().st_mtime < cutoff_date.timestamp():
+                    metrics_file.unlink()
+
+        except Exception as e:
+            logger.error(f"Cleanup job failed: {e}")
+
+    async def run_monitoring_job(self):
+        """Run system monitoring job"""
+        logger.info("Running monitoring job")
+
+        try:
+            # Check database connectivity
+            # Check disk space
+            # Check data freshness
+            # Generate health report
+
+            health_report = {
+                'timestamp': datetime.now().isoformat(),
+                'database_status': 'unknown',  # Would implement actual checks
+                'disk_space': 'unknown',
+                'last_extraction': 'unknown',
+                'data_freshness_days': 0
+            }
+
+            # Save health report
+            report_file = self.logs_dir / 'health_report.json'
+            with open(report_file, 'w') as f:
+                json.dump(health_report, f, indent=2)
+
+            logger.info("Health monitoring completed")
+
+        except Exception as e:
+            logger.error(f"Monitoring job failed: {e}")
+
+    async def start_metrics_server(self):
+        """Serve the metrics registry in Prometheus text format on /metrics; returns the runner to clean up"""
+        from aiohttp import web
+
+        async def metrics(request):
+            return web.Response(
+                text=REGISTRY.render_prometheus(),
+                headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+            )
+
+        app = web.Application()
+        app.router.add_get('/metrics', metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, self.config['metrics_host'], self.config['metrics_port']).start()
+        logger.info(f"Serving metrics on http://{self.config['metrics_host']}:{self.config['metrics_port']}/metrics")
+        return runner
+
+    async def schedule_loop(self):
+        """Main scheduling loop"""
+        logger.info("Starting Trade Map scheduler")
+        logger.info(f"Extraction interval: {self.config['extraction_interval_hours']} hours")
+
+        metrics_runner = None
+        if self.config['metrics_port']:
+            try:
+                metrics_runner = await self.start_metrics_server()
+            except OSError as e:
+                logger.error(f"Failed to start metrics server: {e}")
+        try:
+            await self._schedule_jobs()
+        finally:
+            if metrics_runner is not None:
+                await metrics_runner.cleanup()
+
+    async def _schedule_jobs(self):
+        """Run the periodic jobs until shutdown"""
+
+        # Load job history
+        self.load_job_history()
+
+        # Run initial jobs
+        await self.run_monitoring_job()
+        await self.run_cleanup_job()
+
+        last_extraction = datetime.now() - timedelta(hours=self.config['extraction_interval_hours'])
+        last_cleanup = datetime.now()
+        last_monitoring = datetime.now()
+
+        while not self.shutdown_event.is_set():
+            try:
+                now = datetime.now()
+
+                # Check if it's time for extraction
+                if (now - last_extraction).total_seconds() >= self.config['extraction_interval_hours'] * 3600:
+                    job_config = {
+                        'job_type': 'daily_extraction',
+                        'countries': ['United States', 'China', 'Germany', 'Japan', 'United Kingdom'],
+                        'products': ['85', '84', '87'],  # Electronics, Machinery, Vehicles
+                        'start_year': 2020,
+                        'end_year': datetime.now().year,
+                        'incremental': self.config['incremental_extraction']
+                    }
+
+                    await self.run_extraction_job(job_config)
+                    last_extraction = now
+
+                # Check if it's time for cleanup (daily)
+                if (now - last_cleanup).total_seconds() >= 24 * 3600:
+                    await self.run_cleanup_job()
+                    last_cleanup = now
+
+                # Check if it's time for monitoring (hourly)
+                if (now - last_monitoring).total_seconds() >= 3600:
+                    await self.run_monitoring_job()
+                    last_monitoring = now
+
+                # Wait before next check
+                await asyncio.sleep(60)  # Check every minute
+
+            except Exception as e:
+                logger.error(f"Scheduler loop error: {e}")
+                await asyncio.sleep(60)
+
+    async def run_once(self, job_type: str = 'extraction'):
+        """Run a single job manually"""
+        logger.info(f"Running {job_type} job once")
+
+        if job_type == 'extraction':
+            job_config = {
+                'job_type': 'manual_extraction',
+                'countries': ['United States', 'China', 'Germany'],
+                'products': ['85', '84'],
+                'start_year': 2023,
+                'end_year': 2024
+            }
+            await self.run_extraction_job(job_config)
+
+        elif job_type == 'ingestion':
+            await self.run_ingestion_job({})
+
+        elif job_type == 'cleanup':
+            await self.run_cleanup_job()
+
+        elif job_type == 'monitoring':
+            await self.run_monitoring_job()
+
+        logger.info(f"Manual {job_type} job completed")
+
+    def get_status(self) -> Dict:
+        """Get scheduler status"""
+        return {
+            'running_jobs': len(self.running_jobs),
+            'total_jobs_history': len(self.job_history),
+            'last_job': self.job_history[-1] if self.job_history else None,
+            'config': self.config,
+            'uptime': 'unknown'  # Would need to track start time
+        }
+
+def main():
+    """Main entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Trade Map Data Scheduler')
+    parser.add_argument('--run-once', choices=['extraction', 'ingestion', 'cleanup', 'monitoring'],
+                       help='Run a single job and exit')
+    parser.add_argument('--status', action='store_true', help='Show scheduler status')
+    parser.add_argument('--config', action='store_true', help='Show configuration')
+    parser.add_argument('--metrics', metavar='JOB_ID', help="Print a finished job's metrics in Prometheus text format")
+    parser.add_argument('--profile-job', metavar='JOB_ID',
+                        help='Take a sampling profile of a running job (again to stop early); written to logs/profiles')
+
+    args = parser.parse_args()
+
+    # These only read what a running scheduler writes to logs/
+    if args.profile_job:
+        try:
+            pids = profile_running_job(args.profile_job)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        print(f"Profiling job {args.profile_job} in processes {pids}; profiles are written to logs/profiles")
+        return
+
+    if args.metrics:
+        metrics_file = LOGS_DIR / f"metrics_{args.metrics}.json"
+        if not metrics_file.exists():
+            print(f"No metrics recorded for job {args.metrics}")
+            sys.exit(1)
+        with open(metrics_file, 'r') as f:
+            print(render_snapshot(json.load(f)), end='')
+        return
+
+    scheduler = TradeMapScheduler()
+
+    if args.config:
+        print("Scheduler Configuration:")
+        print(json.dumps(scheduler.config, indent=2))
+        return
+
+    if args.status:
+        status = scheduler.get_status()
+        print("Scheduler Status:")
+        print(json.dumps(status, indent=2))
+        return
+
+    if args.run_once:
+        asyncio.run(scheduler.run_once(args.run_once))
+        return
+
+    # Run scheduler continuously
+    try:
+        asyncio.run(scheduler.schedule_loop())
+    except KeyboardInterrupt:
+        logger.info("Scheduler stopped by user")
+    except Exception as e:
+        logger.error(f"Scheduler failed: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
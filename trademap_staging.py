@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Trade Map Parquet Staging
+Typed, compressed, reporter/year-partitioned staging files between extraction and loading
+"""
+
+import logging
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+logger = logging.getLogger(__name__)
+
+# Explicit schema matching TradeDataRecord / TradeRecordBatch (plus the extraction timestamp)
+TRADE_RECORD_SCHEMA = pa.schema([
+    ('reporter_country', pa.string()),
+    ('partner_country', pa.string()),
+    ('product_code', pa.string()),
+    ('trade_flow', pa.string()),
+    ('year', pa.uint16()),
+    ('month', pa.uint8()),
+    ('trade_value_usd', pa.float64()),
+    ('trade_quantity', pa.float64()),
+    ('quantity_unit', pa.string()),
+    ('net_weight_kg', pa.float64()),
+    ('gross_weight_kg', pa.float64()),
+    ('extracted_at', pa.timestamp('us'))
+])
+
+# Directory layout: <root>/reporter_country=<name>/year=<year>/<basename>-<n>.parquet
+PARTITION_COLUMNS = ['reporter_country', 'year']
+PARTITIONING = ds.partitioning(
+    pa.schema([TRADE_RECORD_SCHEMA.field(name) for name in PARTITION_COLUMNS]),
+    flavor='hive'
+)
+
+def _conform(frame: pd.DataFrame) -> pa.Table:
+    """Cast an extracted-records frame to TRADE_RECORD_SCHEMA"""
+    frame = frame.copy()
+    for field in TRADE_RECORD_SCHEMA:
+        if field.name not in frame:
+            frame[field.name] = None
+        elif pa.types.is_timestamp(field.type):
+            frame[field.name] = pd.to_datetime(frame[field.name], errors='coerce')
+        elif pa.types.is_floating(field.type) or pa.types.is_integer(field.type):
+            frame[field.name] = pd.to_numeric(frame[field.name], errors='coerce')
+        else:
+            frame[field.name] = frame[field.name].astype('string')
+    return pa.Table.from_pandas(frame[TRADE_RECORD_SCHEMA.names], schema=TRADE_RECORD_SCHEMA, preserve_index=False)
+
+def write_staged(frame: pd.DataFrame, root: Union[str, Path], compression: str = 'zstd',
+                 basename: str = 'part') -> Path:
+    """Write extracted records as a Parquet dataset partitioned by reporter and year
+
+    Writing again into the same root with a different basename adds files next to
+    the existing ones, so a job can stage its output in several batches.
+    """
+    root = Path(root)
+    table = _conform(frame)
+    ds.write_dataset(
+        table,
+        root,
+        format='parquet',
+        partitioning=PARTITIONING,
+        basename_template=f"{basename}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+        # A large batch can span more reporter/year partitions than Arrow's default limit of 1024
+        max_partitions=max(1024, len(frame[PARTITION_COLUMNS].drop_duplicates())),
+        file_options=ds.ParquetFileFormat().make_write_options(compression=compression)
+    )
+    logger.info(f"Staged {table.num_rows} records to {root} ({compression})")
+    return root
+
+def open_staged(path: Union[str, Path], memory_map: bool = True) -> ds.Dataset:
+    """Open a staged dataset directory (or single Parquet file) without reading it"""
+    path = Path(path)
+    filesystem = pafs.LocalFileSystem(use_mmap=memory_map)
+    if path.is_dir():
+        return ds.dataset(str(path), schema=TRADE_RECORD_SCHEMA, format='parquet',
+                          partitioning=PARTITIONING, filesystem=filesystem)
+    return ds.dataset(str(path), format='parquet', filesystem=filesystem)
+
+def read_staged(path: Union[str, Path], memory_map: bool = True, columns: Optional[List[str]] = None,
+                filter: Optional[ds.Expression] = None) -> pd.DataFrame:
+    """Read staged records into a DataFrame, e.g. filter=ds.field('year') == 2023"""
+    return open_staged(path, memory_map).to_table(columns=columns, filter=filter).to_pandas()
+
+def iter_staged_batches(path: Union[str, Path], batch_size: int = 10000,
+                        memory_map: bool = True) -> Iterator[pd.DataFrame]:
+    """Stream staged records in DataFrames of at most batch_size rows"""
+    # Single-threaded scan keeps batch boundaries and order stable across runs (dedup tokens)
+    for batch in open_staged(path, memory_map).to_batches(batch_size=batch_size, use_threads=False):
+        if batch.num_rows:
+            yield batch.to_pandas()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Streaming Trade Map Ingestion
+Bounded queue between extractor coroutines and ClickHouse insert workers
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence
+
+import pandas as pd
+
+from pipeline_metrics import QUEUE_DEPTH
+from pipeline_profiling import profile_stage
+from trademap_records import TradeRecordBatch, as_record_batch
+
+logger = logging.getLogger(__name__)
+
+def records_to_frame(records) -> pd.DataFrame:
+    """Extracted records (a TradeRecordBatch or TradeDataRecords) as a DataFrame in the staged layout"""
+    frame = as_record_batch(records).to_frame()
+    frame['extracted_at'] = datetime.now().isoformat()
+    return frame
+
+class StreamingIngestor:
+    """Feeds extracted record batches to ClickHouse while extraction is still running
+
+    Producers await put(); once queue_size batches are waiting they block until an
+    insert worker catches up, so memory stays bounded however large the job is.
+    Each worker owns its own loader (and connection) and flushes its buffer when it
+    holds flush_rows rows or its oldest row has waited flush_interval seconds.
+    """
+
+    def __init__(self, loader_factory: Optional[Callable] = None, queue_size: int = 64,
+                 flush_rows: int = 50000, flush_interval: float = 5.0, insert_workers: int = 1):
+        if loader_factory is None:
+            from clickhouse_loader import ClickHouseLoader
+            loader_factory = ClickHouseLoader
+        self.loader_factory = loader_factory
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.insert_workers = max(1, insert_workers)
+
+        self.rows_received = 0
+        self.rows_inserted = 0
+        self.flushes = 0
+        self.loaded_years = set()  # for a coordinator rebuilding the views when the loaders do not
+
+        self._loaders = []
+        self._workers: List[asyncio.Task] = []
+        self._error: Optional[BaseException] = None
+
+    @classmethod
+    def from_env(cls, loader_factory: Optional[Callable] = None) -> 'StreamingIngestor':
+        """Build an ingestor from TRADEMAP_STREAM_* environment variables"""
+        return cls(
+            loader_factory=loader_factory,
+            queue_size=int(os.getenv('TRADEMAP_STREAM_QUEUE_SIZE', '64')),
+            flush_rows=int(os.getenv('TRADEMAP_STREAM_FLUSH_ROWS', '50000')),
+            flush_interval=float(os.getenv('TRADEMAP_STREAM_FLUSH_SECONDS', '5')),
+            insert_workers=int(os.getenv('TRADEMAP_STREAM_INSERT_WORKERS', '1'))
+        )
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def start(self):
+        """Open one loader per insert worker and start the workers"""
+        for _ in range(self.insert_workers):
+            loader = await asyncio.to_thread(self.loader_factory)
+            await asyncio.to_thread(loader.begin_trade_flows_load)
+            self._loaders.append(loader)
+        self._workers = [asyncio.create_task(self._insert_worker(loader)) for loader in self._loaders]
+
+    async def put(self, records: Sequence):
+        """Queue a batch of extracted records, waiting while the queue is full"""
+        if self._error is not None:
+            raise RuntimeError("Streaming ingestion failed") from self._error
+        if records:
+            self.rows_received += len(records)
+            await self.queue.put(records)
+            QUEUE_DEPTH.set(self.queue.qsize(), queue='stream_ingest')
+
+    async def _insert_worker(self, loader):
+        buffer: List[TradeRecordBatch] = []
+        buffered_rows = 0
+        buffered_since = 0.0
+        done = False
+
+        while not done:
+            timeout = None
+            if buffer:
+                timeout = max(0.0, buffered_since + self.flush_interval - time.monotonic())
+            try:
+                records = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                records = []
+            else:
+                self.queue.task_done()
+                QUEUE_DEPTH.set(self.queue.qsize(), queue='stream_ingest')
+                if records is None:
+                    done = True
+                    records = []
+
+            if records and self._error is None:
+                if not buffer:
+                    buffered_since = time.monotonic()
+                buffer.append(as_record_batch(records))
+                buffered_rows += len(records)
+
+            due = buffer and (done or buffered_rows >= self.flush_rows
+                              or time.monotonic() - buffered_since >= self.flush_interval)
+            if due:
+                batch = TradeRecordBatch.concat(buffer)
+                buffer, buffered_rows = [], 0
+                try:
+                    with profile_stage('transform'):
+                        frame = records_to_frame(batch)
+                    inserted = await asyncio.to_thread(loader.insert_trade_flows, frame)
+                    self.rows_inserted += inserted
+                    self.flushes += 1
+                    logger.info(f"Streamed {inserted} records to ClickHouse (queue depth {self.queue.qsize()})")
+                except Exception as e:
+                    # Keep draining so producers never block on a dead worker; put() re-raises
+                    logger.error(f"Streaming insert failed: {e}")
+                    self._error = self._error or e
+
+    async def close(self):
+        """Flush everything still queued, finish the load and close the loaders"""
+        try:
+            for _ in self._workers:
+                await self.queue.put(None)
+            await asyncio.gather(*self._workers)
+
+            if self._loaders:
+                # Also after a failure: rows already inserted must reach the summary views.
+                # Merge per-worker bookkeeping so the views are rebuilt once for all years
+                first = self._loaders[0]
+                for loader in self._loaders[1:]:
+                    first.loaded_years.update(loader.loaded_years)
+                    for kind, counts in loader.unmapped_keys.items():
+                        first.unmapped_keys[kind].update(counts)
+                self.loaded_years = set(first.loaded_years)
+                await asyncio.to_thread(first.finish_trade_flows_load)
+        finally:
+            for loader in self._loaders:
+                await asyncio.to_thread(loader.close)
+            self._loaders = []
+            self._workers = []
+
+        logger.info(
+            f"Streaming ingestion finished: {self.rows_inserted}/{self.rows_received} records inserted "
+            f"in {self.flushes} flushes"
+        )
+        if self._error is not None:
+            raise RuntimeError("Streaming ingestion failed") from self._error
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Synthetic Trade Map Data
+Generates realistic trade flow datasets at any scale for load tests, benchmarks and query tests
+"""
+
+import logging
+import math
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# HS chapters mostly traded by count or volume rather than weight
+UNIT_CHAPTERS = {'84': 'units', '85': 'units', '87': 'units', '88': 'units', '89': 'units', '90': 'units',
+                 '91': 'units', '92': 'units', '95': 'units', '61': 'pieces', '62': 'pieces', '64': 'pieces'}
+VOLUME_CHAPTERS = {'22': 'l', '27': 'l'}
+
+# Chapters with the largest world trade (fuels, electronics, machinery, vehicles, ...), ranked first
+MAJOR_CHAPTERS = ['27', '85', '84', '87', '30', '71', '90', '39', '29', '72']
+
+# Relative activity per calendar month: a spring dip, an autumn peak before year-end shipping
+SEASONALITY = np.array([0.92, 0.86, 1.00, 0.98, 1.00, 0.99, 0.95, 0.93, 1.02, 1.08, 1.12, 1.15])
+
+@dataclass
+class Dimensions:
+    """Reporter/partner names and the HS product hierarchy to draw rows from"""
+    countries: List[str]
+    # product_code, hs_level, chapter_code, heading_code (trademap_products columns)
+    products: pd.DataFrame
+
+    @classmethod
+    def builtin(cls, countries: int = 200, seed: int = 0) -> 'Dimensions':
+        """The recording client's countries padded with synthetic ones, and a synthetic HS2/4/6 tree"""
+        from fake_clickhouse import DEFAULT_COUNTRIES
+
+        names = [country[1] for country in DEFAULT_COUNTRIES][:countries]
+        names += [f"Country {index:03d}" for index in range(len(names) + 1, countries + 1)]
+
+        rng = np.random.default_rng(seed)
+        rows = []
+        for chapter in range(1, 98):
+            if chapter == 77:  # reserved in the HS
+                continue
+            chapter_code = f"{chapter:02d}"
+            rows.append((chapter_code, 2, chapter_code, ''))
+            for heading in range(1, int(rng.integers(2, 20)) + 1):
+                heading_code = f"{chapter_code}{heading:02d}"
+                rows.append((heading_code, 4, chapter_code, heading_code))
+                for subheading in range(int(rng.integers(1, 9))):
+                    rows.append((f"{heading_code}{subheading * 10:02d}", 6, chapter_code, heading_code))
+        products = pd.DataFrame(rows, columns=['product_code', 'hs_level', 'chapter_code', 'heading_code'])
+        return cls(names, products)
+
+    @classmethod
+    def from_codes(cls, countries: Sequence[str], product_codes: Sequence[str]) -> 'Dimensions':
+        """Flat product list (e.g. HS2 chapters); the hierarchy is derived from the codes"""
+        codes = [str(code) for code in product_codes]
+        products = pd.DataFrame({
+            'product_code': codes,
+            'hs_level': [len(code) for code in codes],
+            'chapter_code': [code[:2] for code in codes],
+            'heading_code': [code[:4] if len(code) >= 4 else '' for code in codes]
+        })
+        return cls(list(countries), products)
+
+    @classmethod
+    def from_csv(cls, countries_csv: str, products_csv: str) -> 'Dimensions':
+        """Reference files in the load_countries_data / load_products_data layout"""
+        countries = pd.read_csv(countries_csv, usecols=['country_name'], keep_default_na=False)
+        products = pd.read_csv(products_csv, dtype=str, keep_default_na=False)
+        return cls._from_frames(countries['country_name'].tolist(), products)
+
+    @classmethod
+    def from_clickhouse(cls, client) -> 'Dimensions':
+        """trademap_countries and trademap_products of a live database, so every generated row maps"""
+        countries = [row[0] for row in client.execute('SELECT country_name FROM trademap_countries ORDER BY country_id')]
+        products = pd.DataFrame(
+            client.execute('SELECT product_code, hs_level, chapter_code, heading_code FROM trademap_products'),
+            columns=['product_code', 'hs_level', 'chapter_code', 'heading_code']
+        )
+        return cls._from_frames(countries, products)
+
+    @classmethod
+    def _from_frames(cls, countries: List[str], products: pd.DataFrame) -> 'Dimensions':
+        products = products.copy()
+        products['product_code'] = products['product_code'].astype(str).str.strip()
+        if 'hs_level' in products and products['hs_level'].astype(str).str.isdigit().all():
+            products['hs_level'] = products['hs_level'].astype(int)
+        else:
+            products['hs_level'] = products['product_code'].str.len()
+        for column, width in (('chapter_code', 2), ('heading_code', 4)):
+            if column not in products:
+                products[column] = ''
+            missing = products[column].fillna('').astype(str) == ''
+            products.loc[missing, column] = products.loc[missing, 'product_code'].str[:width]
+        if not countries or products.empty:
+            raise ValueError('Synthetic data needs at least one country and one product')
+        return cls(countries, products[['product_code', 'hs_level', 'chapter_code', 'heading_code']])
+
+def zipf_weights(count: int, exponent: float) -> np.ndarray:
+    """Probabilities proportional to rank^-exponent (rank 1 most likely)"""
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+@dataclass
+class TradeDataGenerator:
+    """Draws trade flow rows with production-like shape
+
+    - reporters and partners follow a Zipf distribution (a few large economies dominate),
+      with a share of rows reported against the World aggregate;
+    - products come from the HS hierarchy at hs_level: chapters are Zipf-weighted, and
+      so are the codes within each chapter;
+    - months follow SEASONALITY, a share of rows is annual (month 0), and values scale
+      with the reporter's size and the month;
+    - net/gross weights are missing on a share of rows, as with real declarations.
+
+    Output is deterministic for a given seed and shard.
+    """
+    dimensions: Dimensions
+    start_year: int = 2015
+    end_year: int = 2024
+    hs_level: int = 6
+    skew: float = 1.1
+    world_share: float = 0.05
+    annual_share: float = 0.1
+    null_weight_rate: float = 0.15
+    seed: int = 0
+    _products: np.ndarray = field(init=False, repr=False)
+    _product_weights: np.ndarray = field(init=False, repr=False)
+    _units: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        products = self.dimensions.products
+        level = products[products['hs_level'] == self.hs_level]
+        if level.empty:
+            # Fall back to the most detailed level the hierarchy has
+            level = products[products['hs_level'] == products['hs_level'].max()]
+
+        # Chapter weight by Zipf rank (major chapters first, the rest in a seeded order),
+        # split Zipf-wise over the chapter's codes
+        chapters = level['chapter_code'].drop_duplicates().to_numpy()
+        np.random.default_rng(self.seed).shuffle(chapters)
+        chapters = sorted(chapters, key=lambda chapter: MAJOR_CHAPTERS.index(chapter)
+                          if chapter in MAJOR_CHAPTERS else len(MAJOR_CHAPTERS))
+        chapter_weight = dict(zip(chapters, zipf_weights(len(chapters), self.skew)))
+        within = 1.0 / (level.groupby('chapter_code').cumcount() + 1) ** self.skew
+        within = within / within.groupby(level['chapter_code']).transform('sum')
+        weights = level['chapter_code'].map(chapter_weight) * within
+
+        self._products = level['product_code'].to_numpy(dtype=object)
+        self._product_weights = (weights / weights.sum()).to_numpy()
+        self._units = np.array([
+            UNIT_CHAPTERS.get(chapter, VOLUME_CHAPTERS.get(chapter, 'kg')) for chapter in level['chapter_code']
+        ], dtype=object)
+
+    def generate(self, rows: int, shard: int = 0, chunk_rows: int = 200_000) -> Iterator[pd.DataFrame]:
+        """Yield rows in DataFrames of at most chunk_rows"""
+        rng = np.random.default_rng([self.seed, shard])
+        countries = np.array(self.dimensions.countries, dtype=object)
+        country_weights = zipf_weights(len(countries), self.skew)
+        # Reporter size drives value; large economies are also the most frequent partners
+        size_factor = np.log(country_weights / country_weights.min())
+        month_weights = SEASONALITY / SEASONALITY.sum()
+        extracted_at = datetime.now().isoformat()
+
+        for start in range(0, rows, chunk_rows):
+            count = min(chunk_rows, rows - start)
+            reporter = rng.choice(len(countries), count, p=country_weights)
+            partner = rng.choice(len(countries), count, p=country_weights)
+            # No country trades with itself: move those rows to the next partner
+            partner = np.where(partner == reporter, (partner + 1) % len(countries), partner)
+            partner_names = countries[partner]
+            if len(countries) > 1:
+                partner_names = np.where(rng.random(count) < self.world_share, 'World', partner_names)
+            else:
+                partner_names = np.full(count, 'World', dtype=object)
+
+            product = rng.choice(len(self._products), count, p=self._product_weights)
+            month = rng.choice(np.arange(1, 13), count, p=month_weights)
+            month = np.where(rng.random(count) < self.annual_share, 0, month)
+            seasonal = np.where(month == 0, 12.0, SEASONALITY[np.maximum(month, 1) - 1])
+
+            value = rng.lognormal(9 + 0.5 * size_factor[reporter], 1.8, count) * seasonal
+            unit_price = rng.lognormal(1.5, 1.0, count)
+            quantity = np.maximum(1, np.round(value / unit_price))
+            net_weight = np.round(quantity * rng.lognormal(0, 0.8, count), 1)
+            net_weight = np.where(rng.random(count) < self.null_weight_rate, np.nan, net_weight)
+            gross_weight = np.round(net_weight * rng.uniform(1.01, 1.15, count), 1)
+
+            yield pd.DataFrame({
+                'reporter_country': countries[reporter],
+                'partner_country': partner_names,
+                'product_code': self._products[product],
+                'trade_flow': np.where(rng.random(count) < 0.5, 'Export', 'Import').astype(object),
+                'year': rng.integers(self.start_year, self.end_year + 1, count).astype('uint16'),
+                'month': month.astype('uint8'),
+                'trade_value_usd': np.round(value),
+                'trade_quantity': quantity,
+                'quantity_unit': self._units[product],
+                'net_weight_kg': net_weight,
+                'gross_weight_kg': gross_weight,
+                'extracted_at': extracted_at
+            })
+
+def _write_shard(generator: TradeDataGenerator, output_format: str, target: str, shard: int,
+                 rows: int, chunk_rows: int) -> Dict:
+    """Generate one shard and write it to CSV, Parquet or ClickHouse (runs in a worker process)"""
+    started = time.monotonic()
+    summary = {'shard': shard, 'rows': 0, 'years': set()}
+    loader = None
+    if output_format == 'clickhouse':
+        from clickhouse_loader import ClickHouseLoader
+        loader = ClickHouseLoader()
+        loader.begin_trade_flows_load()
+    try:
+        frames = generator.generate(rows, shard, chunk_rows)
+        if output_format == 'parquet':
+            # One write per shard: every chunk would otherwise add a file to each reporter/year partition
+            from trademap_staging import write_staged
+            frames = [pd.concat(list(frames), ignore_index=True)]
+        for index, frame in enumerate(frames):
+            if output_format == 'csv':
+                frame.to_csv(Path(target) / f"part-{shard:05d}.csv", mode='w' if index == 0 else 'a',
+                             header=index == 0, index=False)
+                summary['rows'] += len(frame)
+            elif output_format == 'parquet':
+                write_staged(frame, target, basename=f"synthetic-{shard:05d}")
+                summary['rows'] += len(frame)
+            else:
+                summary['rows'] += loader.insert_trade_flows(frame)
+                summary['years'].update(loader.loaded_years)
+        if loader:
+            loader._report_unmapped_keys()
+    finally:
+        if loader:
+            loader.close()
+    summary['seconds'] = round(time.monotonic() - started, 2)
+    return summary
+
+def generate_dataset(generator: TradeDataGenerator, rows: int, output_format: str, target: Optional[str] = None,
+                     workers: int = 4, shard_rows: int = 1_000_000, chunk_rows: int = 200_000) -> Dict:
+    """Generate rows in shards of shard_rows on up to workers processes
+
+    csv: target is a .csv file; shards are written as parts next to it and joined.
+    parquet: target is a staged dataset directory (trademap_staging layout), loadable
+    by the loader and the scheduler's ingestion.
+    clickhouse: every worker inserts through ClickHouseLoader (CLICKHOUSE_* settings);
+    in upsert mode the summary views are rebuilt once for the generated years.
+    """
+    if output_format not in ('csv', 'parquet', 'clickhouse'):
+        raise ValueError(f"Unknown output format {output_format!r}; expected csv, parquet or clickhouse")
+    if output_format != 'clickhouse' and not target:
+        raise ValueError(f"An output path is required for {output_format} output")
+
+    started = time.monotonic()
+    parts_dir = None
+    shard_target = target
+    if output_format == 'csv':
+        parts_dir = Path(f"{target}.parts")
+        parts_dir.mkdir(parents=True, exist_ok=True)
+        shard_target = str(parts_dir)
+    elif output_format == 'parquet':
+        Path(target).mkdir(parents=True, exist_ok=True)
+
+    shards = [(shard, min(shard_rows, rows - shard * shard_rows)) for shard in range(math.ceil(rows / shard_rows))]
+    logger.info(f"Generating {rows} rows in {len(shards)} shards on {min(workers, len(shards))} workers "
+                f"({output_format}{f' -> {target}' if target else ''})")
+    results = []
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(shards)))) as executor:
+        futures = [
+            executor.submit(_write_shard, generator, output_format, shard_target, shard, count, chunk_rows)
+            for shard, count in shards
+        ]
+        for future in futures:
+            results.append(future.result())
+            logger.info(f"Shard {results[-1]['shard']}: {results[-1]['rows']} rows in {results[-1]['seconds']}s")
+
+    if parts_dir is not None:
+        # Join the parts in shard order, keeping only the first header
+        with open(target, 'wb') as out:
+            for index, (shard, _) in enumerate(shards):
+                with open(parts_dir / f"part-{shard:05d}.csv", 'rb') as part:
+                    if index:
+                        part.readline()
+                    shutil.copyfileobj(part, out, 16 * 1024 * 1024)
+        shutil.rmtree(parts_dir)
+
+    years = set().union(*(result['years'] for result in results)) if results else set()
+    if output_format == 'clickhouse' and years:
+        from clickhouse_loader import ClickHouseLoader
+        loader = ClickHouseLoader()
+        try:
+            if loader.ingest_mode == 'upsert':
+                loader.rebuild_materialized_views(sorted(years))
+        finally:
+            loader.close()
+
+    total = sum(result['rows'] for result in results)
+    seconds = time.monotonic() - started
+    logger.info(f"Generated {total} rows in {seconds:.1f}s ({total / max(seconds, 1e-9):.0f} rows/s)")
+    return {'rows': total, 'shards': len(shards), 'seconds': round(seconds, 2), 'target': target}
+
+def main():
+    """Command-line interface (generate-trade-data.py)"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate synthetic Trade Map trade flow data')
+    parser.add_argument('--rows', required=True, help='Rows to generate, e.g. 50000, 10M')
+    parser.add_argument('--format', choices=['csv', 'parquet', 'clickhouse'], default='csv')
+    parser.add_argument('--output', help='CSV file or Parquet dataset directory (not used for clickhouse)')
+    parser.add_argument('--dimensions', choices=['builtin', 'csv', 'clickhouse'],
+                        help='Where countries and products come from (default: clickhouse for clickhouse output, '
+                             'otherwise builtin)')
+    parser.add_argument('--countries-csv', help='Countries reference CSV (with --dimensions csv)')
+    parser.add_argument('--products-csv', help='Products reference CSV (with --dimensions csv)')
+    parser.add_argument('--countries', type=int, default=200, help='Countries in the builtin dimensions')
+    parser.add_argument('--hs-level', type=int, choices=[2, 4, 6], default=6, help='HS level of product_code')
+    parser.add_argument('--start-year', type=int, default=2015)
+    parser.add_argument('--end-year', type=int, default=2024)
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of country and chapter popularity')
+    parser.add_argument('--world-share', type=float, default=0.05, help='Share of rows with partner World')
+    parser.add_argument('--annual-share', type=float, default=0.1, help='Share of annual (month 0) rows')
+    parser.add_argument('--null-weight-rate', type=float, default=0.15, help='Share of rows without weights')
+    parser.add_argument('--workers', type=int, default=4, help='Parallel generator processes')
+    parser.add_argument('--shard-rows', type=int, default=1_000_000, help='Rows per worker task')
+    parser.add_argument('--chunk-rows', type=int, default=200_000, help='Rows per generated DataFrame / insert')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    from benchmark_support import parse_size
+
+    source = args.dimensions or ('clickhouse' if args.format == 'clickhouse' else 'builtin')
+    if source == 'csv':
+        if not (args.countries_csv and args.products_csv):
+            parser.error('--dimensions csv needs --countries-csv and --products-csv')
+        dimensions = Dimensions.from_csv(args.countries_csv, args.products_csv)
+    elif source == 'clickhouse':
+        from clickhouse_pool import get_pool
+        with get_pool('native').connection() as client:
+            dimensions = Dimensions.from_clickhouse(client)
+    else:
+        dimensions = Dimensions.builtin(args.countries, args.seed)
+
+    generator = TradeDataGenerator(
+        dimensions, start_year=args.start_year, end_year=args.end_year, hs_level=args.hs_level,
+        skew=args.skew, world_share=args.world_share, annual_share=args.annual_share,
+        null_weight_rate=args.null_weight_rate, seed=args.seed
+    )
+    summary = generate_dataset(generator, parse_size(args.rows), args.format, args.output,
+                               workers=args.workers, shard_rows=args.shard_rows, chunk_rows=args.chunk_rows)
+    target = f" -> {summary['target']}" if summary['target'] else ''
+    print(f"Generated {summary['rows']} rows in {summary['seconds']}s{target}")